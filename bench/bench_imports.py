@@ -0,0 +1,103 @@
+"""Cold-start import time of the function entry point, checked against a budget.
+
+Run from the repository root:
+
+    python bench/bench_imports.py --runs 7 --budget-ms 40
+
+Every scenario is imported in a fresh interpreter and the median over the
+runs is reported as JSON. The script exits non-zero when the entry point
+scenario exceeds its budget, or when modules that must stay lazy (Bolt,
+Flask, requests, quickchart, matplotlib, XML) are loaded by it, so it can gate CI.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin")
+ENV_DEFAULTS = {
+    "SLACK_BOT_TOKEN": "xoxb-bench",
+    "SLACK_SIGNING_SECRET": "bench",
+    "SLACK_USER_TOKEN": "xoxp-bench",
+    "SLACK_TOKEN_VERIFICATION": "false",
+    "JAMF_CLIENT_ID": "bench",
+    "JAMF_CLIENT_SECRET": "bench",
+    "INVENTORY_STORE": "off",
+}
+# modules the entry point must not load before a code path needs them
+LAZY_MODULES = [
+    "slack_bolt",
+    "slack_sdk",
+    "flask",
+    "requests",
+    "quickchart",
+    "matplotlib",
+    "xml.etree.ElementTree",
+    "jamf_client",
+]
+SCENARIOS = {
+    # URL verification and ignored events only need this
+    "entry": "import main",
+    # the first message event builds the full runtime
+    "message": "import main; main.get_slack_handler()",
+    # a chart command additionally loads quickchart
+    "chart": "import main, get_chart; get_chart.get_current_chart(['a'], [1], 'pie', 't')",
+}
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+import json
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(code, runs):
+    env = {**ENV_DEFAULTS, **os.environ}
+    timings, loaded = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(code=code, lazy=LAZY_MODULES)],
+            cwd=BIN_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["ms"])
+        loaded = result["loaded"]
+    return {
+        "median_ms": round(statistics.median(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "lazy_modules_loaded": loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=40)
+    args = parser.parse_args()
+
+    report = {name: measure(code, args.runs) for name, code in SCENARIOS.items()}
+    entry = report["entry"]
+    failures = []
+    if entry["median_ms"] > args.budget_ms:
+        failures.append(
+            f"entry import {entry['median_ms']}ms exceeds {args.budget_ms}ms"
+        )
+    if entry["lazy_modules_loaded"]:
+        failures.append(f"entry import loads {entry['lazy_modules_loaded']}")
+    report["budget_ms"] = args.budget_ms
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
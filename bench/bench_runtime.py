@@ -0,0 +1,58 @@
+"""Per-event setup overhead of main() before and after warm-instance reuse.
+
+Run from the repository root:
+
+    python bench/bench_runtime.py --events 200
+
+Slack token verification is switched off so the numbers only reflect
+object construction, set SLACK_TOKEN_VERIFICATION=true to include the
+auth.test round trip that each fresh Bolt App performs.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+os.environ.setdefault("SLACK_SIGNING_SECRET", "bench")
+os.environ.setdefault("SLACK_USER_TOKEN", "xoxp-bench")
+os.environ.setdefault("SLACK_TOKEN_VERIFICATION", "false")
+
+import main  # noqa: E402
+from jamf_client import JamfClient  # noqa: E402
+from slack_handler import SlackHandler  # noqa: E402
+
+
+def per_event_ms(build, events):
+    timings = []
+    for _ in range(events):
+        start = time.perf_counter()
+        build()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(timings[len(timings) // 2], 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "total_ms": round(sum(timings), 3),
+    }
+
+
+def run(events):
+    main.reset_runtime()
+    return {
+        "events": events,
+        # what main() did before: a full handler per event_callback
+        "per_event_build": per_event_ms(lambda: SlackHandler(JamfClient()), events),
+        # what main() does now: the first event builds, the rest reuse
+        "warm_runtime": per_event_ms(main.get_slack_handler, events),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100)
+    args = parser.parse_args()
+    print(json.dumps(run(args.events), indent=2))
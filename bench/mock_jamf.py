@@ -0,0 +1,651 @@
+"""Local stand-in for the Jamf Pro endpoints JackaaS calls.
+
+Serves a synthetic fleet with configurable latency and throttling and counts
+every call, so command performance can be measured without production Jamf:
+
+    python bench/mock_jamf.py --fleet-size 1000 --latency-ms 20 --port 8089
+
+GET /__stats returns call counts and bytes per endpoint, POST /__reset
+clears them.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+
+MODELS = ["MacBook Pro (14-inch, 2023)", "MacBook Air (M2, 2022)", "Mac mini (2023)"]
+PROCESSORS = {"arm64": ["Apple M1", "Apple M2", "Apple M3"], "x86_64": ["Intel i7"]}
+APPS = [f"App {index}.app" for index in range(40)] + ["Pages.app", "Keynote.app"]
+PRIVILEGES = [
+    "Read Computers",
+    "Update Computers",
+    "Read Smart Computer Groups",
+    "Create Smart Computer Groups",
+    "Read Computer Extension Attributes",
+    "Read Scripts",
+    "Read Jamf Content Distribution Server Files",
+]
+LAST_STARTUP_EA = "29"
+
+
+def iso(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Fleet:
+    """Deterministic synthetic fleet of fleet_size computers"""
+
+    def __init__(self, fleet_size, group_count=12, script_count=150, seed=7):
+        rng = random.Random(seed)
+        now = datetime.utcnow().replace(microsecond=0)
+        self.computers = []
+        for index in range(1, fleet_size + 1):
+            arch = rng.choice(["arm64", "arm64", "arm64", "x86_64"])
+            # roughly 2% of the fleet are re-enrolled duplicates of an older record
+            duplicate_of = (
+                self.computers[rng.randrange(len(self.computers))]
+                if self.computers and rng.random() < 0.02
+                else None
+            )
+            name = duplicate_of["name"] if duplicate_of else f"mac-{index:05d}"
+            serial = duplicate_of["serial"] if duplicate_of else f"C02{index:07d}"
+            self.computers.append(
+                {
+                    "id": index,
+                    "name": name,
+                    "serial": serial,
+                    "username": f"user.{index:05d}",
+                    "realname": f"User {index}",
+                    "model": rng.choice(MODELS),
+                    "arch": arch,
+                    "processor": rng.choice(PROCESSORS[arch]),
+                    "last_contact": now - timedelta(hours=rng.randrange(24 * 90)),
+                    "report_date": now - timedelta(hours=rng.randrange(24 * 30)),
+                    "enrolled": now - timedelta(days=rng.randrange(900)),
+                    "mdm_expiry": now + timedelta(days=rng.randrange(-30, 700)),
+                    "ade": rng.random() < 0.8,
+                    "last_startup": now - timedelta(days=rng.randrange(120)),
+                    "apps": rng.sample(APPS, rng.randrange(3, 12)),
+                }
+            )
+        self.by_id = {computer["id"]: computer for computer in self.computers}
+        self.groups = []
+        for index in range(1, group_count + 1):
+            members = {
+                computer["id"]
+                for computer in self.computers
+                if computer["id"] % (index + 1) == 0
+            }
+            self.groups.append(
+                {"id": index, "name": f"group-{index}", "members": members}
+            )
+        self.scripts = [
+            {
+                "id": str(index),
+                "name": f"script-{index:03d}",
+                "scriptContents": f'#!/bin/sh\necho "script {index}"\n'
+                + "\n".join(
+                    f"/usr/bin/defaults write com.example key{line} {line}"
+                    for line in range(rng.randrange(5, 60))
+                ),
+            }
+            for index in range(1, script_count + 1)
+        ]
+        self.extension_attributes = [
+            {
+                "id": LAST_STARTUP_EA,
+                "name": "Last Startup",
+                "scriptContents": "#!/bin/sh",
+            }
+        ] + [
+            {"id": str(index), "name": f"EA {index}", "scriptContents": "#!/bin/sh"}
+            for index in range(100, 160)
+        ]
+        self.files = [{"fileName": f"package-{index}.pkg"} for index in range(30)]
+        self.sections = {}
+
+    def inventory_sections(self, computer):
+        """Every inventory section of computer, built once"""
+        if computer["id"] not in self.sections:
+            self.sections[computer["id"]] = self.build_sections(computer)
+        return self.sections[computer["id"]]
+
+    def build_sections(self, computer):
+        return {
+            "general": {
+                "name": computer["name"],
+                "lastContactTime": iso(computer["last_contact"]),
+                "reportDate": iso(computer["report_date"]),
+                "lastEnrolledDate": iso(computer["enrolled"]),
+                "mdmProfileExpiration": iso(computer["mdm_expiry"]),
+                "enrolledViaAutomatedDeviceEnrollment": computer["ade"],
+            },
+            "hardware": {
+                "model": computer["model"],
+                "processorType": computer["processor"],
+                "processorArchitecture": computer["arch"],
+                "serialNumber": computer["serial"],
+                "extensionAttributes": [
+                    {
+                        "definitionId": LAST_STARTUP_EA,
+                        "name": "Last Startup",
+                        "values": [
+                            computer["last_startup"].strftime("%Y-%m-%d %H:%M:%S")
+                        ],
+                    }
+                ],
+            },
+            "userAndLocation": {
+                "username": computer["username"],
+                "realname": computer["realname"],
+            },
+            # hardware attributes are only reported under hardware
+            "extensionAttributes": [],
+            "groupMemberships": [
+                {"groupId": str(group["id"]), "groupName": group["name"]}
+                for group in self.groups
+                if computer["id"] in group["members"]
+            ],
+        }
+
+
+def matches_filter(sections, rsql_filter):
+    """Tiny RSQL subset: ',' separated OR of field=in=(...) and field>=value"""
+    if not rsql_filter:
+        return True
+    for clause in re.split(r",(?![^()]*\))", rsql_filter):
+        match = re.match(r"([\w.]+)(=in=|>=|>|==)(.*)", clause.strip())
+        if not match:
+            continue
+        field, operator, rest = match.groups()
+        section, _, key = field.partition(".")
+        value = (sections.get(section) or {}).get(key)
+        if operator == "=in=":
+            options = [
+                option.strip().strip('"') for option in rest.strip("()").split(",")
+            ]
+            if value in options:
+                return True
+        elif operator in (">=", ">") and value and value >= rest.strip('"'):
+            return True
+        elif operator == "==" and value == rest.strip('"'):
+            return True
+    return False
+
+
+class MockJamf:
+    def __init__(self, fleet, latency=0.0, throttle_rate=None):
+        self.fleet = fleet
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.lock = threading.Lock()
+        self.allowance = throttle_rate or 0
+        self.allowance_at = time.monotonic()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = Counter()
+            self.bytes = Counter()
+            self.throttled = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "calls": sum(self.calls.values()),
+                "bytes": sum(self.bytes.values()),
+                "throttled": self.throttled,
+                "endpoints": {
+                    endpoint: {"calls": count, "bytes": self.bytes[endpoint]}
+                    for endpoint, count in self.calls.most_common()
+                },
+            }
+
+    def admit(self):
+        """Token bucket standing in for Jamf Cloud's throttling"""
+        if not self.throttle_rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(
+                self.throttle_rate,
+                self.allowance + (now - self.allowance_at) * self.throttle_rate,
+            )
+            self.allowance_at = now
+            if self.allowance < 1:
+                self.throttled += 1
+                return False
+            self.allowance -= 1
+            return True
+
+    def record(self, template, size):
+        with self.lock:
+            self.calls[template] += 1
+            self.bytes[template] += size
+
+    def route(self, method, path, query, body):
+        """Return (endpoint template, status, content type, payload)"""
+        fleet = self.fleet
+        path = unquote(path)
+        json_type = "application/json"
+
+        if path == "/api/oauth/token" and method == "POST":
+            return path, 200, json_type, {"access_token": "mock", "expires_in": 1200}
+
+        if path == "/JSSResource/computers":
+            return (
+                path,
+                200,
+                json_type,
+                {
+                    "computers": [
+                        {"id": c["id"], "name": c["name"]} for c in fleet.computers
+                    ]
+                },
+            )
+        if path == "/JSSResource/computers/subset/basic":
+            return (
+                path,
+                200,
+                json_type,
+                {
+                    "computers": [
+                        {
+                            "id": c["id"],
+                            "name": c["name"],
+                            "serial_number": c["serial"],
+                            "username": c["username"],
+                        }
+                        for c in fleet.computers
+                    ]
+                },
+            )
+        match = re.fullmatch(r"/JSSResource/computers/id/(\d+)(/.*)?", path)
+        if match:
+            computer = fleet.by_id.get(int(match.group(1)))
+            suffix = match.group(2) or ""
+            if computer is None:
+                return "/JSSResource/computers/id/{id}", 404, json_type, {}
+            if suffix == "/redeploy":
+                return (
+                    "/JSSResource/computers/id/{id}/redeploy",
+                    200,
+                    json_type,
+                    {"commandUuid": f"uuid-{computer['id']}"},
+                )
+            general = {
+                "id": computer["id"],
+                "name": computer["name"],
+                "serial_number": computer["serial"],
+                "last_contact_time": computer["last_contact"].strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                ),
+                "last_enrolled_date_utc": computer["enrolled"].strftime(
+                    "%Y-%m-%dT%H:%M:%S.000+0000"
+                ),
+            }
+            if suffix.lower() == "/subset/general":
+                xml = "<computer><general>" + "".join(
+                    f"<{key}>{escape(str(value))}</{key}>"
+                    for key, value in general.items()
+                )
+                xml += "</general></computer>"
+                return (
+                    "/JSSResource/computers/id/{id}/subset/General",
+                    200,
+                    "application/xml",
+                    xml,
+                )
+            return (
+                "/JSSResource/computers/id/{id}",
+                200,
+                json_type,
+                {
+                    "computer": {
+                        "general": general,
+                        "location": {"real_name": computer["realname"]},
+                    }
+                },
+            )
+        match = re.fullmatch(r"/JSSResource/computers/match/name/(.+)", path)
+        if match:
+            xml = "<computers>" + "".join(
+                f"<computer><id>{c['id']}</id><name>{escape(c['name'])}</name></computer>"
+                for c in fleet.computers
+                if c["name"] == match.group(1)
+            )
+            return (
+                "/JSSResource/computers/match/name/{name}",
+                200,
+                "application/xml",
+                xml + "</computers>",
+            )
+        match = re.fullmatch(r"/JSSResource/computerhistory/id/(\d+)", path)
+        if match:
+            computer = fleet.by_id.get(int(match.group(1)))
+            if computer is None:
+                return "/JSSResource/computerhistory/id/{id}", 404, json_type, {}
+            return (
+                "/JSSResource/computerhistory/id/{id}",
+                200,
+                json_type,
+                {
+                    "computer_history": {
+                        "policy_logs": [
+                            {
+                                "policy_name": f"policy-{index}",
+                                "date_completed": iso(computer["last_contact"]),
+                                "status": "Completed",
+                            }
+                            for index in range(5)
+                        ],
+                        "commands": {
+                            "completed": [
+                                {"name": "InstallProfile", "completed": "2024-01-01"}
+                            ]
+                            * 8,
+                            "pending": [],
+                            "failed": [],
+                        },
+                        "mac_app_store_applications": {
+                            "installed": [
+                                {"name": app, "version": "1.0", "size_mb": 10}
+                                for app in computer["apps"]
+                            ]
+                        },
+                    }
+                },
+            )
+        if path == "/JSSResource/computergroups" and method == "GET":
+            return (
+                path,
+                200,
+                json_type,
+                {
+                    "computer_groups": [
+                        {"id": g["id"], "name": g["name"], "is_smart": True}
+                        for g in fleet.groups
+                    ]
+                },
+            )
+        match = re.fullmatch(r"/JSSResource/computergroups/(name|id)/(.+)", path)
+        if match:
+            template = f"/JSSResource/computergroups/{match.group(1)}/{{key}}"
+            if method == "POST":
+                group_id = len(fleet.groups) + 1
+                name = re.search(r"<name>(.*?)</name>", body or "")
+                fleet.groups.append(
+                    {
+                        "id": group_id,
+                        "name": name.group(1) if name else f"group-{group_id}",
+                        "members": set(),
+                    }
+                )
+                return template, 201, "application/xml", f"<id>{group_id}</id>"
+            key = match.group(2)
+            group = next(
+                (
+                    g
+                    for g in fleet.groups
+                    if (str(g["id"]) if match.group(1) == "id" else g["name"]) == key
+                ),
+                None,
+            )
+            if group is None:
+                return template, 404, json_type, {}
+            return (
+                template,
+                200,
+                json_type,
+                {
+                    "computer_group": {
+                        "id": group["id"],
+                        "name": group["name"],
+                        "is_smart": True,
+                        "computers": [
+                            {
+                                "id": member,
+                                "name": fleet.by_id[member]["name"],
+                                "serial_number": fleet.by_id[member]["serial"],
+                            }
+                            for member in sorted(group["members"])
+                        ],
+                    }
+                },
+            )
+        if path == "/api/v1/computer-groups":
+            return (
+                path,
+                200,
+                json_type,
+                [
+                    {"id": str(g["id"]), "name": g["name"], "smartGroup": True}
+                    for g in fleet.groups
+                ],
+            )
+        match = re.fullmatch(
+            r"/api/v2/computer-groups/smart-group-membership/(\d+)", path
+        )
+        if match:
+            group = next(
+                (g for g in fleet.groups if g["id"] == int(match.group(1))), None
+            )
+            if group is None:
+                return (
+                    "/api/v2/computer-groups/smart-group-membership/{id}",
+                    404,
+                    json_type,
+                    {},
+                )
+            return (
+                "/api/v2/computer-groups/smart-group-membership/{id}",
+                200,
+                json_type,
+                {"members": sorted(group["members"])},
+            )
+        match = re.fullmatch(r"/JSSResource/accounts/username/(.+)", path)
+        if match:
+            return (
+                "/JSSResource/accounts/username/{user}",
+                200,
+                json_type,
+                {
+                    "account": {
+                        "name": match.group(1),
+                        "access_level": "Full Access",
+                        "privileges": {"jss_objects": PRIVILEGES},
+                    }
+                },
+            )
+        if path == "/JSSResource/accounts":
+            return (
+                path,
+                200,
+                json_type,
+                {"accounts": {"users": [{"id": 1, "name": "admin"}]}},
+            )
+        if path == "/api/v1/computers-inventory":
+            sections = [s.lower().replace("_", "") for s in query.get("section", [])]
+            page = int(query.get("page", ["0"])[0])
+            page_size = int(query.get("page-size", ["100"])[0])
+            rsql_filter = query.get("filter", [None])[0]
+            results = []
+            for computer in fleet.computers:
+                all_sections = fleet.inventory_sections(computer)
+                if not matches_filter(all_sections, rsql_filter):
+                    continue
+                item = {"id": str(computer["id"])}
+                item.update(
+                    {
+                        key: value
+                        for key, value in all_sections.items()
+                        if key.lower() in sections
+                    }
+                )
+                results.append(item)
+            return (
+                path,
+                200,
+                json_type,
+                {
+                    "totalCount": len(results),
+                    "results": results[page * page_size : (page + 1) * page_size],
+                },
+            )
+        match = re.fullmatch(r"/api/v1/computers-inventory-detail/(\d+)", path)
+        if match:
+            computer = fleet.by_id.get(int(match.group(1)))
+            if computer is None:
+                return "/api/v1/computers-inventory-detail/{id}", 404, json_type, {}
+            detail = {"id": str(computer["id"])}
+            detail.update(fleet.inventory_sections(computer))
+            return "/api/v1/computers-inventory-detail/{id}", 200, json_type, detail
+        match = re.fullmatch(r"/api/v1/computers-inventory/(\d+)/(.+)", path)
+        if match:
+            template = f"/api/v1/computers-inventory/{{id}}/{match.group(2)}"
+            return (
+                template,
+                200,
+                json_type,
+                {
+                    "personalRecoveryKey": "ABCD-EFGH",
+                    "recoveryLockPassword": "secret",
+                },
+            )
+        if path in ("/api/v1/scripts", "/api/v1/computer-extension-attributes"):
+            items = (
+                fleet.scripts
+                if path == "/api/v1/scripts"
+                else fleet.extension_attributes
+            )
+            page = int(query.get("page", ["0"])[0])
+            page_size = int(query.get("page-size", ["100"])[0])
+            return (
+                path,
+                200,
+                json_type,
+                {
+                    "totalCount": len(items),
+                    "results": items[page * page_size : (page + 1) * page_size],
+                },
+            )
+        match = re.fullmatch(r"/api/v1/scripts/(\d+)", path)
+        if match:
+            script = next((s for s in fleet.scripts if s["id"] == match.group(1)), None)
+            return (
+                "/api/v1/scripts/{id}",
+                200 if script else 404,
+                json_type,
+                script or {},
+            )
+        if path == "/api/v1/jcds/files":
+            return path, 200, json_type, fleet.files
+        match = re.fullmatch(r"/api/v1/jcds/files/(.+)", path)
+        if match:
+            return (
+                "/api/v1/jcds/files/{name}",
+                200,
+                json_type,
+                {"uri": f"https://jcds.example.com/{match.group(1)}?signature=mock"},
+            )
+        match = re.fullmatch(
+            r"/JSSResource/computercommands/command/DeviceLock/passcode/.+/id/\d+",
+            path,
+        )
+        if match:
+            return (
+                "/JSSResource/computercommands/command/DeviceLock",
+                201,
+                json_type,
+                {},
+            )
+        return path, 404, json_type, {"error": "not mocked"}
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def respond(self, status, content_type, payload, headers=None):
+            body = payload if isinstance(payload, str) else json.dumps(payload)
+            body = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+            return len(body)
+
+        def handle_any(self, method):
+            parsed = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length).decode() if length else None
+            if parsed.path == "/__stats":
+                self.respond(200, "application/json", mock.stats())
+                return
+            if parsed.path == "/__reset":
+                mock.reset()
+                self.respond(200, "application/json", {})
+                return
+            if not mock.admit():
+                self.respond(429, "application/json", {}, {"Retry-After": "1"})
+                return
+            if mock.latency:
+                time.sleep(mock.latency)
+            template, status, content_type, payload = mock.route(
+                method, parsed.path, parse_qs(parsed.query), body
+            )
+            size = self.respond(status, content_type, payload)
+            mock.record(f"{method} {template}", size)
+
+        def do_GET(self):
+            self.handle_any("GET")
+
+        def do_POST(self):
+            self.handle_any("POST")
+
+        def do_PUT(self):
+            self.handle_any("PUT")
+
+        def do_DELETE(self):
+            self.handle_any("DELETE")
+
+    return Handler
+
+
+def serve(fleet_size, port=0, latency_ms=0, throttle_rate=None):
+    """Start the mock in a background thread, returns (server, mock)"""
+    mock = MockJamf(Fleet(fleet_size), latency_ms / 1000, throttle_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(mock))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, mock
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fleet-size", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--throttle-rate", type=float, default=None)
+    args = parser.parse_args()
+    server, _ = serve(args.fleet_size, args.port, args.latency_ms, args.throttle_rate)
+    print(f"Mock Jamf serving {args.fleet_size} computers on port {args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,229 @@
+"""End-to-end command benchmark against the local mock Jamf server.
+
+Run from the repository root:
+
+    python bench/run_bench.py --sizes 100,1000,10000 --latency-ms 20
+
+For every fleet size a mock Jamf (bench/mock_jamf.py) is started, then each
+SlackHandler.handle_* command runs in a fresh worker process so peak RSS
+belongs to that command alone. One JSON object per command is printed with
+wall time, Jamf call count, bytes transferred and peak RSS. The command runs
+with the same memo scope process_command uses, Slack itself is not called.
+
+Jamf client settings (JAMF_RATE_LIMIT, JAMF_MAX_CONCURRENCY, INVENTORY_STORE,
+...) are read from the environment as in production. The inventory store is
+off unless --store is given, then every worker starts from an empty store.
+
+A run Jamf never throttled must not have been slowed by the adaptive rate
+limiter, the benchmark exits non-zero when its rate dropped anyway.
+"""
+
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "bin"))
+
+# (handler, arguments) as a Slack user would type them after the command
+COMMANDS = [
+    ("help", ""),
+    ("details", "general mac-00001 mac-00002 mac-00003"),
+    ("log", "mac-00001"),
+    ("checkin", "all"),
+    ("count_computers", "general enrolledViaAutomatedDeviceEnrollment true"),
+    ("count_group", "group-1 false"),
+    ("chart", "bar model processor arch"),
+    ("chart", "pie group-1 group-2 group-3"),
+    ("appstore", "all"),
+    ("mdmexpiry", "all"),
+    ("reboots", "all"),
+    ("duplicates", "all"),
+    ("membership", "mac-00001"),
+    ("extattr", "all"),
+    ("extattr_values", "Last Startup"),
+    ("show_script", "all"),
+    ("files", ""),
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock(fleet_size, latency_ms, throttle_rate):
+    port = free_port()
+    command = [
+        sys.executable,
+        os.path.join(BENCH_DIR, "mock_jamf.py"),
+        "--fleet-size",
+        str(fleet_size),
+        "--port",
+        str(port),
+        "--latency-ms",
+        str(latency_ms),
+    ]
+    if throttle_rate:
+        command += ["--throttle-rate", str(throttle_rate)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    # building a 10k fleet takes a moment
+    for _ in range(600):
+        try:
+            requests.get(f"{url}/__stats", timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Mock Jamf did not start on {url}")
+
+
+def run_worker(url, handler_name, args, store_path):
+    """Run one command in this process and return its client-side numbers"""
+    os.environ.setdefault("JAMF_CLIENT_ID", "bench")
+    os.environ.setdefault("JAMF_CLIENT_SECRET", "bench")
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+    os.environ.setdefault("SLACK_SIGNING_SECRET", "bench")
+    os.environ.setdefault("SLACK_USER_TOKEN", "xoxp-bench")
+    os.environ.setdefault("SLACK_TOKEN_VERIFICATION", "false")
+    os.environ["INVENTORY_STORE"] = "sqlite" if store_path else "off"
+    if store_path:
+        os.environ["INVENTORY_STORE_PATH"] = store_path
+
+    import jamf_memo
+    from jamf_client import JamfClient
+    from slack_handler import SlackHandler
+
+    handler = SlackHandler(JamfClient(jss_url=url))
+    start = time.perf_counter()
+    error = None
+    try:
+        with jamf_memo.request_scope():
+            result = handler.run_command(handler_name, args)
+    except Exception as e:
+        result, error = None, f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    return {
+        "wall_s": round(wall, 4),
+        "result_chars": len(json.dumps(result, default=str)),
+        "error": error,
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "limiter": handler.jamf_client.limiter_stats(),
+    }
+
+
+def bench_command(url, fleet_size, handler_name, args, store_dir, timeout):
+    requests.post(f"{url}/__reset", timeout=5)
+    store_path = (
+        os.path.join(store_dir, f"inventory-{fleet_size}-{handler_name}.db")
+        if store_dir
+        else ""
+    )
+    worker = subprocess.run(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--worker",
+            json.dumps([url, handler_name, args, store_path]),
+        ],
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+    stats = requests.get(f"{url}/__stats", timeout=5).json()
+    record = {
+        "fleet_size": fleet_size,
+        "command": f"{handler_name} {args}".strip(),
+        "jamf_calls": stats["calls"],
+        "bytes": stats["bytes"],
+        "throttled": stats["throttled"],
+        "endpoints": stats["endpoints"],
+    }
+    if worker.returncode != 0:
+        record["error"] = worker.stderr.strip().splitlines()[-1:]
+        return record
+    # the worker prints the application's own logging before its result line
+    record.update(json.loads(worker.stdout.strip().splitlines()[-1]))
+    return record
+
+
+def check_unthrottled(record):
+    """Failure message when an unthrottled run was paced below the start rate"""
+    import jamf_ratelimit
+
+    limiter = record.get("limiter")
+    if limiter is None or record["throttled"] or limiter["throttled"]:
+        return None
+    if limiter["rate"] < jamf_ratelimit.INITIAL_RATE:
+        return (
+            f"{record['command']} at {record['fleet_size']} devices: the limiter "
+            f"slowed to {limiter['rate']} req/s without any throttling"
+        )
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument(
+        "--commands", default="", help="comma separated handler names, default all"
+    )
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--throttle-rate", type=float, default=None)
+    parser.add_argument("--store", action="store_true")
+    parser.add_argument("--timeout", type=float, default=900)
+    parser.add_argument("--output", help="also write the records to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(*json.loads(args.worker))))
+        return
+
+    selected = set(filter(None, args.commands.split(",")))
+    commands = [
+        command for command in COMMANDS if not selected or command[0] in selected
+    ]
+    records, failures = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fleet_size in [int(size) for size in args.sizes.split(",")]:
+            mock, url = start_mock(fleet_size, args.latency_ms, args.throttle_rate)
+            try:
+                for handler_name, command_args in commands:
+                    record = bench_command(
+                        url,
+                        fleet_size,
+                        handler_name,
+                        command_args,
+                        tmp if args.store else None,
+                        args.timeout,
+                    )
+                    print(json.dumps(record), flush=True)
+                    records.append(record)
+                    failure = check_unthrottled(record)
+                    if failure:
+                        failures.append(failure)
+            finally:
+                mock.terminate()
+                mock.wait()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(records, f, indent=2)
+    if failures:
+        sys.exit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
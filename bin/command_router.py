@@ -0,0 +1,161 @@
+import re
+import slack_commands
+
+PLACEHOLDER = re.compile(r"^(<([^>]+)>|\[([^\]]+)\])$")
+# computer_name1 [computer_name2] ... collapses into one list argument
+NUMBERED = re.compile(r"^(\w+?)(\d+)$")
+# a "quoted phrase" is one token
+TOKEN = re.compile(r'"([^"]*)"|\S+')
+END = object()
+
+
+class Param:
+    """One argument of a command grammar"""
+
+    def __init__(self, name, required, kind="word"):
+        self.name = name
+        self.required = required
+        # word: one token (the first word argument takes any surplus words),
+        # bool: true/false, list: every remaining token, literal: the name itself
+        self.kind = kind
+
+    def convert(self, value):
+        if self.kind == "bool":
+            if value.lower() not in ("true", "false"):
+                raise ValueError(f"`{self.name}` must be `true` or `false`")
+            return value.lower() == "true"
+        if self.kind == "literal" and value.lower() != self.name:
+            raise ValueError(f"expected `{self.name}`, got `{value}`")
+        return value
+
+
+class Command:
+    """Registry entry: grammar, permissions, help and handler of one command"""
+
+    def __init__(self, key, usage, permissions=(), help_text=None):
+        self.key = key
+        self.usage = usage
+        self.permissions = frozenset(permissions)
+        self.help = help_text
+        self.handler = f"handle_{key}"
+        self.phrase = tuple(key.split("_"))
+        tokens = usage.split()
+        if tuple(token.lower() for token in tokens[: len(self.phrase)]) != self.phrase:
+            raise ValueError(
+                f"Usage of `{key}` must start with {' '.join(self.phrase)}"
+            )
+        self.params = self.compile(tokens[len(self.phrase) :])
+
+    @staticmethod
+    def compile(tokens):
+        params = []
+        for token in tokens:
+            match = PLACEHOLDER.match(token)
+            if match is None:
+                params.append(Param(token.lower(), True, "literal"))
+                continue
+            name = match.group(2) or match.group(3)
+            required = match.group(2) is not None
+            numbered = NUMBERED.match(name)
+            if numbered and params and params[-1].name == f"{numbered.group(1)}s":
+                continue
+            if numbered:
+                params.append(Param(f"{numbered.group(1)}s", required, "list"))
+            elif name.endswith("true_false"):
+                params.append(Param(name, required, "bool"))
+            else:
+                params.append(Param(name, required))
+        if any(param.kind == "list" for param in params[:-1]):
+            raise ValueError(f"Only the last argument can be repeated: {tokens}")
+        return params
+
+    def parse(self, args):
+        """Typed arguments for args, raises ValueError carrying the usage"""
+        tokens = list(TOKEN.finditer(args))
+        required = sum(param.required for param in self.params)
+        if len(tokens) < required or (tokens and not self.params):
+            raise ValueError(f"Usage: `{self.usage}`")
+        values = {}
+        surplus = len(tokens) - len(self.params)
+        absorbed = surplus <= 0 or self.params[-1].kind == "list"
+        position = 0
+        try:
+            for param in self.params:
+                if param.kind == "list":
+                    values[param.name] = [unquote(token) for token in tokens[position:]]
+                    position = len(tokens)
+                    continue
+                if position >= len(tokens):
+                    values[param.name] = None
+                    continue
+                width = 1
+                if param.kind == "word" and not absorbed:
+                    # multi-word names like group and script names, as typed
+                    width, absorbed = 1 + surplus, True
+                first, last = tokens[position], tokens[position + width - 1]
+                value = (
+                    unquote(first) if width == 1 else args[first.start() : last.end()]
+                )
+                position += width
+                values[param.name] = param.convert(value)
+        except ValueError as e:
+            raise ValueError(f"{e}. Usage: `{self.usage}`")
+        if position < len(tokens):
+            raise ValueError(f"Usage: `{self.usage}`")
+        return values
+
+
+def unquote(token):
+    return token.group(1) if token.group(1) is not None else token.group()
+
+
+class CommandRouter:
+    """Word trie from command phrases ("count group", ...) to registry entries"""
+
+    def __init__(self, commands):
+        self.commands = {}
+        self.trie = {}
+        for command in commands:
+            self.commands[command.key] = command
+            # "count group" and the legacy "count_group" spelling
+            for phrase in {command.phrase, (command.key,)}:
+                node = self.trie
+                for word in phrase:
+                    node = node.setdefault(word, {})
+                node[END] = command
+
+    def __iter__(self):
+        return iter(self.commands.values())
+
+    def get(self, key):
+        return self.commands.get(key)
+
+    def route(self, text):
+        """Return (command, args) for the longest phrase text starts with.
+
+        command is None when text does not start with a known command.
+        """
+        node, found = self.trie, (None, text.strip())
+        for word in re.finditer(r"\S+", text):
+            node = node.get(word.group().lower())
+            if node is None:
+                break
+            if END in node:
+                found = (node[END], text[word.end() :].strip())
+        return found
+
+
+def build_router(commands=slack_commands.SlackCommands):
+    return CommandRouter(
+        Command(
+            key,
+            usage,
+            commands.cmd_permissions.get(key, ()),
+            commands.helpmessage.get(key),
+        )
+        for key, usage in commands.commands.items()
+    )
+
+
+# compiled once per instance, at import
+ROUTER = build_router()
@@ -1,133 +1,349 @@
-from quickchart import QuickChart, QuickChartFunction
+import hashlib
+import json
+import os
 import random
+import threading
+from collections import OrderedDict
+import tracing
 
-qc = QuickChart()
+# "quickchart" links to an image rendered by quickchart.io, "local" renders
+# a PNG in process (needs matplotlib) that is uploaded to Slack as a file
+CHART_RENDERER = os.environ.get("CHART_RENDERER", "quickchart").lower()
+CHART_CACHE_SIZE = int(os.environ.get("CHART_CACHE_SIZE", "128"))
+# Slack rejects image blocks with longer URLs, those use a short URL
+MAX_IMAGE_URL = 3000
+# predefined segment colors, these are pretty
+SEGMENT_COLORS = ["#28EB4F", "#ff6384", "#ffcd56", "#4bc0c0", "#9966ff", "#ff9f40"]
 
 
-def random_color():
-    """Generate a random color in hex format."""
-    return "#{:06x}".format(random.randint(0, 0xFFFFFF))
+def label_color(label):
+    """Stable color for a label, so a cached chart looks the same as a new one"""
+    return "#{:06x}".format(random.Random(str(label)).randint(0, 0xFFFFFF))
 
 
-def get_current_chart(labels, current_counts, chart_type, text):
-    """
-    Create a chart with current counts for each specified Jamf smart group.
+def chart_key(chart_type, labels, counts, text):
+    """Content hash identifying a chart"""
+    payload = json.dumps([chart_type, labels, counts, text])
+    return hashlib.sha256(payload.encode()).hexdigest()
 
-    Args:
-        labels: List of smart group names.
-        current_counts: List of member counts for each group.
-        text: Title of the chart.
-        chart_type: Type of chart to generate (default: "bar").
 
-    Returns:
-        URL of the generated chart.
-    """
-    qc.background_color = "rgba(0, 0, 0, 0)"
-    # predefined segment colors, these are pretty
-    segment_colors = ["#28EB4F", "#ff6384", "#ffcd56", "#4bc0c0", "#9966ff", "#ff9f40"]
-    # create a list of colors based on the number of labels
-    if len(labels) > len(segment_colors):
-        # if there are more labels than predefined colors, randomize additional colors
-        additional_colors = [
-            random_color() for _ in range(len(labels) - len(segment_colors))
-        ]
-        segment_colors += additional_colors
-
-    # use only as many colors as there are labels
-    segment_colors = segment_colors[: len(labels)]
-    qc.background_color = "rgba(0, 0, 0, 0)"
-    if chart_type == "pie" or chart_type == "doughnut":
-        cutout_percentage = (
-            50 if chart_type == "doughnut" else 0
-        )  # default for doughnut
-        datasets = [
-            {
-                "data": current_counts,
-                "backgroundColor": segment_colors,
-                "borderColor": "#fff",
-                "borderWidth": 2,
+class Chart:
+    """A rendered chart, either an image URL or PNG bytes to upload"""
+
+    def __init__(self, key, title, url=None, png=None):
+        self.key = key
+        self.title = title
+        self.url = url
+        self.png = png
+
+    def to_message(self, alt_text):
+        """Blocks (and files to upload) showing this chart in Slack"""
+        if self.url:
+            return {
+                "blocks": [
+                    {"type": "image", "image_url": self.url, "alt_text": alt_text}
+                ]
             }
-        ]
-        options = {
-            "title": {"display": True, "text": text},
-            "responsive": True,
-            "legend": {"position": "right"},
-            "cutoutPercentage": cutout_percentage,  # specific for doughnut chart
+        return {
+            "blocks": [
+                {
+                    "type": "section",
+                    "text": {"type": "mrkdwn", "text": f"*{self.title}* (attached)"},
+                }
+            ],
+            "files": [
+                {
+                    "filename": f"chart-{self.key[:12]}.png",
+                    "content": self.png,
+                    "title": self.title,
+                }
+            ],
         }
-    elif chart_type == "horizontalBar":
-        datasets = [
-            {
-                "data": current_counts,
-                "backgroundColor": segment_colors,
+
+
+class ChartCache:
+    """Least recently used charts by content hash"""
+
+    def __init__(self, size=CHART_CACHE_SIZE):
+        self.size = size
+        self.charts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            chart = self.charts.get(key)
+            if chart is not None:
+                self.charts.move_to_end(key)
+            return chart
+
+    def put(self, chart):
+        with self.lock:
+            self.charts[chart.key] = chart
+            self.charts.move_to_end(chart.key)
+            while len(self.charts) > self.size:
+                self.charts.popitem(last=False)
+
+
+class QuickChartRenderer:
+    """Chart.js config rendered by quickchart.io behind an image URL"""
+
+    def __init__(self):
+        # loaded on the first chart rather than on every cold start
+        from quickchart import QuickChart
+
+        # one instance per chart, concurrent commands must not share its config
+        self.qc = QuickChart()
+        self.qc.background_color = "rgba(0, 0, 0, 0)"
+
+    def render(self, key, labels, counts, chart_type, text):
+        from quickchart import QuickChartFunction
+
+        segment_colors = list(SEGMENT_COLORS)
+        # create a list of colors based on the number of labels
+        if len(labels) > len(segment_colors):
+            # if there are more labels than predefined colors, randomize additional colors
+            additional_colors = [
+                label_color(label) for label in labels[len(segment_colors) :]
+            ]
+            segment_colors += additional_colors
+
+        # use only as many colors as there are labels
+        segment_colors = segment_colors[: len(labels)]
+        if chart_type == "pie" or chart_type == "doughnut":
+            cutout_percentage = (
+                50 if chart_type == "doughnut" else 0
+            )  # default for doughnut
+            datasets = [
+                {
+                    "data": counts,
+                    "backgroundColor": segment_colors,
+                    "borderColor": "#fff",
+                    "borderWidth": 2,
+                }
+            ]
+            options = {
+                "title": {"display": True, "text": text},
+                "responsive": True,
+                "legend": {"position": "right"},
+                "cutoutPercentage": cutout_percentage,  # specific for doughnut chart
             }
-        ]
-        options = {
-            "scales": {
-                "xAxes": [
-                    {
-                        "gridLines": {
+        elif chart_type == "horizontalBar":
+            datasets = [
+                {
+                    "data": counts,
+                    "backgroundColor": segment_colors,
+                }
+            ]
+            options = {
+                "scales": {
+                    "xAxes": [
+                        {
+                            "gridLines": {
+                                "display": True,
+                                "drawOnChartArea": False,
+                                "tickMarkLength": 8,
+                                "zeroLineWidth": 1,
+                                "zeroLineColor": "black",
+                                "color": "black",
+                            }
+                        }
+                    ],
+                    "yAxes": [
+                        {
                             "display": True,
-                            "drawOnChartArea": False,
-                            "tickMarkLength": 8,
-                            "zeroLineWidth": 1,
-                            "zeroLineColor": "black",
-                            "color": "black",
+                            "position": "left",
+                            "gridLines": {
+                                "display": True,
+                                "drawOnChartArea": False,
+                                "tickMarkLength": 8,
+                                "color": "black",
+                            },
                         }
+                    ],
+                },
+                "legend": {"display": False},
+                "plugins": {
+                    "datalabels": {
+                        "anchor": "end",
+                        "align": "end",
+                        "color": "blue",
+                        "font": {
+                            "size": 10,
+                            "weight": "bold",
+                        },
                     }
-                ],
-                "yAxes": [
+                },
+            }
+            self.qc.width = 800
+            self.qc.height = 600
+            self.qc.device_pixel_ratio = 2.0
+        else:
+            # default to bar
+            datasets = [
+                {
+                    "label": "Current",
+                    "data": counts,
+                    "backgroundColor": QuickChartFunction(
+                        "getGradientFillHelper('vertical', ['#00FF00', '#FFA500', '#FF0000'])"
+                    ),
+                }
+            ]
+            options = {
+                "title": {"display": True, "text": text},
+                "scales": {"xAxes": [{"stacked": True}], "yAxes": [{"stacked": True}]},
+                "plugins": {"roundedBars": True},
+            }
+
+        # config based on chart type
+        self.qc.config = {
+            "type": chart_type,
+            "data": {"labels": labels, "datasets": datasets},
+            "options": options,
+        }
+        url = self.qc.get_url()
+        if len(url) > MAX_IMAGE_URL:
+            # long label lists would not fit, store the config on quickchart.io
+            url = self.qc.get_short_url()
+        return Chart(key, text, url=url)
+
+    def render_lines(self, key, labels, series, text):
+        colors = SEGMENT_COLORS + [label_color(name) for name in series]
+        self.qc.config = {
+            "type": "line",
+            "data": {
+                "labels": labels,
+                "datasets": [
                     {
-                        "display": True,
-                        "position": "left",
-                        "gridLines": {
-                            "display": True,
-                            "drawOnChartArea": False,
-                            "tickMarkLength": 8,
-                            "color": "black",
-                        },
+                        "label": name,
+                        "data": counts,
+                        "borderColor": color,
+                        "fill": False,
+                        "spanGaps": True,
                     }
+                    for (name, counts), color in zip(series.items(), colors)
                 ],
             },
-            "legend": {"display": False},
-            "plugins": {
-                "datalabels": {
-                    "anchor": "end",
-                    "align": "end",
-                    "color": "blue",
-                    "font": {
-                        "size": 10,
-                        "weight": "bold",
-                    },
-                }
-            },
+            "options": {"title": {"display": True, "text": text}},
         }
-        qc.width = 800
-        qc.height = 600
-        qc.device_pixel_ratio = 2.0
-    else:
-        # default to bar
-        datasets = [
-            {
-                "label": "Current",
-                "data": current_counts,
-                "backgroundColor": QuickChartFunction(
-                    "getGradientFillHelper('vertical', ['#00FF00', '#FFA500', '#FF0000'])"
-                ),
-            }
+        url = self.qc.get_url()
+        if len(url) > MAX_IMAGE_URL:
+            url = self.qc.get_short_url()
+        return Chart(key, text, url=url)
+
+
+class LocalRenderer:
+    """PNG rendered in process with matplotlib, works without quickchart.io"""
+
+    def __init__(self):
+        import matplotlib
+
+        matplotlib.use("Agg")
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=(8, 6), dpi=100)
+
+    def render(self, key, labels, counts, chart_type, text):
+        colors = (SEGMENT_COLORS + [label_color(label) for label in labels])[
+            : len(labels)
         ]
-        options = {
-            "title": {"display": True, "text": text},
-            "scales": {"xAxes": [{"stacked": True}], "yAxes": [{"stacked": True}]},
-            "plugins": {"roundedBars": True},
-        }
+        axes = self.figure.subplots()
+        if chart_type in ("pie", "doughnut"):
+            axes.pie(
+                counts,
+                labels=labels,
+                colors=colors,
+                wedgeprops={"width": 0.5} if chart_type == "doughnut" else None,
+            )
+            axes.axis("equal")
+        elif chart_type == "horizontalBar":
+            axes.barh(labels, counts, color=colors)
+            axes.invert_yaxis()
+            for position, count in enumerate(counts):
+                axes.annotate(str(count), (count, position), va="center")
+        else:
+            axes.bar(labels, counts, color=colors)
+        axes.set_title(text)
+        return self.save(key, text)
+
+    def save(self, key, text):
+        import io
+
+        self.figure.tight_layout()
+        output = io.BytesIO()
+        self.figure.savefig(output, format="png", transparent=True)
+        return Chart(key, text, png=output.getvalue())
+
+    def render_lines(self, key, labels, series, text):
+        colors = SEGMENT_COLORS + [label_color(name) for name in series]
+        axes = self.figure.subplots()
+        for (name, counts), color in zip(series.items(), colors):
+            # gaps are samples where the group could not be counted
+            axes.plot(
+                labels,
+                [float("nan") if count is None else count for count in counts],
+                label=name,
+                color=color,
+                marker=".",
+            )
+        axes.legend()
+        axes.set_title(text)
+        axes.tick_params(axis="x", labelrotation=45)
+        return self.save(key, text)
+
 
-    # config based on chart type
-    qc.config = {
-        "type": chart_type,
-        "data": {"labels": labels, "datasets": datasets},
-        "options": options,
-    }
+RENDERERS = {"quickchart": QuickChartRenderer, "local": LocalRenderer}
+_cache = ChartCache()
 
-    chart_url = qc.get_url()
 
-    return chart_url
+def get_renderer(name=CHART_RENDERER):
+    """A new renderer instance of the configured backend"""
+    if name == "local":
+        try:
+            return LocalRenderer()
+        except ImportError:
+            tracing.log("warning", "matplotlib is not installed, using quickchart")
+            return QuickChartRenderer()
+    return RENDERERS[name]()
+
+
+def render_chart(labels, counts, chart_type, text, renderer=None):
+    """Render a chart, reusing an identical chart rendered before"""
+    labels, counts = list(labels), list(counts)
+    key = chart_key(chart_type, labels, counts, text)
+    chart = _cache.get(key)
+    if chart is None:
+        chart = (renderer or get_renderer()).render(
+            key, labels, counts, chart_type, text
+        )
+        _cache.put(chart)
+    return chart
+
+
+def render_trend(labels, series, text, renderer=None):
+    """Line chart of {name: counts} over the labels, cached like render_chart"""
+    labels = list(labels)
+    series = {name: list(counts) for name, counts in series.items()}
+    key = chart_key("line", labels, series, text)
+    chart = _cache.get(key)
+    if chart is None:
+        chart = (renderer or get_renderer()).render_lines(key, labels, series, text)
+        _cache.put(chart)
+    return chart
+
+
+def get_current_chart(labels, current_counts, chart_type, text):
+    """
+    Create a chart with current counts for each specified Jamf smart group.
+
+    Args:
+        labels: List of smart group names.
+        current_counts: List of member counts for each group.
+        text: Title of the chart.
+        chart_type: Type of chart to generate (default: "bar").
+
+    Returns:
+        URL of the generated chart (QuickChart backend).
+    """
+    return render_chart(
+        labels, current_counts, chart_type, text, renderer=QuickChartRenderer()
+    ).url
@@ -0,0 +1,260 @@
+import os
+import sqlite3
+import threading
+import time
+import tracing
+
+# "sqlite" keeps the history in a local file, which on Cloud Functions is
+# per instance and lost on a cold start, "gcs" keeps the file in a Cloud
+# Storage bucket shared by every instance, "off" disables trend charts
+GROUP_HISTORY = os.environ.get("GROUP_HISTORY", "sqlite").lower()
+GROUP_HISTORY_PATH = os.environ.get(
+    "GROUP_HISTORY_PATH", "/tmp/jackaas_group_history.db"
+)
+GROUP_HISTORY_BUCKET = os.environ.get("GROUP_HISTORY_BUCKET")
+GROUP_HISTORY_OBJECT = os.environ.get(
+    "GROUP_HISTORY_OBJECT", "jackaas/group_history.db"
+)
+# uploads that lost a race with another instance are re-applied this often
+GROUP_HISTORY_SYNC_ATTEMPTS = 5
+# comma separated smart groups to sample, every smart group when empty
+GROUP_HISTORY_GROUPS = [
+    name.strip()
+    for name in os.environ.get("GROUP_HISTORY_GROUPS", "").split(",")
+    if name.strip()
+]
+# trend charts cover this many days
+GROUP_HISTORY_DAYS = float(os.environ.get("GROUP_HISTORY_DAYS", "90"))
+# (age, bucket) in seconds: points older than age are averaged per bucket,
+# so raw samples are kept for two days, hourly points for a month, then daily
+DOWNSAMPLING = ((2 * 86400, 3600), (30 * 86400, 86400))
+
+
+class GroupHistory:
+    """Append-only series of smart group member counts in SQLite"""
+
+    def __init__(self, jamf_client, path=GROUP_HISTORY_PATH):
+        self.jamf = jamf_client
+        self.path = path
+        self.lock = threading.Lock()
+        self.initialised = False
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        if not self.initialised:
+            # group names are stored once, each point is three integers
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS groups "
+                "(id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS counts ("
+                "group_id INTEGER NOT NULL, ts INTEGER NOT NULL, "
+                "count INTEGER NOT NULL, PRIMARY KEY (group_id, ts)) WITHOUT ROWID"
+            )
+            db.commit()
+            self.initialised = True
+        return db
+
+    def group_ids(self, db, names):
+        db.executemany(
+            "INSERT OR IGNORE INTO groups (name) VALUES (?)",
+            [(name,) for name in names],
+        )
+        return dict(db.execute("SELECT name, id FROM groups").fetchall())
+
+    def append(self, counts, ts=None):
+        """Store {group name: count} as one sample taken at ts"""
+        ts = int(ts if ts is not None else time.time())
+        with self.lock:
+            db = self.connect()
+            try:
+                ids = self.group_ids(db, counts)
+                db.executemany(
+                    "INSERT OR REPLACE INTO counts (group_id, ts, count) "
+                    "VALUES (?, ?, ?)",
+                    [(ids[name], ts, count) for name, count in counts.items()],
+                )
+                db.commit()
+            finally:
+                db.close()
+
+    def downsample(self, now=None):
+        """Average old points per bucket, returns the number of rows removed"""
+        now = int(now if now is not None else time.time())
+        removed = 0
+        with self.lock:
+            db = self.connect()
+            try:
+                for age, bucket in DOWNSAMPLING:
+                    # only whole buckets older than age are merged
+                    cutoff = (now - age) // bucket * bucket
+                    merged = db.execute(
+                        "SELECT group_id, ts / ? AS slot, AVG(count), COUNT(*) "
+                        "FROM counts WHERE ts < ? GROUP BY group_id, slot "
+                        "HAVING COUNT(*) > 1",
+                        (bucket, cutoff),
+                    ).fetchall()
+                    for group_id, slot, average, points in merged:
+                        start = slot * bucket
+                        db.execute(
+                            "DELETE FROM counts WHERE group_id = ? "
+                            "AND ts >= ? AND ts < ?",
+                            (group_id, start, start + bucket),
+                        )
+                        db.execute(
+                            "INSERT INTO counts (group_id, ts, count) "
+                            "VALUES (?, ?, ?)",
+                            (group_id, start, round(average)),
+                        )
+                        removed += points - 1
+                db.commit()
+            finally:
+                db.close()
+        return removed
+
+    def series(self, names, days=GROUP_HISTORY_DAYS):
+        """{group name: [(ts, count), ...]} for the last days, oldest first"""
+        since = int(time.time() - days * 86400)
+        db = self.connect()
+        try:
+            rows = db.execute(
+                "SELECT groups.name, counts.ts, counts.count FROM counts "
+                "JOIN groups ON groups.id = counts.group_id "
+                "WHERE counts.ts >= ? AND groups.name IN "
+                f"({', '.join('?' * len(names))}) ORDER BY counts.ts",
+                (since, *names),
+            ).fetchall()
+        finally:
+            db.close()
+        series = {name: [] for name in names}
+        for name, ts, count in rows:
+            series[name].append((ts, count))
+        return series
+
+    def sample(self, group_names=None):
+        """Count the groups concurrently and append them as one sample"""
+        with tracing.span("group history sample") as sample_span:
+            names = (
+                group_names
+                or GROUP_HISTORY_GROUPS
+                or self.jamf.groups.get_smart_group_names()
+            )
+            counts = {
+                name: count
+                for name, count in self.jamf.membership.counts(names).items()
+                if count is not None
+            }
+            if counts:
+                self.append(counts)
+            removed = self.downsample()
+            sample_span.set(
+                groups=len(counts),
+                missing=len(names) - len(counts),
+                downsampled=removed,
+            )
+            return counts
+
+
+class GCSGroupHistory(GroupHistory):
+    """GroupHistory whose SQLite file is kept in a Cloud Storage object.
+
+    The local file is a copy of the object, downloaded again whenever its
+    generation changed and uploaded after every change with a generation
+    precondition, so concurrent instances never overwrite each other.
+    """
+
+    def __init__(
+        self,
+        jamf_client,
+        bucket=GROUP_HISTORY_BUCKET,
+        object_name=GROUP_HISTORY_OBJECT,
+        path=GROUP_HISTORY_PATH,
+    ):
+        super().__init__(jamf_client, path)
+        if not bucket:
+            raise ValueError("GROUP_HISTORY=gcs needs GROUP_HISTORY_BUCKET")
+        self.bucket = bucket
+        self.object_name = object_name
+        self._blob = None
+        # generation of the object the local copy was read from, 0 when the
+        # object does not exist yet
+        self.generation = None
+        self.sync_lock = threading.Lock()
+
+    @property
+    def blob(self):
+        if self._blob is None:
+            # optional dependency, only needed when this backend is selected
+            from google.cloud import storage
+
+            self._blob = storage.Client().bucket(self.bucket).blob(self.object_name)
+        return self._blob
+
+    def pull(self):
+        """Refresh the local copy when the object changed since it was read"""
+        from google.api_core.exceptions import NotFound
+
+        try:
+            self.blob.reload()
+        except NotFound:
+            self.generation = 0
+            return
+        if self.blob.generation != self.generation:
+            self.blob.download_to_filename(self.path)
+            self.generation = self.blob.generation
+
+    def push(self):
+        """Upload the local copy, False when another instance wrote first"""
+        from google.api_core.exceptions import PreconditionFailed
+
+        try:
+            self.blob.upload_from_filename(
+                self.path, if_generation_match=self.generation
+            )
+        except PreconditionFailed:
+            return False
+        self.generation = self.blob.generation
+        return True
+
+    def synced(self, change):
+        """Apply change to the latest copy and upload it"""
+        with self.sync_lock:
+            for _ in range(GROUP_HISTORY_SYNC_ATTEMPTS):
+                self.pull()
+                result = change()
+                if self.push():
+                    return result
+                tracing.log("info", "Group history changed concurrently, retrying")
+            raise RuntimeError(
+                f"Could not update gs://{self.bucket}/{self.object_name}"
+            )
+
+    def append(self, counts, ts=None):
+        # fixed up front so a retried upload stores the same sample
+        ts = int(ts if ts is not None else time.time())
+        return self.synced(lambda: GroupHistory.append(self, counts, ts))
+
+    def downsample(self, now=None):
+        now = int(now if now is not None else time.time())
+        return self.synced(lambda: GroupHistory.downsample(self, now))
+
+    def series(self, names, days=GROUP_HISTORY_DAYS):
+        with self.sync_lock:
+            self.pull()
+        return super().series(names, days)
+
+
+BACKENDS = {
+    "sqlite": GroupHistory,
+    "gcs": GCSGroupHistory,
+}
+
+
+def get_history(jamf_client, backend=GROUP_HISTORY):
+    """The configured history for jamf_client, or None when disabled"""
+    if backend == "off":
+        return None
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown group history backend: {backend}")
+    return BACKENDS[backend](jamf_client)
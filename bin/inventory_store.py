@@ -0,0 +1,196 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import tracing
+from datetime import datetime, timedelta, timezone
+
+# "off" makes every reader go to Jamf directly
+INVENTORY_STORE = os.environ.get("INVENTORY_STORE", "sqlite").lower()
+INVENTORY_STORE_PATH = os.environ.get(
+    "INVENTORY_STORE_PATH", "/tmp/jackaas_inventory.db"
+)
+# readers accept data this many seconds old before a delta sync runs
+INVENTORY_MAX_AGE = float(os.environ.get("INVENTORY_MAX_AGE", "900"))
+# deltas cannot see everything (e.g. edited records without a new report)
+INVENTORY_FULL_SYNC_INTERVAL = float(
+    os.environ.get("INVENTORY_FULL_SYNC_INTERVAL", "86400")
+)
+# re-read a little before the last sync to cover clock skew with Jamf
+SYNC_OVERLAP = timedelta(minutes=5)
+# extension attributes are reported under the section their definition is
+# displayed in, so every section jamf_extattrs reads them from is kept
+STORED_SECTIONS = (
+    "GENERAL",
+    "HARDWARE",
+    "OPERATING_SYSTEM",
+    "USER_AND_LOCATION",
+    "PURCHASING",
+    "EXTENSION_ATTRIBUTES",
+)
+
+
+class InventoryStore:
+    def __init__(
+        self, jamf_client, path=INVENTORY_STORE_PATH, max_age=INVENTORY_MAX_AGE
+    ):
+        self.jamf = jamf_client
+        self.path = path
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.initialised = False
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        if not self.initialised:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS computers ("
+                "id INTEGER PRIMARY KEY, name TEXT, serial TEXT, username TEXT, "
+                "report_date TEXT, last_contact TEXT, record TEXT NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            db.commit()
+            self.initialised = True
+        return db
+
+    def get_meta(self, db, key, default=None):
+        row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def age(self):
+        """Seconds since the last sync, None if the store was never synced"""
+        db = self.connect()
+        try:
+            synced_at = self.get_meta(db, "synced_at")
+        finally:
+            db.close()
+        return time.time() - float(synced_at) if synced_at else None
+
+    def is_fresh(self, max_age=None):
+        age = self.age()
+        max_age = self.max_age if max_age is None else max_age
+        return age is not None and age < max_age
+
+    def sync(self, full=False, max_age=None):
+        """Bring the store up to date, fetching only changed devices if possible.
+
+        With max_age set, the sync is skipped when another thread brought the
+        store within that age while we waited for the lock.
+        """
+        with self.lock:
+            if max_age is not None and self.is_fresh(max_age):
+                return
+            with tracing.span("inventory sync") as sync_span:
+                db = self.connect()
+                try:
+                    started = datetime.now(timezone.utc)
+                    since = self.get_meta(db, "last_sync")
+                    last_full_sync = float(self.get_meta(db, "last_full_sync", 0))
+                    sections = ",".join(STORED_SECTIONS)
+                    full = (
+                        full
+                        or since is None
+                        # records stored without a newly added section
+                        or self.get_meta(db, "sections") != sections
+                        or time.time() - last_full_sync > INVENTORY_FULL_SYNC_INTERVAL
+                    )
+                    if full:
+                        records = self.jamf.inventory.get_inventory(
+                            STORED_SECTIONS, use_store=False
+                        )
+                        known_ids = {int(record["id"]) for record in records}
+                    else:
+                        records = self.jamf.inventory.get_inventory(
+                            STORED_SECTIONS,
+                            rsql_filter=(
+                                f'general.reportDate>="{since}",'
+                                f'general.lastContactTime>="{since}"'
+                            ),
+                            use_store=False,
+                        )
+                        # the light classic list tells us which devices were deleted
+                        known_ids = {
+                            int(computer["id"])
+                            for computer in self.jamf.endpoint_details.get_all_computers()[
+                                "computers"
+                            ]
+                        }
+                    db.executemany(
+                        "INSERT OR REPLACE INTO computers "
+                        "(id, name, serial, username, report_date, last_contact, record) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [self.row(record) for record in records],
+                    )
+                    if records.partial:
+                        # the devices that were read are stored, but a device
+                        # missing from a cut short read was not deleted, and the
+                        # unread changes must be fetched again next time
+                        db.commit()
+                        sync_span.set(full=full, records=len(records), partial=True)
+                        return
+                    stored_ids = {
+                        row[0] for row in db.execute("SELECT id FROM computers")
+                    }
+                    db.executemany(
+                        "DELETE FROM computers WHERE id = ?",
+                        [(computer_id,) for computer_id in stored_ids - known_ids],
+                    )
+                    meta = {
+                        "last_sync": (started - SYNC_OVERLAP).strftime(
+                            "%Y-%m-%dT%H:%M:%SZ"
+                        ),
+                        "synced_at": str(time.time()),
+                    }
+                    if full:
+                        meta["last_full_sync"] = meta["synced_at"]
+                        meta["sections"] = sections
+                    db.executemany(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                        meta.items(),
+                    )
+                    db.commit()
+                    sync_span.set(full=full, records=len(records))
+                finally:
+                    db.close()
+
+    def row(self, record):
+        general = record.get("general") or {}
+        hardware = record.get("hardware") or {}
+        location = record.get("userAndLocation") or {}
+        return (
+            int(record["id"]),
+            record.get("name"),
+            hardware.get("serialNumber"),
+            location.get("username"),
+            general.get("reportDate"),
+            general.get("lastContactTime"),
+            json.dumps(record),
+        )
+
+    def get_records(self, sections, fields=None, max_age=None):
+        """Stored records trimmed like JamfInventory.get_inventory results"""
+        max_age = self.max_age if max_age is None else max_age
+        if not self.is_fresh(max_age):
+            self.sync(max_age=max_age)
+        db = self.connect()
+        try:
+            rows = db.execute("SELECT record FROM computers ORDER BY id").fetchall()
+        finally:
+            db.close()
+        return [
+            self.jamf.inventory.compact(json.loads(row[0]), sections, fields)
+            for row in rows
+        ]
+
+    def covers(self, sections):
+        return set(sections) <= set(STORED_SECTIONS)
+
+
+def get_store(jamf_client):
+    """The configured store for jamf_client, or None when disabled"""
+    if INVENTORY_STORE == "off":
+        return None
+    return InventoryStore(jamf_client)
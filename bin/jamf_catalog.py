@@ -0,0 +1,68 @@
+import math
+import threading
+import time
+import jamf_fanout
+
+
+class Refresher:
+    """Runs a load at most once per TTL, concurrent callers wait for one load"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.built_at = None
+        self.lock = threading.Lock()
+
+    def is_fresh(self, max_age=None):
+        """Loaded within max_age seconds, the TTL by default"""
+        max_age = self.ttl if max_age is None else max_age
+        return self.built_at is not None and time.monotonic() - self.built_at < max_age
+
+    def invalidate(self):
+        with self.lock:
+            self.built_at = None
+
+    def refresh(self, load, force=False, max_age=None):
+        """Call load() unless fresh, it returns False when its data must not be cached"""
+        with self.lock:
+            # another thread may have loaded it while we waited on the lock
+            if not force and self.is_fresh(max_age):
+                return
+            cache = load()
+            self.built_at = None if cache is False else time.monotonic()
+
+    def ensure(self, load):
+        if not self.is_fresh():
+            self.refresh(load)
+
+
+def fetch_pages(jamf_client, path, page_size, label, sort="name%3Aasc"):
+    """Every item of a paginated Jamf API v1 collection, pages read concurrently"""
+
+    def fetch_page(page):
+        response = jamf_client.jamf_comm(
+            f"{jamf_client.jss_url_apiv1}/{path}"
+            f"?page={page}&page-size={page_size}&sort={sort}",
+            method="GET",
+            headers=jamf_client.json_get_headers,
+        )
+        if response is None or response.status_code != 200:
+            status_code = response.status_code if response is not None else None
+            raise ValueError(
+                f"Failed to fetch {label} page {page}. Status code: {status_code}"
+            )
+        return response.json()
+
+    first_page = fetch_page(0)
+    pages = [first_page]
+    page_count = math.ceil(first_page.get("totalCount", 0) / page_size)
+    if page_count > 1:
+        outcome = jamf_fanout.FanOut().run(
+            fetch_page, range(1, page_count), label=f"{label} pages", truncate=True
+        )
+        if outcome.errors:
+            # a missing page would hide items from every lookup
+            raise outcome.errors[0][1]
+        if outcome.partial:
+            raise ValueError(f"Reading {label} was cut short by the command deadline")
+        pages.extend(outcome.results)
+    return [item for page in pages for item in page["results"]]
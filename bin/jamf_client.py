@@ -1,6 +1,10 @@
 import os
+import time
 import requests
-import jamf_groups, jamf_utils, jamf_orchestra, jamf_scripts
+import jamf_groups, jamf_utils, jamf_orchestra, jamf_scripts, jamf_session, jamf_token
+import jamf_inventory, jamf_index, jamf_memo, jamf_ratelimit
+import inventory_store, group_history, jamf_membership, jamf_extattrs
+import tracing
 
 
 class JamfClient:
@@ -9,7 +13,11 @@ class JamfClient:
         self.jss_client_id = os.environ.get("JAMF_CLIENT_ID")
         self.jss_client_secret = os.environ.get("JAMF_CLIENT_SECRET")
         self.jss_token_headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        self.jamf_token = self.get_api_token()
+        # shared by every client for the same instance and credentials, the
+        # first token is only requested once a call actually needs it
+        self.tokens = jamf_token.get_token_manager(
+            (self.jss_url, self.jss_client_id), self.request_api_token
+        )
         self.jss_url_api = f"{self.jss_url}/JSSResource"
         self.jss_url_apiv1 = f"{self.jss_url}/api/v1"
         self.jss_url_api_grps = f"{self.jss_url_api}/computergroups"
@@ -17,21 +25,30 @@ class JamfClient:
         self.jss_url_api_computername = f"{self.jss_url_api_computers}/name"
         self.jss_url_api_computerId = f"{self.jss_url_api_computers}/id"
         self.jss_url_api_computer_basic = f"{self.jss_url_api_computers}/subset/basic"
-        self.json_get_headers = {
-            "accept": "application/json",
-            "Authorization": f"Bearer {self.jamf_token}",
-        }
-        self.xml_post_headers = {
-            "Content-Type": "application/xml",
-            "Authorization": f"Bearer {self.jamf_token}",
-        }
-        self.text_get_headers = {"Authorization": f"Bearer {self.jamf_token}"}
+        # the Authorization header is added by jamf_comm on each request
+        self.json_get_headers = {"accept": "application/json"}
+        self.xml_post_headers = {"Content-Type": "application/xml"}
+        self.text_get_headers = {}
+        self.inventory = jamf_inventory.JamfInventory(self)
+        self.inventory_store = inventory_store.get_store(self)
+        self.group_history = group_history.get_history(self)
+        self.computer_index = jamf_index.ComputerIndex(self)
         self.groups = jamf_groups.JamfGroups(self)
+        self.membership = jamf_membership.GroupMembership(self)
         self.endpoint_details = jamf_utils.JamfUtils(self)
         self.orchestra = jamf_orchestra.JamfOrchestra(self)
         self.scripts = jamf_scripts.JamfScripts(self)
+        self.extattrs = jamf_extattrs.ExtensionAttributes(self)
+
+    @property
+    def jamf_token(self):
+        return self.tokens.get_token()
 
     def get_api_token(self):
+        return self.tokens.get_token()
+
+    def request_api_token(self):
+        """Exchange the client credentials for a (token, expires_in) tuple"""
         # jamf_url = f"{self.jss_url}/api/v1/auth/token"
         jamf_url = f"{self.jss_url}/api/oauth/token"
         # headers = {"Accept": "application/json"}
@@ -42,34 +59,91 @@ class JamfClient:
         }
 
         response = self.jamf_comm(
-            jamf_url, method="POST", headers=self.jss_token_headers, data=data
+            jamf_url,
+            method="POST",
+            headers=self.jss_token_headers,
+            data=data,
+            auth=False,
         )
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             response_json = response.json()
             access_token = response_json.get("access_token")
-            return access_token
+            expires_in = response_json.get("expires_in", 0)
+            return access_token, expires_in
         else:
-            raise Exception(
-                f"Failed to get API token. Status code: {response.status_code}"
+            status_code = response.status_code if response is not None else None
+            raise Exception(f"Failed to get API token. Status code: {status_code}")
+
+    def jamf_comm(
+        self, url, method="GET", headers=None, data=None, timeout=None, auth=True
+    ):
+        if method not in ("GET", "POST", "PUT", "DELETE"):
+            raise ValueError("Invalid HTTP method")
+        memo = jamf_memo.current()
+        if method == "GET" and memo is not None and not jamf_memo.is_excluded(url):
+            # reads repeated within one command are served from the memo
+            accept = (headers or {}).get("accept")
+            return memo.get_or_fetch(
+                (url, accept),
+                lambda: self.send_request(url, method, headers, data, timeout, auth),
             )
+        return self.send_request(url, method, headers, data, timeout, auth)
 
-    def jamf_comm(self, url, method="GET", headers=None, data=None):
-        try:
-            if method == "GET":
-                if headers is None:
-                    response = requests.get(url)
-                response = requests.get(url, headers=headers)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, data=data)
-            elif method == "PUT":
-                response = requests.put(url, headers=headers, data=data)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=headers)
-            # Add more methods as needed (PUT, DELETE, etc.)
-            else:
-                raise ValueError("Invalid HTTP method")
+    def send_request(self, url, method, headers, data, timeout, auth):
+        limiter = jamf_ratelimit.get_limiter()
+        auth_retried = False
+        attempt = 0
+        with tracing.jamf_call(method, url) as call_span:
+            try:
+                while True:
+                    request_headers = dict(headers or {})
+                    if auth:
+                        token = self.tokens.get_token()
+                        request_headers["Authorization"] = f"Bearer {token}"
+                    waited = time.monotonic()
+                    limiter.acquire()
+                    call_span.add(
+                        "wait_ms", round((time.monotonic() - waited) * 1000, 2)
+                    )
+                    # all calls share one pooled keep-alive session
+                    response = jamf_session.get_session().request(
+                        method,
+                        url,
+                        headers=request_headers,
+                        data=data,
+                        timeout=timeout or jamf_session.get_timeout(),
+                    )
+                    call_span.set(
+                        status=response.status_code,
+                        bytes=len(response.content),
+                        retries=attempt + auth_retried,
+                    )
+                    # a token revoked or expired server-side gets one fresh retry
+                    if auth and response.status_code == 401 and not auth_retried:
+                        auth_retried = True
+                        self.tokens.invalidate(token)
+                        continue
+                    if response.status_code in jamf_ratelimit.THROTTLE_STATUSES:
+                        limiter.on_throttle(
+                            jamf_ratelimit.parse_retry_after(
+                                response.headers.get("Retry-After")
+                            )
+                        )
+                        if (
+                            method in jamf_ratelimit.IDEMPOTENT_METHODS
+                            and attempt < jamf_ratelimit.MAX_RETRIES
+                        ):
+                            limiter.on_retry(attempt)
+                            attempt += 1
+                            continue
+                        return response
+                    limiter.on_success()
+                    return response
+            except requests.exceptions.RequestException as e:
+                call_span.set(error=f"{type(e).__name__}: {e}")
+                tracing.log("error", "Error in API communication", error=str(e))
+                return None
 
-            return response
-        except requests.exceptions.RequestException as e:
-            print(f"Error in API communication: {e}")
-            return None
+    def limiter_stats(self):
+        """Waits, retries, throttles and current rate of the shared limiter"""
+        return jamf_ratelimit.get_limiter().stats()
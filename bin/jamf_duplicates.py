@@ -0,0 +1,100 @@
+from datetime import datetime, timezone
+
+# every inventory field the report needs, read in one bulk pass
+DUPLICATE_FIELDS = {
+    "general": ["lastContactTime", "lastEnrolledDate"],
+    "hardware": ["serialNumber"],
+}
+# Slack rejects messages with more blocks than this
+MAX_BLOCKS = 50
+NEVER = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+class DuplicateRecord:
+    """The parts of one inventory record that identify and date it"""
+
+    def __init__(self, record):
+        general = record.get("general") or {}
+        hardware = record.get("hardware") or {}
+        self.id = record["id"]
+        self.name = record.get("name")
+        self.serial = hardware.get("serialNumber")
+        self.last_contact = parse_timestamp(general.get("lastContactTime"))
+        self.enrolled = parse_timestamp(general.get("lastEnrolledDate"))
+
+    def age_key(self):
+        # records that never checked in sort as the oldest
+        return (self.last_contact or NEVER, self.enrolled or NEVER, int(self.id))
+
+    def describe(self, title):
+        return (
+            f"*{title}:*\nID: {self.id}\nSerial No: {self.serial or 'N/A'}\n"
+            f"Name: {self.name}\nLast Contact: {self.last_contact or 'N/A'}\n"
+            f"Enrolled: {self.enrolled or 'N/A'}"
+        )
+
+
+def find_duplicates(records):
+    """Group records sharing a serial number, then those sharing a name.
+
+    Returns (reason, [DuplicateRecord, ...]) sets oldest first. A name set is
+    only reported when its records are not already one serial set. Names with
+    an underscore are shared on purpose (loaners, labs) and are skipped.
+    """
+    by_serial, by_name = {}, {}
+    for record in records:
+        computer = DuplicateRecord(record)
+        if computer.serial:
+            by_serial.setdefault(computer.serial, []).append(computer)
+        if computer.name and "_" not in computer.name:
+            by_name.setdefault(computer.name, []).append(computer)
+    duplicates = []
+    reported = set()
+    for serial, computers in by_serial.items():
+        if len(computers) > 1:
+            duplicates.append((f"Serial No {serial}", computers))
+            reported.add(frozenset(computer.id for computer in computers))
+    for name, computers in by_name.items():
+        ids = frozenset(computer.id for computer in computers)
+        if len(computers) > 1 and ids not in reported:
+            duplicates.append((f"Name {name}", computers))
+    for _, computers in duplicates:
+        computers.sort(key=DuplicateRecord.age_key)
+    return duplicates
+
+
+def duplicate_blocks(duplicates):
+    """Block Kit sections comparing the oldest and newest record of each set"""
+    blocks = []
+    for reason, computers in duplicates:
+        blocks.append(
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*{reason}* ({len(computers)} records)",
+                },
+                "fields": [
+                    {"type": "mrkdwn", "text": computers[0].describe("Oldest Record")},
+                    {"type": "mrkdwn", "text": computers[-1].describe("Newest Record")},
+                ],
+            }
+        )
+    return blocks
+
+
+def chunk_messages(header, blocks, limit=MAX_BLOCKS):
+    """Split blocks into messages of at most limit blocks, header on the first"""
+    messages = []
+    remaining = list(header) + list(blocks)
+    while remaining:
+        messages.append({"blocks": remaining[:limit]})
+        remaining = remaining[limit:]
+    return messages
@@ -0,0 +1,143 @@
+import os
+from collections import Counter
+from datetime import datetime
+import inventory_store
+import jamf_catalog
+import tracing
+
+EXTATTR_PAGE_SIZE = int(os.environ.get("JAMF_EXTATTR_PAGE_SIZE", "100"))
+# definitions and the value index are rebuilt at least this often
+EXTATTR_TTL = float(os.environ.get("JAMF_EXTATTR_TTL", "300"))
+# ID or name of the extension attribute holding the last boot time
+LAST_STARTUP_EA = os.environ.get("JAMF_LAST_STARTUP_EA", "29")
+LAST_STARTUP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Jamf reports an attribute under the section its definition is displayed
+# in, the inventory store keeps all of them so the index is built offline
+EXTATTR_SECTIONS = inventory_store.STORED_SECTIONS
+
+
+class ExtensionAttributes:
+    """Extension attribute definitions by name and ID, and their device values.
+
+    Values are kept per attribute in columns (computer IDs and values side
+    by side), built from one bulk inventory pass, so fleet-wide questions
+    about an attribute never fetch individual devices.
+    """
+
+    def __init__(self, jamf_client, ttl=EXTATTR_TTL):
+        self.jamf = jamf_client
+        self.by_name = {}
+        self.by_id = {}
+        self.catalog_refresher = jamf_catalog.Refresher(ttl)
+        # definition ID -> (computer IDs, values), computer ID -> name
+        self.columns = {}
+        self.computer_names = {}
+        self.index_refresher = jamf_catalog.Refresher(ttl)
+
+    def load_catalog(self):
+        with tracing.span("extension attribute catalog") as catalog_span:
+            definitions = sorted(
+                jamf_catalog.fetch_pages(
+                    self.jamf,
+                    "computer-extension-attributes",
+                    EXTATTR_PAGE_SIZE,
+                    "extension attributes",
+                ),
+                key=lambda item: item["name"],
+            )
+            self.by_name = {item["name"]: item for item in definitions}
+            self.by_id = {str(item["id"]): item for item in definitions}
+            catalog_span.set(definitions=len(definitions))
+
+    def catalog(self):
+        """{name: definition} of every extension attribute"""
+        self.catalog_refresher.ensure(self.load_catalog)
+        return self.by_name
+
+    def get(self, name_or_id):
+        """Definition by name or ID, None when there is no such attribute"""
+        self.catalog()
+        return self.by_name.get(name_or_id) or self.by_id.get(str(name_or_id))
+
+    def load_index(self):
+        with tracing.span("extension attribute index") as index_span:
+            records = self.jamf.inventory.get_inventory(list(EXTATTR_SECTIONS))
+            columns, names = {}, {}
+            for record in records:
+                computer_id = int(record["id"])
+                names[computer_id] = record["name"]
+                for attribute in record_attributes(record):
+                    values = attribute.get("values") or []
+                    computer_ids, column = columns.setdefault(
+                        str(attribute["definitionId"]), ([], [])
+                    )
+                    computer_ids.append(computer_id)
+                    column.append(values[0] if values else None)
+            self.columns, self.computer_names = columns, names
+            index_span.set(
+                computers=len(names), attributes=len(columns), partial=records.partial
+            )
+            # a partial read answers this command but is not cached
+            return not records.partial
+
+    def column(self, name_or_id):
+        """(computer IDs, values) of one attribute across the fleet"""
+        try:
+            definition = self.get(name_or_id)
+        except ValueError:
+            if not str(name_or_id).isdigit():
+                raise
+            definition = None
+        if definition is not None:
+            definition_id = str(definition["id"])
+        elif str(name_or_id).isdigit():
+            # an ID is usable even when the definitions cannot be listed
+            definition_id = str(name_or_id)
+        else:
+            raise ValueError(f"Extension attribute `{name_or_id}` not found.")
+        self.index_refresher.ensure(self.load_index)
+        return self.columns.get(definition_id, ([], []))
+
+    def values(self, name_or_id, computer_ids):
+        """{computer ID: value} of one attribute for the given computers"""
+        column_ids, column = self.column(name_or_id)
+        wanted = {int(computer_id) for computer_id in computer_ids}
+        return {
+            computer_id: value
+            for computer_id, value in zip(column_ids, column)
+            if computer_id in wanted
+        }
+
+    def distribution(self, name_or_id):
+        """Counter of the attribute's values over the fleet, empty values skipped"""
+        return Counter(value for value in self.column(name_or_id)[1] if value)
+
+    def older_than(self, name_or_id, threshold, date_format=LAST_STARTUP_FORMAT):
+        """[(computer name, date)] whose date value is before threshold"""
+        column_ids, column = self.column(name_or_id)
+        older = []
+        for computer_id, value in zip(column_ids, column):
+            if not value:
+                continue
+            try:
+                date = datetime.strptime(value, date_format)
+            except ValueError:
+                tracing.log_sampled(
+                    "warning",
+                    "Invalid extension attribute date",
+                    computer_id=computer_id,
+                    value=value,
+                )
+                continue
+            if date < threshold:
+                older.append((self.computer_names.get(computer_id), date))
+        return older
+
+
+def record_attributes(record):
+    """Extension attribute values of an inventory record, from every section"""
+    for key, value in record.items():
+        if key == "extensionAttributes":
+            yield from value or []
+        elif isinstance(value, dict):
+            yield from value.get("extensionAttributes") or []
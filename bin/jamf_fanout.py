@@ -0,0 +1,173 @@
+import asyncio
+import contextvars
+import os
+import threading
+from collections import Counter
+import jamf_session
+import slack_progress
+import tracing
+
+# process-wide cap on Jamf calls in flight across every fan-out
+MAX_CONCURRENCY = int(
+    os.environ.get("JAMF_MAX_CONCURRENCY", str(jamf_session.MAX_WORKERS))
+)
+TASK_TIMEOUT = float(os.environ.get("JAMF_TASK_TIMEOUT", "60"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# set inside fan-out tasks so a nested fan-out runs inline instead of
+# waiting on the pool it is itself occupying
+_in_fanout = contextvars.ContextVar("jamf_in_fanout", default=False)
+
+
+def get_pool():
+    """Return the shared pool that runs the blocking Jamf calls"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = jamf_session.executor(MAX_CONCURRENCY)
+    return _pool
+
+
+async def run_blocking(fn, *args):
+    """Await a blocking call on the shared pool, keeping the caller's context"""
+    context = contextvars.copy_context()
+    context.run(_in_fanout.set, True)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), context.run, fn, *args)
+
+
+class FanOutResult:
+    def __init__(self):
+        self.results = []
+        self.errors = []
+        # set when the command deadline cut the run short
+        self.partial = False
+
+    def error_summary(self, label="tasks"):
+        """Summarise failures by exception type in a single line"""
+        if not self.errors:
+            return None
+        total = len(self.results) + len(self.errors)
+        kinds = Counter(type(error).__name__ for _, error in self.errors)
+        detail = ", ".join(f"{name} x{count}" for name, count in kinds.most_common())
+        return f"{len(self.errors)} of {total} {label} failed: {detail}"
+
+    def log_errors(self, label="tasks"):
+        summary = self.error_summary(label)
+        if summary:
+            tracing.log("warning", summary)
+
+
+class FanOut:
+    """Bounded fan-out driven by an asyncio loop.
+
+    Blocking callables (every Jamf call, which goes through requests) still
+    run on the shared thread pool, so at most MAX_CONCURRENCY of them are in
+    flight however many tasks the loop holds.
+    """
+
+    def __init__(self, concurrency=MAX_CONCURRENCY, timeout=TASK_TIMEOUT):
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    async def stream(self, fn, items, ordered=False):
+        """Run fn over items, yielding (item, result, error) tuples.
+
+        fn is either a coroutine function or a blocking callable, the latter
+        runs on the shared pool. Results come in input order when ordered is
+        set, otherwise as they complete.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        is_async = asyncio.iscoroutinefunction(fn)
+
+        async def run_one(item):
+            async with semaphore:
+                try:
+                    call = fn(item) if is_async else run_blocking(fn, item)
+                    result = await asyncio.wait_for(call, self.timeout)
+                    return item, result, None
+                except Exception as exc:
+                    return item, None, exc
+
+        tasks = [asyncio.ensure_future(run_one(item)) for item in items]
+        try:
+            pending = tasks if ordered else asyncio.as_completed(tasks)
+            for task in pending:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def gather(
+        self, fn, items, ordered=True, label="tasks", render=None, truncate=False
+    ):
+        """Collect every outcome, reporting progress to the current command.
+
+        With a progress reporter active, progress (and render(results) as a
+        partial preview) is pushed to Slack as results arrive. With truncate
+        set, collection stops once the command deadline passes, only
+        read-only fan-outs may set it, a cut short write is never reported.
+        """
+        with tracing.span("fanout", label=label, items=len(items)) as fanout_span:
+            outcome = FanOutResult()
+            reporter = slack_progress.current()
+            total = len(items)
+            async for item, result, error in self.stream(fn, items, ordered=ordered):
+                if error is not None:
+                    outcome.errors.append((item, error))
+                else:
+                    outcome.results.append(result)
+                if reporter is None:
+                    continue
+                done = len(outcome.results) + len(outcome.errors)
+                if truncate and done < total and reporter.expired():
+                    outcome.partial = True
+                    reporter.mark_truncated(done, total, label)
+                    break
+                reporter.update(
+                    done,
+                    total,
+                    label,
+                    partial=(lambda: render(outcome.results)) if render else None,
+                )
+            fanout_span.set(
+                done=len(outcome.results),
+                errors=len(outcome.errors),
+                partial=outcome.partial,
+            )
+            return outcome
+
+    def run(self, fn, items, ordered=True, label="tasks", render=None, truncate=False):
+        """Synchronous facade around gather() for the Slack handlers"""
+        items = list(items)
+        if _in_fanout.get():
+            outcome = FanOutResult()
+            for item in items:
+                try:
+                    result = fn(item)
+                    if asyncio.iscoroutine(result):
+                        result = asyncio.run(result)
+                    outcome.results.append(result)
+                except Exception as exc:
+                    outcome.errors.append((item, exc))
+            return outcome
+        return asyncio.run(
+            self.gather(
+                fn,
+                items,
+                ordered=ordered,
+                label=label,
+                render=render,
+                truncate=truncate,
+            )
+        )
+
+    def map(self, fn, items, label="tasks", ordered=True, render=None, truncate=False):
+        """Run fn over items and return the truthy results, logging failures"""
+        outcome = self.run(
+            fn, items, ordered=ordered, label=label, render=render, truncate=truncate
+        )
+        outcome.log_errors(label)
+        return [result for result in outcome.results if result]
@@ -1,6 +1,32 @@
-import time
+import asyncio
 import re
-from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+import jamf_fanout
+import jamf_inventory
+import tracing
+
+
+class GroupXML:
+    """computer_group XML written piece by piece, every value escaped"""
+
+    def __init__(self, group_name, is_smart):
+        self.parts = ["<computer_group>"]
+        self.element("name", group_name)
+        self.element("is_smart", is_smart)
+
+    def open(self, tag):
+        self.parts.append(f"<{tag}>")
+
+    def close(self, tag):
+        self.parts.append(f"</{tag}>")
+
+    def element(self, tag, value):
+        self.parts.append(f"<{tag}>{escape(str(value))}</{tag}>")
+
+    def finish(self):
+        """UTF-8 body, kept whole so a retried request can resend it"""
+        self.close("computer_group")
+        return "".join(self.parts).encode("utf-8")
 
 
 class JamfGroups:
@@ -10,6 +36,7 @@ class JamfGroups:
         self.json_get_headers = self.jamf.json_get_headers
         self.xml_post_headers = self.jamf.xml_post_headers
         self.jss_url_api_grps = self.jamf.jss_url_api_grps
+        self.fanout = jamf_fanout.FanOut()
 
     def create_group(
         self,
@@ -20,108 +47,121 @@ class JamfGroups:
         priority="0",
         and_or="and",
     ):
-        response = self.jamf.jamf_comm(
-            self.jss_url_api_grps, method="GET", headers=self.json_get_headers
-        )
-        if response.status_code == 200:
-            data = response.json()
-            computer_groups = data.get("computer_groups", [])
-            # Get the ID for the new group
-            new_group_id = max(group["id"] for group in computer_groups) + 1
-        else:
-            print(f"Failed to get computer groups: {response.text}")
-            return None
-
         if is_smart == "true":
-            # Create XML for the new group
-            xml_template = f"""
-            <computer_group>
-                <name>{group_name}</name>
-                <is_smart>{is_smart}</is_smart>
-                <criteria>
-                    <criterion>
-                        <name>{criterion_name}</name>
-                        <priority>{priority}</priority>
-                        <and_or>{and_or}</and_or>
-                        <search_type>is</search_type>
-                        <value>{group_name}</value>
-                        <opening_paren>false</opening_paren>
-                        <closing_paren>false</closing_paren>
-                    </criterion>
-                </criteria>
-            </computer_group>
-            """
+            xml_template = self.create_smart_group_template(
+                group_name, criterion_name, priority, and_or
+            )
+        elif computers:
+            xml_template = self.create_static_group_template(group_name, computers)
         else:
-            if computers:
-                xml_template = self.create_static_group_template(
-                    group_name, computers, is_smart="false"
-                )
-            else:
-                print("No computers specified for the static group.")
-                return None
-        url = f"{self.jss_url_api_grps}/id/{new_group_id}"
+            tracing.log("warning", "No computers specified for the static group")
+            return None
+        # ID 0 lets Jamf allocate the next free ID
         response = self.jamf.jamf_comm(
-            url, method="POST", headers=self.xml_post_headers, data=xml_template
+            f"{self.jss_url_api_grps}/id/0",
+            method="POST",
+            headers=self.xml_post_headers,
+            data=xml_template,
         )
-        if response and response.status_code == 201:
-            print(f"Smart group '{group_name}' created successfully.")
+        if response is not None and response.status_code in (200, 201):
+            tracing.log("info", "Group created", group=group_name)
+            # the cached group list does not know the new group yet
+            self.jamf.membership.invalidate(group_name)
             return response
-        else:
-            print(f"Failed to create smart group '{group_name}': {response.text}")
-            return None
-
-    def create_static_group_template(self, group_name, computers, is_smart="false"):
-        computer_entries = "\n".join(
-            f"""
-            <computer>
-                <serial_number>{serial_number}</serial_number>
-            </computer>
-            """
-            for serial_number in enumerate(computers, start=1)
+        tracing.log(
+            "warning",
+            "Failed to create group",
+            group=group_name,
+            status=response.status_code if response is not None else None,
+            error=response.text if response is not None else None,
         )
-        xml_template = f"""
-        <computer_group>
-            <name>{group_name}</name>
-            <is_smart>{is_smart}</is_smart>
-            <computers>
-                {computer_entries}
-            </computers>
-        </computer_group>
+        return None
+
+    def create_groups(self, groups):
+        """Create many groups concurrently.
+
+        Args:
+            groups: dicts of create_group keyword arguments, e.g.
+                {"group_name": "Lab", "is_smart": "false", "computers": [...]}.
+
+        Returns:
+            [(group_name, status), ...] in the order given, status is one of
+            "created", "failed", "timed out" (the POST may still have created
+            the group) or "not attempted".
         """
-        return xml_template
+        # POSTs are never cut short by the command deadline (no truncate)
+        outcome = self.fanout.run(
+            lambda group: (
+                group["group_name"],
+                "created" if self.create_group(**group) is not None else "failed",
+            ),
+            groups,
+            label="groups",
+        )
+        outcome.log_errors("groups")
+        results = dict(outcome.results)
+        for group, error in outcome.errors:
+            # a timed out request keeps running and may still create the group
+            results[group["group_name"]] = (
+                "timed out" if isinstance(error, asyncio.TimeoutError) else "failed"
+            )
+        return [
+            (group["group_name"], results.get(group["group_name"], "not attempted"))
+            for group in groups
+        ]
+
+    def create_smart_group_template(self, group_name, criterion_name, priority, and_or):
+        xml = GroupXML(group_name, "true")
+        xml.open("criteria")
+        xml.open("criterion")
+        xml.element("name", criterion_name)
+        xml.element("priority", priority)
+        xml.element("and_or", and_or)
+        xml.element("search_type", "is")
+        xml.element("value", group_name)
+        xml.element("opening_paren", "false")
+        xml.element("closing_paren", "false")
+        xml.close("criterion")
+        xml.close("criteria")
+        return xml.finish()
+
+    def create_static_group_template(self, group_name, computers, is_smart="false"):
+        xml = GroupXML(group_name, is_smart)
+        xml.open("computers")
+        for serial_number in computers:
+            xml.open("computer")
+            xml.element("serial_number", serial_number)
+            xml.close("computer")
+        xml.close("computers")
+        return xml.finish()
+
+    def get_smart_group_names(self):
+        """Names of every smart computer group"""
+        groups = self.jamf.membership.get_groups()
+        return [name for name, group in groups.items() if group["smart"]]
 
     def count_computers_in_smart_group(self, group_name, create_missing):
-        url = f"{self.jss_url_api_grps}/name/{group_name}"
-        response = self.jamf.jamf_comm(url, method="GET", headers=self.json_get_headers)
-        if response.status_code == 200:
-            data = response.json()
-            computers = data.get("computer_group", {}).get("computers", [])
-            return len(computers)
-        else:
-            if create_missing:
-                print(f"Testing to create smart group {group_name}")
-                time.sleep(2)
-                try:
-                    criterion_name = "Operating System Version"
-                    resp2 = self.create_group(
-                        group_name, is_smart="true", criterion_name=criterion_name
-                    )
-                    if resp2 and resp2.status_code == 200:
-                        response = self.jamf.jamf_comm(
-                            url, method="GET", headers=self.json_get_headers
-                        )
-                        if response.status_code == 200:
-                            data = response.json()
-                            computers = data.get("computer_group", {}).get(
-                                "computers", []
-                            )
-                            return len(computers)
-                except Exception as e:
-                    return (
-                        f"Failed to count computers in smart group '{group_name}': {e}"
-                    )
-            else:
-                return f"Failed to count computers in smart group '{group_name}': {response.text}"
+        try:
+            count = self.jamf.membership.count(group_name)
+        except ValueError as e:
+            return f"Failed to count computers in smart group '{group_name}': {e}"
+        if count is not None:
+            return count
+        if not create_missing:
+            return f"Failed to count computers in smart group '{group_name}': group not found"
+        tracing.log("info", "Creating missing smart group", group=group_name)
+        try:
+            criterion_name = "Operating System Version"
+            resp2 = self.create_group(
+                group_name, is_smart="true", criterion_name=criterion_name
+            )
+            if resp2 is not None:
+                count = self.jamf.membership.count(group_name)
+                if count is not None:
+                    return count
+        except Exception as e:
+            return f"Failed to count computers in smart group '{group_name}': {e}"
+        return f"Failed to count computers in smart group '{group_name}': group not created"
 
     def fetch_computer_details(self, id, category):
         return self.jamf.endpoint_details.get_computer_details(id, category)
@@ -129,30 +169,25 @@ class JamfGroups:
     def count_computers_subset(self, category, key, value_to_check):
         """Counts computers in the specified category where the key has the value_to_check"""
         count = 0
-        all_computers = self.jamf.endpoint_details.get_all_computers()
-        all_computer_ids = [
-            comp["id"] for comp in all_computers["computers"] if "_" not in comp["name"]
-        ]
+        category = jamf_inventory.section_key(category)
         if value_to_check.lower() == "true":
             value_to_check = True
         elif value_to_check.lower() == "false":
             value_to_check = False
         if key == "ade":
             key = "enrolledViaAutomatedDeviceEnrollment"
-        with ThreadPoolExecutor() as executor:
-            futures = [
-                executor.submit(self.fetch_computer_details, id, category)
-                for id in all_computer_ids
-            ]
-
-            for future in futures:
-                computer_details = future.result()
-                print(f"computer details: {computer_details}")
-                if computer_details and key in computer_details:
-                    if computer_details[key] == value_to_check:
-                        count += 1
-
-        print(f"We're returning count: {count}")
+        records = self.jamf.inventory.get_inventory(
+            [jamf_inventory.section_name(category)], fields={category: [key]}
+        )
+        for record in records:
+            if "_" in (record["name"] or ""):
+                continue
+            computer_details = record.get(category)
+            if computer_details and key in computer_details:
+                if computer_details[key] == value_to_check:
+                    count += 1
+
+        tracing.log("debug", "Counted computers subset", count=count)
         return count
 
     def extract_group_names(self, command):
@@ -0,0 +1,171 @@
+import os
+import jamf_catalog
+import jamf_fanout
+import tracing
+
+INDEX_TTL = float(os.environ.get("JAMF_INDEX_TTL", "300"))
+# batches up to this size are resolved with a server-side filter
+BATCH_FILTER_LIMIT = int(os.environ.get("JAMF_INDEX_BATCH_FILTER_LIMIT", "10"))
+# many unknown keys rebuild the index at most this often, in between they
+# are looked up in filtered batches (typos and retired devices stay unknown)
+INDEX_REBUILD_INTERVAL = float(os.environ.get("JAMF_INDEX_REBUILD_INTERVAL", "60"))
+
+
+def rsql_quote(value):
+    """Quote a value for use inside an RSQL filter"""
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+class ComputerIndex:
+    def __init__(self, jamf_client, ttl=INDEX_TTL):
+        self.jamf = jamf_client
+        self.ttl = ttl
+        self.by_name = {}
+        self.by_serial = {}
+        self.by_username = {}
+        self.refresher = jamf_catalog.Refresher(ttl)
+
+    def is_fresh(self):
+        return self.refresher.is_fresh()
+
+    def invalidate(self):
+        """Force the next lookup to rebuild the index"""
+        self.refresher.invalidate()
+
+    def refresh(self, force=False):
+        """Rebuild the index from the inventory store or the classic basic subset"""
+        self.refresher.refresh(self.load, force=force)
+
+    def load(self):
+        with tracing.span("index refresh"):
+            if self.jamf.inventory_store is not None:
+                self.build_from_store()
+                return
+            response = self.jamf.jamf_comm(
+                self.jamf.jss_url_api_computer_basic,
+                method="GET",
+                headers=self.jamf.json_get_headers,
+            )
+            if response is None or response.status_code != 200:
+                status_code = response.status_code if response is not None else None
+                raise ValueError(
+                    f"Failed to fetch computers for the index. Status code: {status_code}"
+                )
+            by_name, by_serial, by_username = {}, {}, {}
+            for computer in response.json().get("computers", []):
+                computer_id = int(computer["id"])
+                # keep the first record on duplicates, like the old linear scan
+                by_name.setdefault(computer.get("name"), computer_id)
+                by_serial.setdefault(computer.get("serial_number"), computer_id)
+                if computer.get("username"):
+                    by_username.setdefault(computer["username"], computer_id)
+            self.by_name, self.by_serial, self.by_username = (
+                by_name,
+                by_serial,
+                by_username,
+            )
+
+    def build_from_store(self):
+        records = self.jamf.inventory_store.get_records(
+            ["HARDWARE", "USER_AND_LOCATION"],
+            fields={"hardware": ["serialNumber"], "userAndLocation": ["username"]},
+        )
+        self.by_name, self.by_serial, self.by_username = self.index_records(records)
+
+    def index_records(self, records):
+        """Name, serial and username mappings from compact inventory records"""
+        by_name, by_serial, by_username = {}, {}, {}
+        for record in records:
+            computer_id = int(record["id"])
+            by_name.setdefault(record["name"], computer_id)
+            by_serial.setdefault(
+                (record["hardware"] or {}).get("serialNumber"), computer_id
+            )
+            username = (record["userAndLocation"] or {}).get("username")
+            if username:
+                by_username.setdefault(username, computer_id)
+        return by_name, by_serial, by_username
+
+    def lookup(self, key, mappings=None):
+        """Look a key up as name, then serial, then username"""
+        for mapping in mappings or (self.by_name, self.by_serial, self.by_username):
+            if key in mapping:
+                return mapping[key]
+        return None
+
+    def resolve(self, key):
+        """Resolve one computer name, serial or username to its ID"""
+        return self.resolve_many([key]).get(key)
+
+    def resolve_many(self, keys):
+        """Resolve many names, serials or usernames to IDs in one go.
+
+        Returns:
+            {key: computer_id or None} for every key passed in.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not self.is_fresh() and 0 < len(keys) <= BATCH_FILTER_LIMIT:
+            return self.resolve_filtered(keys)
+        if not self.is_fresh():
+            self.refresh()
+        resolved = {key: self.lookup(key) for key in keys}
+        missing = [key for key, computer_id in resolved.items() if computer_id is None]
+        if missing:
+            # enrolled or renamed since the index was built
+            resolved.update(self.resolve_missing(missing))
+        return resolved
+
+    def resolve_missing(self, keys):
+        """Look keys absent from a fresh index up in Jamf, adding what is found"""
+        if len(keys) > BATCH_FILTER_LIMIT and not self.refresher.is_fresh(
+            INDEX_REBUILD_INTERVAL
+        ):
+            store = self.jamf.inventory_store
+            if store is not None:
+                # the index is built from the store, which must see them first
+                store.sync(max_age=INDEX_REBUILD_INTERVAL)
+            self.refresher.refresh(self.load, max_age=INDEX_REBUILD_INTERVAL)
+            return {key: self.lookup(key) for key in keys}
+        chunks = [
+            keys[start : start + BATCH_FILTER_LIMIT]
+            for start in range(0, len(keys), BATCH_FILTER_LIMIT)
+        ]
+        outcome = jamf_fanout.FanOut().run(
+            self.fetch_filtered, chunks, label="computer lookups", truncate=True
+        )
+        if outcome.errors:
+            raise outcome.errors[0][1]
+        resolved = {key: None for key in keys}
+        with self.refresher.lock:
+            for mappings in outcome.results:
+                for index, found in zip(
+                    (self.by_name, self.by_serial, self.by_username), mappings
+                ):
+                    for key, computer_id in found.items():
+                        index.setdefault(key, computer_id)
+        for mappings in outcome.results:
+            for key in keys:
+                if resolved[key] is None:
+                    resolved[key] = self.lookup(key, mappings)
+        return resolved
+
+    def resolve_filtered(self, keys):
+        """Resolve a small batch with one filtered inventory request"""
+        mappings = self.fetch_filtered(keys)
+        return {key: self.lookup(key, mappings) for key in keys}
+
+    def fetch_filtered(self, keys):
+        """Name, serial and username mappings of the computers matching keys"""
+        values = ",".join(rsql_quote(key) for key in keys)
+        rsql_filter = (
+            f"general.name=in=({values}),"
+            f"hardware.serialNumber=in=({values}),"
+            f"userAndLocation.username=in=({values})"
+        )
+        records = self.jamf.inventory.get_inventory(
+            ["HARDWARE", "USER_AND_LOCATION"],
+            fields={"hardware": ["serialNumber"], "userAndLocation": ["username"]},
+            rsql_filter=rsql_filter,
+        )
+        return self.index_records(records)
@@ -0,0 +1,140 @@
+import math
+import os
+import re
+from urllib.parse import urlencode
+import jamf_fanout
+import tracing
+
+PAGE_SIZE = int(os.environ.get("JAMF_INVENTORY_PAGE_SIZE", "500"))
+
+
+def section_key(category):
+    """Map a user supplied category onto the inventory's section key"""
+    if "groupMemberships" not in category:
+        category = category.lower()
+    if category == "location":
+        category = "userAndLocation"
+    return category
+
+
+def section_name(key):
+    """Turn a section key like userAndLocation into USER_AND_LOCATION"""
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", key).upper()
+
+
+def key_for_section(section):
+    """Turn a section name like USER_AND_LOCATION into userAndLocation"""
+    first, *rest = section.lower().split("_")
+    return first + "".join(part.title() for part in rest)
+
+
+class InventoryRecords(list):
+    """get_inventory result, partial when the command deadline cut the read short.
+
+    The progress reporter already notes a truncated read on the Slack reply,
+    anything that caches or prunes on these records must check partial.
+    """
+
+    partial = False
+
+
+class JamfInventory:
+    def __init__(self, jamf_client):
+        self.jamf = jamf_client
+        self.url = f"{self.jamf.jss_url_apiv1}/computers-inventory"
+        self.json_get_headers = self.jamf.json_get_headers
+        self.fanout = jamf_fanout.FanOut()
+
+    def fetch_page(self, page, sections, page_size, rsql_filter=None):
+        params = [("section", section) for section in sections]
+        params += [("page", page), ("page-size", page_size), ("sort", "id:asc")]
+        if rsql_filter:
+            params.append(("filter", rsql_filter))
+        response = self.jamf.jamf_comm(
+            f"{self.url}?{urlencode(params)}",
+            method="GET",
+            headers=self.json_get_headers,
+        )
+        if response is None or response.status_code != 200:
+            status_code = response.status_code if response is not None else None
+            raise ValueError(
+                f"Failed to fetch inventory page {page}. Status code: {status_code}"
+            )
+        return response.json()
+
+    def compact(self, item, sections, fields=None):
+        """Reduce an inventory result to id, name and the requested sections"""
+        record = {
+            "id": item["id"],
+            "name": (item.get("general") or {}).get("name"),
+        }
+        for section in sections:
+            key = key_for_section(section)
+            value = item.get(key)
+            keep = (fields or {}).get(key)
+            if keep and isinstance(value, dict):
+                value = {name: value.get(name) for name in keep}
+            record[key] = value
+        return record
+
+    def get_inventory(
+        self, sections, fields=None, rsql_filter=None, page_size=None, use_store=True
+    ):
+        """Fetch the requested sections for every computer, pages in parallel.
+
+        Args:
+            sections: inventory sections, e.g. ["GENERAL", "HARDWARE"].
+            fields: optional {section_key: [keys]} to keep per section.
+            rsql_filter: optional RSQL filter applied server-side.
+            use_store: serve unfiltered reads from the local inventory store.
+
+        Returns:
+            InventoryRecords of compact records: {"id", "name", <section_key>: ...}.
+        """
+        page_size = page_size or PAGE_SIZE
+        sections = [section.upper() for section in sections]
+        with tracing.span(
+            "inventory", sections=",".join(sections), filtered=bool(rsql_filter)
+        ) as inventory_span:
+            store = self.jamf.inventory_store
+            if use_store and store and not rsql_filter and store.covers(sections):
+                inventory_span.set(source="store")
+                return InventoryRecords(store.get_records(sections, fields))
+            # GENERAL carries the computer name, only keep the name unless asked
+            request_sections = (
+                sections if "GENERAL" in sections else sections + ["GENERAL"]
+            )
+            first_page = self.fetch_page(0, request_sections, page_size, rsql_filter)
+            pages = [first_page]
+            inventory_span.set(source="jamf", total=first_page.get("totalCount", 0))
+            page_count = math.ceil(first_page.get("totalCount", 0) / page_size)
+            partial = False
+            if page_count > 1:
+                outcome = self.fanout.run(
+                    lambda page: self.fetch_page(
+                        page, request_sections, page_size, rsql_filter
+                    ),
+                    range(1, page_count),
+                    label="inventory pages",
+                    truncate=True,
+                )
+                if outcome.errors:
+                    # a missing page would silently skew every count built on it
+                    raise outcome.errors[0][1]
+                pages.extend(outcome.results)
+                partial = outcome.partial
+            records = InventoryRecords(
+                self.compact(item, sections, fields)
+                for page in pages
+                for item in page.get("results", [])
+            )
+            records.partial = partial
+            inventory_span.set(partial=partial)
+            if partial:
+                tracing.log(
+                    "warning",
+                    "Inventory read cut short by the command deadline",
+                    pages=len(pages),
+                    page_count=page_count,
+                )
+            return records
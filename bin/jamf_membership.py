@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+import jamf_fanout
+import tracing
+
+# group lists and member lists are re-read from Jamf at least this often
+GROUP_CACHE_TTL = float(os.environ.get("JAMF_GROUP_CACHE_TTL", "300"))
+
+
+class GroupMembership:
+    """Member IDs of computer groups, fetched concurrently and cached with a TTL"""
+
+    def __init__(self, jamf_client, ttl=GROUP_CACHE_TTL):
+        self.jamf = jamf_client
+        self.ttl = ttl
+        # group name -> {"id", "smart"}
+        self.groups = {}
+        self.groups_expire = 0.0
+        # group ID -> (frozenset of computer IDs, expiry)
+        self.members_cache = {}
+        # reverse index: computer ID -> names of the groups containing it,
+        # group ID -> the (name, members) it was last indexed with
+        self.by_computer = {}
+        self.indexed = {}
+        self.lock = threading.Lock()
+        self.index_lock = threading.Lock()
+
+    def get_groups(self, refresh=False):
+        """{name: {"id", "smart"}} of every computer group, one v1 call"""
+        with self.lock:
+            if not refresh and time.monotonic() < self.groups_expire:
+                return self.groups
+        response = self.jamf.jamf_comm(
+            f"{self.jamf.jss_url_apiv1}/computer-groups",
+            method="GET",
+            headers=self.jamf.json_get_headers,
+        )
+        if response is None or response.status_code != 200:
+            status_code = response.status_code if response is not None else None
+            raise ValueError(
+                f"Failed to list computer groups. Status code: {status_code}"
+            )
+        groups = {
+            group["name"]: {"id": int(group["id"]), "smart": group.get("smartGroup")}
+            for group in response.json()
+        }
+        with self.lock:
+            self.groups = groups
+            self.groups_expire = time.monotonic() + self.ttl
+        return groups
+
+    def fetch_members(self, group):
+        """Computer IDs of a group, the light v2 endpoint for smart groups"""
+        if group["smart"]:
+            response = self.jamf.jamf_comm(
+                f"{self.jamf.jss_url}/api/v2/computer-groups/"
+                f"smart-group-membership/{group['id']}",
+                method="GET",
+                headers=self.jamf.json_get_headers,
+            )
+            if response is not None and response.status_code == 200:
+                return frozenset(int(member) for member in response.json()["members"])
+        # static groups (and Jamf versions without the v2 endpoint)
+        response = self.jamf.jamf_comm(
+            f"{self.jamf.jss_url_api_grps}/id/{group['id']}",
+            method="GET",
+            headers=self.jamf.json_get_headers,
+        )
+        if response is None or response.status_code != 200:
+            status_code = response.status_code if response is not None else None
+            raise ValueError(
+                f"Failed to fetch members of group {group['id']}. "
+                f"Status code: {status_code}"
+            )
+        computers = response.json().get("computer_group", {}).get("computers", [])
+        return frozenset(int(computer["id"]) for computer in computers)
+
+    def members(self, group_name):
+        """Cached member IDs of a group, None when the group does not exist"""
+        group = self.get_groups().get(group_name)
+        if group is None:
+            # it may have been created since the list was cached
+            group = self.get_groups(refresh=True).get(group_name)
+        if group is None:
+            return None
+        with self.lock:
+            cached = self.members_cache.get(group["id"])
+        if cached and time.monotonic() < cached[1]:
+            return cached[0]
+        members = self.fetch_members(group)
+        with self.lock:
+            self.members_cache[group["id"]] = (members, time.monotonic() + self.ttl)
+        return members
+
+    def count(self, group_name):
+        members = self.members(group_name)
+        return None if members is None else len(members)
+
+    def counts(self, group_names):
+        """{name: count} for many groups at once, None for unknown groups"""
+        # one listing call before the fan-out instead of one per task
+        self.get_groups()
+        outcome = jamf_fanout.FanOut().run(
+            lambda name: (name, self.count(name)),
+            group_names,
+            label="groups",
+            truncate=True,
+        )
+        outcome.log_errors("groups")
+        counts = {name: None for name in group_names}
+        counts.update(outcome.results)
+        tracing.log("debug", "Counted groups", groups=len(group_names))
+        return counts
+
+    def invalidate(self, group_name=None):
+        """Forget a group's members (and the group list), or everything"""
+        with self.lock:
+            self.groups_expire = 0.0
+            if group_name is None:
+                self.members_cache.clear()
+                return
+            group = self.groups.get(group_name)
+            if group is not None:
+                self.members_cache.pop(group["id"], None)
+
+    def is_cached(self, group_id):
+        with self.lock:
+            cached = self.members_cache.get(group_id)
+        return cached is not None and time.monotonic() < cached[1]
+
+    def refresh_index(self):
+        """Bring the reverse index up to date, refetching only stale groups"""
+        with self.index_lock, tracing.span("membership index") as index_span:
+            groups = self.get_groups()
+            stale = [
+                name
+                for name, group in groups.items()
+                if not self.is_cached(group["id"])
+            ]
+            outcome = jamf_fanout.FanOut().run(
+                lambda name: (name, self.members(name)),
+                stale,
+                label="groups",
+                truncate=True,
+            )
+            outcome.log_errors("groups")
+            changed = 0
+            current = {}
+            for name, group in groups.items():
+                with self.lock:
+                    cached = self.members_cache.get(group["id"])
+                # a failed refetch keeps the previously cached members
+                if cached is not None:
+                    current[group["id"]] = (name, cached[0])
+            for group_id in self.indexed.keys() | current.keys():
+                old, new = self.indexed.get(group_id), current.get(group_id)
+                if old == new:
+                    continue
+                changed += 1
+                old_name, old_members = old or (None, frozenset())
+                new_name, new_members = new or (None, frozenset())
+                if old_name == new_name:
+                    # only apply the difference to the index
+                    old_members, new_members = (
+                        old_members - new_members,
+                        new_members - old_members,
+                    )
+                for computer_id in old_members:
+                    names = self.by_computer[computer_id]
+                    names.discard(old_name)
+                    if not names:
+                        del self.by_computer[computer_id]
+                for computer_id in new_members:
+                    self.by_computer.setdefault(computer_id, set()).add(new_name)
+            self.indexed = current
+            index_span.set(groups=len(current), refetched=len(stale), changed=changed)
+
+    def computer_groups(self, computer_ids):
+        """{computer ID: sorted group names} for any number of computers"""
+        self.refresh_index()
+        with self.index_lock:
+            return {
+                computer_id: sorted(self.by_computer.get(int(computer_id), ()))
+                for computer_id in computer_ids
+            }
@@ -0,0 +1,82 @@
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+
+# responses from these endpoints carry secrets and are never retained
+EXCLUDED_PATTERNS = (
+    "/filevault",
+    "recovery-lock",
+    "/api/oauth/token",
+    "/api/v1/auth",
+) + tuple(
+    pattern.strip()
+    for pattern in os.environ.get("JAMF_MEMO_EXCLUDE", "").split(",")
+    if pattern.strip()
+)
+
+_current_memo = contextvars.ContextVar("jamf_request_memo", default=None)
+
+
+def is_excluded(url):
+    return any(pattern in url for pattern in EXCLUDED_PATTERNS)
+
+
+class RequestMemo:
+    def __init__(self):
+        self.entries = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_fetch(self, key, fetch):
+        """Return the memoized response for key, fetching it at most once.
+
+        Concurrent callers for the same key wait for the first fetch. Only
+        successful responses are kept, so failures are retried by the next
+        caller.
+        """
+        while True:
+            with self.lock:
+                if key in self.entries:
+                    self.hits += 1
+                    return self.entries[key]
+                event = self.inflight.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self.inflight[key] = event
+                    self.misses += 1
+                    break
+            event.wait()
+            with self.lock:
+                if key in self.entries:
+                    continue
+                self.misses += 1
+            # the first fetch failed, fetch it ourselves outside the lock
+            return fetch()
+        try:
+            response = fetch()
+            if response is not None and response.status_code == 200:
+                with self.lock:
+                    self.entries[key] = response
+            return response
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            event.set()
+
+
+def current():
+    """Return the memo of the request being handled, if any"""
+    return _current_memo.get()
+
+
+@contextmanager
+def request_scope():
+    """Memoize Jamf GET responses for the duration of one command"""
+    token = _current_memo.set(RequestMemo())
+    try:
+        yield _current_memo.get()
+    finally:
+        _current_memo.reset(token)
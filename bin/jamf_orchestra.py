@@ -1,8 +1,16 @@
-import concurrent.futures
+import jamf_duplicates
+import jamf_extattrs
+import jamf_fanout
+import tracing
 from collections import Counter
-import re
-import xml.etree.ElementTree as XML
-from datetime import datetime
+from datetime import datetime, timezone
+
+# chart dimensions that can be read from the inventory HARDWARE section
+HARDWARE_EXTRACTORS = {
+    "model": lambda record: (record["hardware"] or {}).get("model"),
+    "processor": lambda record: (record["hardware"] or {}).get("processorType"),
+    "arch": lambda record: (record["hardware"] or {}).get("processorArchitecture"),
+}
 
 
 class JamfOrchestra:
@@ -10,6 +18,7 @@ class JamfOrchestra:
         self.jamf_client = jamf_client
         self.groups = jamf_client.groups
         self.endpoint_details = jamf_client.endpoint_details
+        self.fanout = jamf_fanout.FanOut()
 
     def orchestrate_last_checkin_count(self, computer_names):
         last_checkins = []
@@ -20,23 +29,23 @@ class JamfOrchestra:
 
         return last_checkins
 
-    def orchestrate_checkin_all(self, jamf_computers, threshold_date, checkin_list):
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_computer = {
-                executor.submit(
-                    self.process_checkin, computer, threshold_date
-                ): computer
-                for computer in jamf_computers["computers"]
-                if "_" not in computer["name"]
-            }
-            for future in concurrent.futures.as_completed(future_to_computer):
-                computer = future_to_computer[future]
-                try:
-                    result = future.result()
-                    if result:
-                        checkin_list.append(result)
-                except Exception as exc:
-                    print(f"Error processing computer {computer['name']}: {exc}")
+    def orchestrate_checkin_all(self, threshold_date, checkin_list):
+        records = self.jamf_client.inventory.get_inventory(
+            ["GENERAL", "USER_AND_LOCATION"],
+            fields={"general": ["lastContactTime"], "userAndLocation": ["realname"]},
+        )
+        for record in records:
+            try:
+                result = self.process_checkin(record, threshold_date)
+                if result:
+                    checkin_list.append(result)
+            except ValueError as exc:
+                tracing.log_sampled(
+                    "warning",
+                    "Error processing check-in",
+                    computer=record["name"],
+                    error=str(exc),
+                )
 
         if checkin_list:
             checkin_list_fixed = "\n".join(checkin_list)
@@ -44,62 +53,60 @@ class JamfOrchestra:
         else:
             return "All computers have checked in within the last 40 days."
 
-    def process_checkin(self, computer, threshold_date):
-        """Helper function to process check-in info for a single computer."""
-        try:
-            if "_" not in computer["name"]:
-                computer_id = computer["id"]
-                checkin_info = self.endpoint_details.last_check_in(computer_id)
-                if checkin_info:
-                    date_match = re.search(
-                        r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}", checkin_info
-                    )
-                    if date_match:
-                        last_contact_time_str = date_match.group()
-                        last_contact_time = datetime.strptime(
-                            last_contact_time_str, "%Y-%m-%d %H:%M:%S"
-                        )
-                        # Check if the last contact time is older than the threshold
-                        if last_contact_time < threshold_date:
-                            return f"`{computer['name']}`: {checkin_info}"
-                else:
-                    return None
-        except Exception as e:
-            print(f"Error processing {computer['name']}: {e}")
+    def process_checkin(self, record, threshold_date):
+        """Helper function to check one inventory record against the threshold."""
+        name = record["name"] or ""
+        last_contact_time_str = (record["general"] or {}).get("lastContactTime")
+        if "_" in name or not last_contact_time_str:
+            return None
+        last_contact_time = datetime.fromisoformat(
+            last_contact_time_str.replace("Z", "+00:00")
+        )
+        # threshold_date is naive, compare in UTC
+        last_contact_utc = last_contact_time.astimezone(timezone.utc).replace(
+            tzinfo=None
+        )
+        if last_contact_utc < threshold_date:
+            real_name = (record["userAndLocation"] or {}).get("realname", "")
+            return f"`{name}`: `user`: {real_name}: {last_contact_time}\n"
         return None
 
-    def orchestrate_fetch_computer_details(self, name, computers, category):
+    def orchestrate_fetch_computer_details(
+        self, name, computers, category, computer_id=None
+    ):
         """Helper function to get computer details."""
-        computer_id = self.endpoint_details.get_computer_id_from_name(name, computers)
+        if computer_id is None:
+            computer_id = self.endpoint_details.get_computer_id_from_name(
+                name, computers
+            )
         details = self.endpoint_details.get_computer_details(computer_id, category)
-        print(f"details: {details}")
         return details
 
     def orchestrate_get_computer_details(
         self, computer_names=None, computers=None, category="general"
     ):
         if computer_names:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future_to_name = {
-                    executor.submit(
-                        self.orchestrate_fetch_computer_details,
-                        name,
-                        computers,
-                        category,
-                    ): name
+            # resolve every name up front instead of once per worker
+            if computers is None:
+                computer_ids = self.endpoint_details.get_computer_ids_from_names(
+                    computer_names
+                )
+            else:
+                computer_ids = {
+                    name: self.endpoint_details.get_computer_id_from_name(
+                        name, computers
+                    )
                     for name in computer_names
                 }
-                computer_details = []
-                for future in concurrent.futures.as_completed(future_to_name):
-                    name = future_to_name[future]
-                    try:
-                        details = future.result()
-                        if details is not None:
-                            computer_details.append(details)
-                    except Exception as e:
-                        print(f"Exception occurred for {name}: {e}")
-
-            return computer_details
+            outcome = self.fanout.run(
+                lambda name: self.orchestrate_fetch_computer_details(
+                    name, computers, category, computer_ids[name]
+                ),
+                [name for name in computer_names if computer_ids[name] is not None],
+                truncate=True,
+            )
+            outcome.log_errors("computer details")
+            return [details for details in outcome.results if details is not None]
 
     def orchestrate_get_computer_logs(self, computer_id):
         logs = []
@@ -109,129 +116,57 @@ class JamfOrchestra:
                 logs.extend(log)  # extend instead of append
         return logs
 
-    def orchestrate_get_computer_processors(self):
-        all_computers = self.endpoint_details.get_all_computers()
-        processors = []
-
-        def get_processor(computer):
-            id = computer["id"]
-            processor = self.endpoint_details.get_computer_details(
-                id, category="hardware"
-            )
-            if processor:
-                hardware_processor = processor["processorType"]
-                print(f"processor: {hardware_processor}")
-                return hardware_processor
-            return None
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(get_processor, computer): computer
-                for computer in all_computers["computers"]
-            }
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    result = future.result()
-                    if result:
-                        processors.append(result)
-                except Exception as exc:
-                    computer = futures[future]
-                    print(
-                        f"Error retrieving processor for computer {computer['id']}: {exc}"
-                    )
+    def orchestrate_fleet_counts(self, extractors, sections):
+        """Count several dimensions in one pass over the bulk inventory.
+
+        Args:
+            extractors: {dimension: callable(record) -> value or None}.
+            sections: inventory sections the extractors read from.
+
+        Returns:
+            {dimension: Counter of the extracted values}.
+        """
+        records = self.jamf_client.inventory.get_inventory(sections)
+        counters = {dimension: Counter() for dimension in extractors}
+        for record in records:
+            for dimension, extract in extractors.items():
+                value = extract(record)
+                if value:
+                    counters[dimension][value] += 1
+        return counters
+
+    def orchestrate_hardware_counts(self, dimensions):
+        """Count hardware dimensions (model, processor, arch) in one pass"""
+        extractors = {
+            dimension: HARDWARE_EXTRACTORS[dimension] for dimension in dimensions
+        }
+        return self.orchestrate_fleet_counts(extractors, ["HARDWARE"])
 
-        return processors
+    def orchestrate_get_computer_processors(self):
+        counts = self.orchestrate_hardware_counts(["processor"])
+        return list(counts["processor"].elements())
 
     def orchestrate_get_computer_architectures(self):
-        all_computers = self.endpoint_details.get_all_computers()
-        architectures = []
-
-        def get_architecture(computer):
-            id = computer["id"]
-            architecture = self.endpoint_details.get_computer_details(
-                id, category="hardware"
-            )
-            if architecture:
-                hardware_architecture = architecture["processorArchitecture"]
-                print(f"architecture: {hardware_architecture}")
-                return hardware_architecture
-            return None
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(get_architecture, computer): computer
-                for computer in all_computers["computers"]
-            }
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    result = future.result()
-                    if result:
-                        architectures.append(result)
-                except Exception as exc:
-                    computer = futures[future]
-                    print(
-                        f"Error retrieving architecture for computer {computer['id']}: {exc}"
-                    )
-
-        return architectures
+        counts = self.orchestrate_hardware_counts(["arch"])
+        return list(counts["arch"].elements())
 
     def orchestrate_get_computer_models(self):
-        all_computers = self.endpoint_details.get_all_computers()
-        models = []
-
-        def get_model(computer):
-            id = computer["id"]
-            model = self.endpoint_details.get_computer_details(id, category="hardware")
-            if model:
-                hardware_model = model["model"]
-                print(f"model: {hardware_model}")
-                return hardware_model
-            return None
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(get_model, computer): computer
-                for computer in all_computers["computers"]
-            }
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    result = future.result()
-                    if result:
-                        models.append(result)
-                except Exception as exc:
-                    computer = futures[future]
-                    print(
-                        f"Error retrieving model for computer {computer['id']}: {exc}"
-                    )
-
-        return models
+        counts = self.orchestrate_hardware_counts(["model"])
+        return list(counts["model"].elements())
 
-    def orchestrate_get_appstore_apps(self):
+    def fetch_all_appstore(self):
+        """App store history for every computer, fetched concurrently"""
         all_computers = self.endpoint_details.get_all_computers()
-        appstore_apps = []
-
-        def get_appstore(computer):
-            id = computer["id"]
-            appstore = self.endpoint_details.get_appstore(id)
-            if appstore:
-                return appstore
-            return None
+        return self.fanout.map(
+            lambda computer: self.endpoint_details.get_appstore(computer["id"]),
+            all_computers["computers"],
+            label="devices",
+            ordered=False,
+            truncate=True,
+        )
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(get_appstore, computer): computer
-                for computer in all_computers["computers"]
-            }
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    result = future.result()
-                    if result:
-                        appstore_apps.append(result)
-                except Exception as exc:
-                    computer = futures[future]
-                    print(
-                        f"Error retrieving appstore for computer {computer['id']}: {exc}"
-                    )
+    def orchestrate_get_appstore_apps(self):
+        appstore_apps = self.fetch_all_appstore()
 
         installed_apps = []
         excluded_apps = [
@@ -256,7 +191,7 @@ class JamfOrchestra:
 
     def orchestrate_get_appstore(self, computer_id):
         appstore_apps = self.endpoint_details.get_appstore(computer_id)
-        print(f"app store apps: {appstore_apps}")
+        tracing.log("debug", "App store apps", computer_id=computer_id)
 
         # Initialize sections
         installed_apps = []
@@ -305,31 +240,7 @@ class JamfOrchestra:
         return "\n".join(message) if message else "No app store data available."
 
     def orchestrate_get_appstore_overview(self, number):
-        all_computers = self.endpoint_details.get_all_computers()
-        appstore_apps = []
-
-        def get_appstore(computer):
-            id = computer["id"]
-            appstore = self.endpoint_details.get_appstore(id)
-            if appstore:
-                return appstore
-            return None
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(get_appstore, computer): computer
-                for computer in all_computers["computers"]
-            }
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    result = future.result()
-                    if result:
-                        appstore_apps.append(result)
-                except Exception as exc:
-                    computer = futures[future]
-                    print(
-                        f"Error retrieving appstore for computer {computer['id']}: {exc}"
-                    )
+        appstore_apps = self.fetch_all_appstore()
 
         # calculate the top insalled apps
         installed_apps = {}
@@ -431,43 +342,30 @@ class JamfOrchestra:
         return payload
 
     def orchestrate_mdm_expiry(self, threshold_date):
-        all_computers = self.endpoint_details.get_all_computers()
+        records = self.jamf_client.inventory.get_inventory(
+            ["GENERAL"], fields={"general": ["name", "mdmProfileExpiration"]}
+        )
         expiry_list = []
-
-        def get_expiry(computer):
-            id = computer["id"]
-            expiry = self.endpoint_details.get_computer_details(id, category="general")
-            if expiry and "mdmProfileExpiration" in expiry:
-                return computer["name"], expiry["mdmProfileExpiration"]
-            return None
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(get_expiry, computer): computer
-                for computer in all_computers["computers"]
-                if "_" not in computer["name"]
-            }
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    result = future.result()
-                    if result:
-                        computer_name, mdm_expiry_str = result
-                        print(
-                            f"computer name: {computer_name} mdm_expiry_str: {mdm_expiry_str}"
-                        )
-                        # Remove 'Z' and convert to naive datetime
-                        mdm_expiry_time = datetime.strptime(
-                            mdm_expiry_str.replace("Z", ""), "%Y-%m-%dT%H:%M:%S"
-                        )
-                        # check if the expiry is before today
-                        if mdm_expiry_time < threshold_date:
-                            print(f"expired: {computer_name} {mdm_expiry_time}")
-                            expiry_list.append(f"`{computer_name}`: {mdm_expiry_time}")
-                except Exception as exc:
-                    computer = futures[future]
-                    print(
-                        f"Error retrieving MDM expiry for computer {computer['id']}: {exc}"
-                    )
+        for record in records:
+            computer_name = record["name"]
+            mdm_expiry_str = (record["general"] or {}).get("mdmProfileExpiration")
+            if not mdm_expiry_str or "_" in computer_name:
+                continue
+            try:
+                # Remove 'Z' and convert to naive datetime
+                mdm_expiry_time = datetime.strptime(
+                    mdm_expiry_str.replace("Z", ""), "%Y-%m-%dT%H:%M:%S"
+                )
+                # check if the expiry is before today
+                if mdm_expiry_time < threshold_date:
+                    expiry_list.append(f"`{computer_name}`: {mdm_expiry_time}")
+            except ValueError as exc:
+                tracing.log_sampled(
+                    "warning",
+                    "Error reading MDM expiry",
+                    computer_id=record["id"],
+                    error=str(exc),
+                )
 
         return expiry_list
 
@@ -485,7 +383,7 @@ class JamfOrchestra:
 
     def orchestrate_files(self):
         files = self.endpoint_details.get_files()
-        print(f"files: {files}")
+        tracing.log("debug", "JCDS files", count=len(files or []))
         return files
 
     def orchestrate_file_link(self, filename):
@@ -502,173 +400,62 @@ class JamfOrchestra:
         else:
             return self.endpoint_details.get_recovery_key(computer_id)
 
-    def orchestrate_duplicates(self, duplicate_laptops):
-        all_computers = []
-        # Get all computers from the XML for each duplicate laptop name
-        for laptop in duplicate_laptops:
-            xml_response = self.endpoint_details.get_duplicates(laptop)
-            if xml_response:
-                try:
-                    xml_tree = XML.fromstring(xml_response)
-                    computers = [
-                        {
-                            "id": int(computer.find("id").text),
-                            "name": computer.find("name").text,
-                        }
-                        for computer in xml_tree.findall("computer")
-                    ]
-                    all_computers.extend(computers)
-                except XML.ParseError as e:
-                    print(f"XML parsing error: {e}")
-
-        # Retrieve additional info for each computer to get the serial numbers
-        for computer in all_computers:
-            basic_info_response = self.endpoint_details.get_basic_info(computer["id"])
-            # Parse the XML response to extract the serial number
-            try:
-                basic_info_tree = XML.fromstring(basic_info_response)
-                serial_number = basic_info_tree.find(".//general/serial_number")
-                serial_number = (
-                    serial_number.text
-                )  # Assuming serial_number is directly under the root
-                computer["serial_number"] = (
-                    serial_number  # Add serial number to the computer record
-                )
-            except XML.ParseError as e:
-                print(f"XML parsing error for ID {computer['id']}: {e}")
-            except AttributeError:
-                print(f"Serial number not found for ID {computer['id']}.")
-
-        # Group computers by serial number
-        name_to_computers = {}
-        for comp in all_computers:
-            name = comp.get("name")
-            if name:
-                if name not in name_to_computers:
-                    name_to_computers[name] = []
-                name_to_computers[name].append(comp)
-        # print(f"name to computers: {name_to_computers}")
-        # Only keep groups with more than one record (duplicates)
-        duplicate_computers = {
-            name: comps for name, comps in name_to_computers.items() if len(comps) > 1
-        }
-        # Debugging information
-        # print(f"dupes: {duplicate_computers}")
-        if not duplicate_computers:
-            print("No duplicates found.")
+    def orchestrate_duplicates(self):
+        """Duplicate records by serial number and name, from one inventory pass"""
+        records = self.jamf_client.inventory.get_inventory(
+            ["GENERAL", "HARDWARE"], fields=jamf_duplicates.DUPLICATE_FIELDS
+        )
+        duplicates = jamf_duplicates.find_duplicates(records)
+        tracing.log("debug", "Duplicates found", sets=len(duplicates))
+        if not duplicates:
             return "No duplicates found."
-
-        payload = {
-            "blocks": [
-                {
-                    "type": "section",
-                    "text": {"type": "mrkdwn", "text": "*Duplicates:*"},
+        header = [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*Duplicates:* {len(duplicates)} sets",
                 },
-                {"type": "divider"},
-            ]
-        }
-
-        # Loop through the duplicate computers, get oldest and newest records for each serial number
-        for serial, comps in duplicate_computers.items():
-            oldest_record, newest_record = self.endpoint_details.oldest_newest(comps)
-            dupe_payload = {
-                "blocks": [
-                    {
-                        "type": "section",
-                        "fields": [
-                            {
-                                "type": "mrkdwn",
-                                "text": f"*Oldest Record:*\nID: {oldest_record['id']}\nSerial No: {oldest_record['serial_number']}\nName: {oldest_record['name']}\nLast Contact: {oldest_record['last_contact_time']}\nEnrolled: {oldest_record['last_enrolled_date']}",
-                            },
-                            {
-                                "type": "mrkdwn",
-                                "text": f"*Newest Record:*\nID: {newest_record['id']}\nSerial No: {newest_record['serial_number']}\nName: {newest_record['name']}\nLast Contact: {newest_record['last_contact_time']}\nEnrolled: {newest_record['last_enrolled_date']}",
-                            },
-                        ],
-                    },
-                ]
-            }
-            payload["blocks"].extend(dupe_payload["blocks"])
-
-        return payload
-
-    def process_reboots(self, computer, threshold_date):
-        """Process a single computer for reboots."""
-        name = computer["name"]
-        details = self.orchestrate_get_computer_details(
-            computer_names=[name], computers=[computer], category="hardware"
+            },
+            {"type": "divider"},
+        ]
+        messages = jamf_duplicates.chunk_messages(
+            header, jamf_duplicates.duplicate_blocks(duplicates)
         )
-        if details:
-            ext_attributes = details[0].get("extensionAttributes", [])
-            last_startup = next(
-                (attr for attr in ext_attributes if attr["definitionId"] == "29"), None
-            )
-            if last_startup and last_startup.get("values"):
-                last_startup_date_str = last_startup["values"][0]
-                try:
-                    last_startup_date = datetime.strptime(
-                        last_startup_date_str, "%Y-%m-%d %H:%M:%S"
-                    )
-                    if last_startup_date < threshold_date:
-                        return f"`{name}`: {last_startup_date}"
-                except ValueError:
-                    print(f"Invalid date format for `{name}`: {last_startup_date_str}")
-                    return None
-        else:
-            print(f"No valid startup date available for `{name}`.")
-            return None
+        return messages[0] if len(messages) == 1 else messages
 
     def orchestrate_reboots(self, args, threshold_date, startup_data):
+        """Last startup dates, read from the extension attribute value index"""
+        extattrs = self.jamf_client.extattrs
         reboots = args.split()
         if reboots[0].lower() == "all":
             # If no specific user, check all computers
-            computers = self.endpoint_details.get_all_computers()
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future_to_computer = {
-                    executor.submit(
-                        self.process_reboots, computer, threshold_date
-                    ): computer
-                    for computer in computers["computers"]
-                    if "_" not in computer["name"]
-                }
-                for future in concurrent.futures.as_completed(future_to_computer):
-                    computer = future_to_computer[future]
-                    try:
-                        startup_data_item = future.result()
-                        if startup_data_item:
-                            startup_data.append(startup_data_item)
-                    except Exception as exc:
-                        print(f"Error processing computer {computer['name']}: {exc}")
+            startup_data.extend(
+                f"`{name}`: {last_startup_date}"
+                for name, last_startup_date in extattrs.older_than(
+                    jamf_extattrs.LAST_STARTUP_EA, threshold_date
+                )
+                if name and "_" not in name
+            )
         # Check if specific user(s) are provided
         else:
             computer_names = reboots  # Adjust index to get user names
-            details = self.orchestrate_get_computer_details(
-                computer_names=computer_names, category="hardware"
+            computer_ids = self.endpoint_details.get_computer_ids_from_names(
+                computer_names
+            )
+            last_startups = extattrs.values(
+                jamf_extattrs.LAST_STARTUP_EA,
+                [computer_id for computer_id in computer_ids.values() if computer_id],
             )
-            if details:
-                for idx, detail in enumerate(details):
-                    ext_attributes = detail.get("extensionAttributes", [])
-                    last_startup = next(
-                        (
-                            attr
-                            for attr in ext_attributes
-                            if attr["definitionId"] == "29"
-                        ),
-                        None,
+            for name in computer_names:
+                computer_id = computer_ids.get(name)
+                value = last_startups.get(int(computer_id)) if computer_id else None
+                if value:
+                    last_startup_date = datetime.strptime(
+                        value, jamf_extattrs.LAST_STARTUP_FORMAT
                     )
-                    if last_startup:
-                        last_startup_date_str = last_startup["values"][
-                            0
-                        ]  # Extract date string
-                        last_startup_date = datetime.strptime(
-                            last_startup_date_str, "%Y-%m-%d %H:%M:%S"
-                        )
-                        startup_data.append(
-                            f"`{computer_names[idx]}`: {last_startup_date}"
-                        )  # Reference name correctly
-                    else:
-                        startup_data.append(
-                            f"No startup data found for `{computer_names[idx]}`."
-                        )
+                    startup_data.append(f"`{name}`: {last_startup_date}")
+                else:
+                    startup_data.append(f"No startup data found for `{name}`.")
 
         return startup_data
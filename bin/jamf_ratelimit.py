@@ -0,0 +1,129 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+MIN_RATE = float(os.environ.get("JAMF_RATE_LIMIT_MIN", "1"))
+MAX_RATE = float(os.environ.get("JAMF_RATE_LIMIT_MAX", "500"))
+# start at the ceiling, the rate only drops once Jamf pushes back
+INITIAL_RATE = float(os.environ.get("JAMF_RATE_LIMIT", str(MAX_RATE)))
+MAX_RETRIES = int(os.environ.get("JAMF_MAX_RETRIES", "4"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+THROTTLE_STATUSES = (429, 503)
+IDEMPOTENT_METHODS = ("GET", "PUT", "DELETE")
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def parse_retry_after(value):
+    """Turn a Retry-After header (seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter for retry number attempt"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)
+    return random.uniform(delay / 2, delay)
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate follows the server's throttling (AIMD).
+
+    Requests are not paced below the ceiling until Jamf throttles. Every
+    429/503 then halves the rate (at most once per second) and blocks all
+    callers until Retry-After has passed, and every success nudges the rate
+    back up, so throughput settles just under the point where Jamf starts
+    throttling.
+    """
+
+    def __init__(self, rate=INITIAL_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.cooldown_until = 0.0
+        self.lock = threading.Lock()
+        self.counters = {
+            "requests": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "throttled": 0,
+            "retries": 0,
+        }
+
+    def refill(self, now):
+        burst = max(1.0, self.rate)
+        self.tokens = min(burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    self.counters["requests"] += 1
+                    return
+                else:
+                    delay = (1 - self.tokens) / self.rate
+                self.counters["waits"] += 1
+                self.counters["wait_seconds"] += delay
+            time.sleep(delay)
+
+    def on_success(self):
+        with self.lock:
+            # additive increase, roughly +1 request/s per second at full rate
+            self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+
+    def on_throttle(self, retry_after=None):
+        with self.lock:
+            now = time.monotonic()
+            self.counters["throttled"] += 1
+            if now >= self.cooldown_until:
+                # concurrent 429s from one burst only halve the rate once
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = min(self.tokens, 0.0)
+                self.cooldown_until = now + 1.0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def on_retry(self, attempt):
+        with self.lock:
+            self.counters["retries"] += 1
+        time.sleep(backoff_delay(attempt))
+
+    def stats(self):
+        """Snapshot of the limiter counters and current rate"""
+        with self.lock:
+            stats = dict(self.counters)
+            stats["rate"] = round(self.rate, 2)
+            stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+            return stats
+
+
+def get_limiter():
+    """Return the process-wide limiter shared by every jamf_comm call"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = AdaptiveRateLimiter()
+    return _limiter
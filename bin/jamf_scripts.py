@@ -1,68 +1,139 @@
-import re
 import json
+import os
+import re
+import jamf_catalog
+import tracing
+
+SCRIPT_PAGE_SIZE = int(os.environ.get("JAMF_SCRIPT_PAGE_SIZE", "100"))
+# the catalog is re-read from Jamf at least this often
+SCRIPT_CATALOG_TTL = float(os.environ.get("JAMF_SCRIPT_CATALOG_TTL", "300"))
+TOKEN = re.compile(r"\w+")
 
 
 class JamfScripts:
-    def __init__(self, jamf_client):
+    def __init__(self, jamf_client, ttl=SCRIPT_CATALOG_TTL):
         self.jamf_client = jamf_client
+        self.refresher = jamf_catalog.Refresher(ttl)
+        # script name -> script record, in name order
+        self.by_name = {}
+        # lower-cased word of any script body -> names of the scripts using it
+        self.tokens = {}
+
+    def is_fresh(self):
+        return self.refresher.is_fresh()
+
+    def invalidate(self):
+        self.refresher.invalidate()
+
+    def load(self):
+        with tracing.span("script catalog") as catalog_span:
+            scripts = jamf_catalog.fetch_pages(
+                self.jamf_client, "scripts", SCRIPT_PAGE_SIZE, "scripts"
+            )
+            by_name, tokens = {}, {}
+            for script in sorted(scripts, key=lambda script: script["name"]):
+                by_name[script["name"]] = script
+                contents = (script.get("scriptContents") or "").lower()
+                for token in set(TOKEN.findall(contents)):
+                    tokens.setdefault(token, set()).add(script["name"])
+            self.by_name, self.tokens = by_name, tokens
+            catalog_span.set(scripts=len(by_name), tokens=len(tokens))
+
+    def refresh(self):
+        """Rebuild the catalog and its indexes, all pages fetched concurrently"""
+        self.refresher.refresh(self.load)
+
+    def catalog(self):
+        """{name: script} of every script, refreshed once the TTL has passed"""
+        self.refresher.ensure(self.load)
+        return self.by_name
 
     def get_all_scripts(self):
-        url = f"{self.jamf_client.jss_url_apiv1}/scripts?page=0&page-size=100&sort=name%3Aasc"
-        response = self.jamf_client.jamf_comm(
-            url, method="GET", headers=self.jamf_client.json_get_headers
-        )
-        if response.status_code == 200:
-            try:
-                json_string = re.search(r"{.*}", response.text, re.DOTALL)
-                if json_string:
-                    response_json = json.loads(json_string.group(0))
-                    return response_json
-            except json.JSONDecodeError:
-                return "Error: Response is not valid JSON."
+        scripts = list(self.catalog().values())
+        return {"totalCount": len(scripts), "results": scripts}
+
+    def get_script(self, script_name):
+        """The script record named script_name, or None"""
+        return self.catalog().get(script_name.strip())
 
     def get_script_by_name(self, script_name):
-        script_name = script_name.strip()
-        # Retrieve all scripts, filtering by script name
-        data = self.get_all_scripts()
-        if "results" in data:
-            for script in data["results"]:
-                if script["name"] == script_name:
-                    return script["scriptContents"]
-                return "Script not found."
-        else:
-            return f"Error: Failed to retrieve script."
+        script = self.get_script(script_name)
+        if script is None:
+            return "Script not found."
+        return script["scriptContents"]
 
     def get_all_scripts_content(self):
-        data = self.get_all_scripts()
-        scripts_list = []
-        if "results" in data:
-            for script in data["results"]:
-                scripts_list.append(script["name"])
-            return scripts_list
-
-    def update_script(self, script_id, updated_content):
-        url = f"{self.jamf_client.jss_url_apiv1}scripts/{script_id}"
-        payload = {"scriptContents": updated_content}
+        return list(self.catalog())
+
+    def candidates(self, pattern):
+        """Names of the scripts that can contain a plain word pattern.
+
+        The token vocabulary is much smaller than the script bodies, so a
+        substring scan over it narrows the bodies that need to be searched.
+        """
+        needle = pattern.lower()
+        names = set()
+        for token, scripts in self.tokens.items():
+            if needle in token:
+                names |= scripts
+        return names
+
+    def grep(self, pattern, max_lines=3):
+        """[(script name, [(line number, line), ...]), ...] matching pattern.
+
+        Plain words are looked up in the token index first, anything else is
+        treated as a case-insensitive regular expression over every body.
+        """
+        scripts = self.catalog()
+        regex = re.compile(pattern, re.IGNORECASE)
+        if TOKEN.fullmatch(pattern):
+            names = sorted(self.candidates(pattern))
+        else:
+            names = list(scripts)
+        matches = []
+        for name in names:
+            lines = [
+                (number, line.strip())
+                for number, line in enumerate(
+                    (scripts[name].get("scriptContents") or "").splitlines(), start=1
+                )
+                if regex.search(line)
+            ]
+            if lines:
+                matches.append((name, lines[:max_lines]))
+        return matches
+
+    def update_script(self, script, updated_content):
+        """Replace the contents of a script record from the catalog"""
+        url = f"{self.jamf_client.jss_url_apiv1}/scripts/{script['id']}"
+        # the v1 PUT replaces the whole script, name included
         response = self.jamf_client.jamf_comm(
-            url, method="PUT", headers=self.jamf_client.json_post_headers, data=payload
+            url,
+            method="PUT",
+            headers={
+                **self.jamf_client.json_get_headers,
+                "Content-Type": "application/json",
+            },
+            data=json.dumps({**script, "scriptContents": updated_content}),
         )
-
+        # the cached body is stale now
+        self.invalidate()
         return response.json()
 
     def update_message_in_script(self, script_name, new_message):
         # 1. Fetch the script by name
-        script = self.get_script_by_name(script_name)
+        script = self.get_script(script_name)
         if script:
-            script_id = script["id"]
-            # 2. Retrieve the script contents by ID
-            script_details = self.get_script_contents_by_id(script_id)
-            script_contents = script_details.get("scriptContents", "")
+            # 2. The catalog already holds the script contents
+            script_contents = script.get("scriptContents", "")
             # 3. Replace the `--message` flag content with the new Slack message
             updated_script = re.sub(
-                r'(--message\s*"[^"]*")', f'--message "{new_message}"', script_contents
+                r'(--message\s*"[^"]*")',
+                lambda _: f'--message "{new_message}"',
+                script_contents,
             )
             # 4. Update the script in Jamf with the new content
-            result = self.update_script(script_id, updated_script)
+            result = self.update_script(script, updated_script)
             return result
         else:
             return f"Script {script_name} not found."
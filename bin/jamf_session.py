@@ -0,0 +1,58 @@
+import contextvars
+import os
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+# concurrency used by every fleet-wide executor, the connection pool is sized to match
+MAX_WORKERS = int(os.environ.get("JAMF_MAX_WORKERS", "32"))
+CONNECT_TIMEOUT = float(os.environ.get("JAMF_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("JAMF_READ_TIMEOUT", "60"))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_session(pool_size=MAX_WORKERS):
+    """Build a keep-alive session with a connection pool of pool_size"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # requests decodes gzip/deflate bodies transparently
+    session.headers.update(
+        {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+    )
+    return session
+
+
+def get_session():
+    """Return the process-wide session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def get_timeout():
+    """Return the (connect, read) timeout tuple for Jamf requests"""
+    return (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that runs each task in the submitter's context"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        # carries request-scoped state such as the GET memo into workers
+        context = contextvars.copy_context()
+        return super().submit(context.run, fn, *args, **kwargs)
+
+
+def executor(max_workers=MAX_WORKERS):
+    """Thread pool for fleet-wide fan-out, sized to the connection pool"""
+    return ContextThreadPoolExecutor(max_workers=max_workers)
@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+
+# refresh this many seconds before the token's expires_in runs out
+REFRESH_MARGIN = float(os.environ.get("JAMF_TOKEN_REFRESH_MARGIN", "60"))
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+class TokenManager:
+    def __init__(self, fetch_token, refresh_margin=REFRESH_MARGIN):
+        # fetch_token returns a (access_token, expires_in) tuple
+        self.fetch_token = fetch_token
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self):
+        return (
+            self._token is not None
+            and time.monotonic() < self._expires_at - self.refresh_margin
+        )
+
+    def get_token(self):
+        """Return a valid token, refreshing it at most once across threads"""
+        if self._is_fresh():
+            return self._token
+        with self._lock:
+            # another thread may have refreshed while we waited on the lock
+            if not self._is_fresh():
+                token, expires_in = self.fetch_token()
+                self._token = token
+                self._expires_at = time.monotonic() + float(expires_in)
+            return self._token
+
+    def invalidate(self, token=None):
+        """Drop the cached token, unless it was already replaced"""
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+
+def get_token_manager(key, fetch_token):
+    """Return the process-wide TokenManager for key, creating it if needed"""
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = TokenManager(fetch_token)
+            _managers[key] = manager
+        return manager
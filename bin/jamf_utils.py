@@ -1,7 +1,7 @@
-from datetime import datetime
-import re
+from datetime import datetime, timezone
 import json
 import get_chart
+import tracing
 
 
 class JamfUtils:
@@ -74,14 +74,16 @@ class JamfUtils:
 
     def get_computer_id_from_name(self, name, computers=None):
         if computers is None:
-            computers = self.get_all_computers()[
-                "computers"
-            ]  # Use `computers` from API if not passed
+            # name, serial or username, served from the shared index
+            return self.jamf.computer_index.resolve(name)
         for laptop in computers:
             if laptop["name"] == name:
-                print(f"laptop id: {laptop['id']}")
                 return laptop["id"]
 
+    def get_computer_ids_from_names(self, names):
+        """Resolve several names, serials or usernames to IDs at once"""
+        return self.jamf.computer_index.resolve_many(names)
+
     def get_files(self):
         response = self.jamf.jamf_comm(
             f"{self.apiv1}/jcds/files", method="GET", headers=self.json_get_headers
@@ -89,7 +91,7 @@ class JamfUtils:
         if response.status_code == 200:
             try:
                 response_json = json.loads(response.text)
-                print(f"response json for get files: {response_json}")
+                tracing.log("debug", "JCDS files response", files=len(response_json))
                 return response_json
             except json.JSONDecodeError as e:
                 return f"Error: Could not retrieve JSON: {e}"
@@ -110,45 +112,59 @@ class JamfUtils:
 
     def generate_smart_group_chart(self, group_names, chart_type):
         """Generates a chart of current counts for the given smart groups"""
-        current_counts = []
+        # every group is fetched at once, cached members are not fetched again
+        counts = self.jamf.membership.counts(group_names)
         for group_name in group_names:
-            count = self.jamf.groups.count_computers_in_smart_group(
-                group_name, create_missing=False
-            )
-            if count is not None:
-                current_counts.append(count)
-            else:
+            if counts[group_name] is None:
                 return f"Could not retrieve the count for group `{group_name}`."
+        current_counts = [counts[group_name] for group_name in group_names]
 
         # Generate the chart
-        chart_url = get_chart.get_current_chart(
+        chart = get_chart.render_chart(
             group_names, current_counts, chart_type, text="Group comparison on request"
         )
-        # Send the chart as an image
-        return {
-            "blocks": [
-                {
-                    "type": "image",
-                    "image_url": chart_url,
-                    "alt_text": "Chart comparing smart groups",
-                }
-            ]
-        }
+        # Send the chart as an image (or a PNG upload with the local renderer)
+        return chart.to_message("Chart comparing smart groups")
+
+    def generate_trend_chart(self, group_names):
+        """Charts stored member counts of the groups over time, without Jamf calls"""
+        history = self.jamf.group_history
+        if history is None:
+            return "Group history is disabled (`GROUP_HISTORY=off`)."
+        series = history.series(group_names)
+        missing = [name for name, points in series.items() if not points]
+        if missing:
+            return (
+                f"No history recorded for {', '.join(f'`{name}`' for name in missing)}. "
+                "Check the group names, trends need counts sampled over time by the "
+                "`sample_groups` function."
+            )
+        if all(len(points) < 2 for points in series.values()):
+            return (
+                "Not enough history yet, only one sample is recorded. Schedule the "
+                "`sample_groups` function and keep the history in durable storage "
+                "(`GROUP_HISTORY=gcs`) to chart trends."
+            )
+        timestamps = sorted({ts for points in series.values() for ts, _ in points})
+        labels = [
+            datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M")
+            for ts in timestamps
+        ]
+        counts = {}
+        for name, points in series.items():
+            by_ts = dict(points)
+            counts[name] = [by_ts.get(ts) for ts in timestamps]
+        chart = get_chart.render_trend(labels, counts, "Group counts over time")
+        return chart.to_message("Chart of smart group counts over time")
 
     def generate_other_chart(self, labels, counts, chart_type, text="Comparison chart"):
         """Generates a chart of the given data with the specified chart type"""
-        chart_url = get_chart.get_current_chart(labels, counts, chart_type, text)
-        print(f"chart url: {chart_url}")
-        # Send the chart as an image block
-        return {
-            "blocks": [
-                {
-                    "type": "image",
-                    "image_url": chart_url,
-                    "alt_text": "Chart comparing models or groups",
-                }
-            ]
-        }
+        chart = get_chart.render_chart(labels, counts, chart_type, text)
+        tracing.log(
+            "debug", "Chart generated", chart_key=chart.key, chart_url=chart.url
+        )
+        # Send the chart as an image block (or a PNG upload with the local renderer)
+        return chart.to_message("Chart comparing models or groups")
 
     def get_computer_logs(self, id):
         response = self.jamf.jamf_comm(
@@ -217,53 +233,6 @@ class JamfUtils:
         else:
             return f"Failed to lock device: {response.status_code}: {response.text}"
 
-    def get_duplicates(self, duplicate_laptop):
-        url = f"{self.jss_api}/computers/match/name/{duplicate_laptop}"
-        response = self.jamf.jamf_comm(
-            url, method="GET", headers=self.jamf.text_get_headers
-        )
-        return response.text
-
-    def oldest_newest(self, duplicate_computers):
-        records = []
-        for comp in duplicate_computers:
-            computer_id = comp["id"]
-            info = self.get_specific_info(computer_id)
-            general_info = info["computer"]["general"]
-            last_contact_time = general_info.get("last_contact_time", "N/A")
-            last_enrolled_date = general_info.get("last_enrolled_date_utc", "N/A")
-            serial_number = general_info.get("serial_number", "N/A")
-
-            # Convert time strings to datetime for comparison
-            last_contact_time_dt = (
-                datetime.strptime(last_contact_time, "%Y-%m-%d %H:%M:%S")
-                if last_contact_time != "N/A"
-                else None
-            )
-            last_enrolled_date_dt = (
-                datetime.strptime(last_enrolled_date, "%Y-%m-%dT%H:%M:%S.%f%z")
-                if last_enrolled_date != "N/A"
-                else None
-            )
-
-            records.append(
-                {
-                    "id": general_info["id"],
-                    "serial_number": serial_number,
-                    "name": general_info["name"],
-                    "last_contact_time": last_contact_time_dt,
-                    "last_enrolled_date": last_enrolled_date_dt,
-                }
-            )
-
-        # Sort by last contact time and then by enrolled date to get the oldest and newest records
-        records.sort(key=lambda r: (r["last_contact_time"], r["last_enrolled_date"]))
-
-        oldest_record = records[0]
-        newest_record = records[-1]
-
-        return oldest_record, newest_record
-
     def get_appstore(self, computer_id):
         response = self.jamf.jamf_comm(
             f"{self.jss_api}/computerhistory/id/{computer_id}",
@@ -303,33 +272,14 @@ class JamfUtils:
             return expiry_date
 
     def get_all_extattrs(self):
-        response = self.jamf.jamf_comm(
-            f"{self.apiv1}/computer-extension-attributes?page=0&page-size=100&sort=name.asc",
-            method="GET",
-            headers=self.jamf.text_get_headers,
-        )
-        json_string = re.search(r"{.*}", response.text, re.DOTALL)
-        if json_string:
-            response_json = json.loads(json_string.group(0))
-            return response_json
+        definitions = list(self.jamf.extattrs.catalog().values())
+        return {"totalCount": len(definitions), "results": definitions}
 
     def get_all_extattrs_names(self):
-        data = self.get_all_extattrs()
-        attributes_list = []
-        if data:
-            for script in data["results"]:
-                attributes_list.append(script["name"])
-            return attributes_list
+        return list(self.jamf.extattrs.catalog())
 
     def get_extattr_by_name(self, extattr_name):
-        extattr_name = extattr_name.strip()
-        print(f"testing {extattr_name}")
-        # Retrieve all scripts, filtering by script name
-        data = self.get_all_extattrs()
-        if "results" in data:
-            for attr in data["results"]:
-                if attr["name"] == extattr_name:
-                    return attr["scriptContents"]
+        definition = self.jamf.extattrs.get(extattr_name.strip())
+        if definition is None:
             return "Extension Attribute not found."
-        else:
-            return f"Error: Failed to retrieve scripts."
+        return definition.get("scriptContents")
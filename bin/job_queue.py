@@ -0,0 +1,279 @@
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import tracing
+
+# inline keeps the old behaviour of running the command before acking Slack
+JOB_QUEUE_BACKEND = os.environ.get("JOB_QUEUE_BACKEND", "inline").lower()
+# backends that recognise a retried Slack delivery on any instance,
+# main() drops retries before they reach the other backends
+SHARED_DEDUP_BACKENDS = ("sqlite", "cloudtasks")
+JOB_QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH", "/tmp/jackaas_jobs.db")
+# Cloud Tasks pushes jobs to this URL with an OIDC token of this account,
+# the worker entry point refuses pushed jobs without one
+JOB_WORKER_URL = os.environ.get("JOB_WORKER_URL")
+JOB_WORKER_ACCOUNT = os.environ.get("GOOGLE_SERVICE_ACCOUNT")
+# job IDs the in-memory backends remember, Slack retries come within minutes
+JOB_DEDUP_TTL = float(os.environ.get("JOB_DEDUP_TTL", "3600"))
+
+
+def build_job(cmd_key, args, response, message):
+    """Job record for one authorized command"""
+    # the Slack message id keeps retried deliveries from queueing twice
+    job_id = message.get("client_msg_id") or f"{response['channel']}-{message['ts']}"
+    return {
+        "id": job_id,
+        "cmd_key": cmd_key,
+        "args": args,
+        "channel": response["channel"],
+        "ts": response["ts"],
+        "user": message.get("user"),
+        "files": message.get("files", []),
+        "created": time.time(),
+    }
+
+
+class JobQueue:
+    """Interface for job backends, runner(job) executes one job"""
+
+    def __init__(self, runner):
+        self.runner = runner
+        # job ID -> when it was first enqueued on this instance
+        self.seen = {}
+        self.seen_lock = threading.Lock()
+
+    def enqueue(self, job):
+        """Queue (or run) job, False when its ID was already enqueued"""
+        raise NotImplementedError
+
+    def first_delivery(self, job):
+        """False for a job ID this instance enqueued within JOB_DEDUP_TTL"""
+        now = time.monotonic()
+        with self.seen_lock:
+            expired = [
+                job_id
+                for job_id, seen_at in self.seen.items()
+                if now - seen_at > JOB_DEDUP_TTL
+            ]
+            for job_id in expired:
+                del self.seen[job_id]
+            if job["id"] in self.seen:
+                return False
+            self.seen[job["id"]] = now
+            return True
+
+    def claim(self):
+        """Take the next pending job, or None (pull backends only)"""
+        return None
+
+    def complete(self, job, error=None):
+        pass
+
+    def drain(self, deadline=None):
+        """Run pending jobs until the queue is empty or the deadline passes"""
+        handled = 0
+        while deadline is None or time.monotonic() < deadline:
+            job = self.claim()
+            if job is None:
+                break
+            try:
+                self.runner(job)
+                self.complete(job)
+            except Exception as e:
+                tracing.log(
+                    "error", "Error running job", job_id=job["id"], error=str(e)
+                )
+                self.complete(job, error=str(e))
+            handled += 1
+        return handled
+
+
+class InlineQueue(JobQueue):
+    """Runs the job straight away in the caller's thread.
+
+    Retries are only recognised on the instance that ran the first delivery,
+    so main() drops Slack retries for this backend.
+    """
+
+    def enqueue(self, job):
+        if not self.first_delivery(job):
+            return False
+        self.runner(job)
+        return True
+
+
+class InProcessQueue(JobQueue):
+    """Background worker thread in this process, for local testing"""
+
+    def __init__(self, runner):
+        super().__init__(runner)
+        self.jobs = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+
+    def enqueue(self, job):
+        if not self.first_delivery(job):
+            return False
+        self.jobs.put(job)
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(
+                    target=self.drain, name="jackaas-jobs", daemon=True
+                )
+                self.worker.start()
+        return True
+
+    def claim(self):
+        try:
+            return self.jobs.get(timeout=1)
+        except queue.Empty:
+            return None
+
+
+class SQLiteQueue(JobQueue):
+    """Persistent queue in a local SQLite file, drained by the worker entry point"""
+
+    def __init__(self, runner, path=JOB_QUEUE_PATH):
+        super().__init__(runner)
+        self.path = path
+        self.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'queued', error TEXT, "
+            "created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def execute(self, sql, params=()):
+        db = self.connect()
+        try:
+            return db.execute(sql, params).fetchall()
+        finally:
+            db.close()
+
+    def enqueue(self, job):
+        now = time.time()
+        db = self.connect()
+        try:
+            # the primary key ignores a retried delivery of a queued job
+            inserted = db.execute(
+                "INSERT OR IGNORE INTO jobs (id, payload, created, updated) "
+                "VALUES (?, ?, ?, ?)",
+                (job["id"], json.dumps(job), now, now),
+            ).rowcount
+        finally:
+            db.close()
+        return inserted == 1
+
+    def claim(self):
+        db = self.connect()
+        try:
+            # IMMEDIATE takes the write lock so two workers never claim one job
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id, payload FROM jobs WHERE status = 'queued' "
+                "ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', updated = ? WHERE id = ?",
+                (time.time(), row[0]),
+            )
+            db.execute("COMMIT")
+            return json.loads(row[1])
+        finally:
+            db.close()
+
+    def complete(self, job, error=None):
+        self.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+            ("failed" if error else "done", error, time.time(), job["id"]),
+        )
+
+
+class CloudTasksQueue(JobQueue):
+    """Pushes each job to the worker function through Google Cloud Tasks"""
+
+    def __init__(self, runner):
+        super().__init__(runner)
+        # optional dependency, only needed when this backend is selected
+        from google.cloud import tasks_v2
+
+        self.tasks_v2 = tasks_v2
+        self.client = tasks_v2.CloudTasksClient()
+        self.parent = self.client.queue_path(
+            os.environ.get("PROJECT_ID"),
+            os.environ.get("CLOUD_TASKS_LOCATION", "europe-west1"),
+            os.environ.get("CLOUD_TASKS_QUEUE", "jackaas-jobs"),
+        )
+        self.worker_url = JOB_WORKER_URL
+        self.service_account = JOB_WORKER_ACCOUNT
+
+    def enqueue(self, job):
+        task_id = re.sub(r"[^A-Za-z0-9_-]", "-", job["id"])
+        task = {
+            # a named task is rejected if it already exists, deduplicating retries
+            "name": f"{self.parent}/tasks/{task_id}",
+            "http_request": {
+                "http_method": self.tasks_v2.HttpMethod.POST,
+                "url": self.worker_url,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps(job).encode(),
+                "oidc_token": {"service_account_email": self.service_account},
+            },
+        }
+        try:
+            self.client.create_task(parent=self.parent, task=task)
+        except Exception as e:
+            if "AlreadyExists" not in type(e).__name__:
+                raise
+            return False
+        return True
+
+
+def verify_push(headers):
+    """True when headers carry the OIDC token Cloud Tasks signs for the worker"""
+    if not JOB_WORKER_URL or not JOB_WORKER_ACCOUNT:
+        # without an audience any Google-signed token would pass
+        return False
+    scheme, _, token = headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    # optional dependency, installed with google-cloud-tasks
+    from google.auth import exceptions
+    from google.auth.transport import requests as google_requests
+    from google.oauth2 import id_token
+
+    try:
+        claims = id_token.verify_oauth2_token(
+            token, google_requests.Request(), audience=JOB_WORKER_URL
+        )
+    except (ValueError, exceptions.GoogleAuthError) as e:
+        tracing.log("warning", "Rejected pushed job", error=str(e))
+        return False
+    return claims.get("email") == JOB_WORKER_ACCOUNT and bool(
+        claims.get("email_verified")
+    )
+
+
+BACKENDS = {
+    "inline": InlineQueue,
+    "memory": InProcessQueue,
+    "sqlite": SQLiteQueue,
+    "cloudtasks": CloudTasksQueue,
+}
+
+
+def get_queue(runner, backend=JOB_QUEUE_BACKEND):
+    """Build the configured job queue backend around runner"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown job queue backend: {backend}")
+    return BACKENDS[backend](runner)
@@ -1,11 +1,46 @@
-from jamf_client import JamfClient
-from slack_handler import SlackHandler
+import threading
+import time
+import job_queue
+import slack_progress
+
+# Bolt, Flask, requests and the Jamf modules are imported by
+# get_slack_handler, so URL verification and ignored events skip them
+
+# built once per warm instance and reused across events, anything scoped
+# to a single event must live in the handler call, never on these objects
+_slack_handler = None
+_runtime_lock = threading.Lock()
+
+
+def get_slack_handler():
+    """Return the instance-wide SlackHandler, building it on first use"""
+    global _slack_handler
+    if _slack_handler is None:
+        with _runtime_lock:
+            if _slack_handler is None:
+                from jamf_client import JamfClient
+                from slack_handler import SlackHandler
+
+                _slack_handler = SlackHandler(JamfClient())
+    return _slack_handler
+
+
+def reset_runtime():
+    """Drop the cached runtime so the next event rebuilds it"""
+    global _slack_handler
+    with _runtime_lock:
+        _slack_handler = None
 
 
 # Main function
 def main(data):
     data_body = data.get_json()
-    if "X-Slack-Retry-Num" in data.headers:
+    if (
+        "X-Slack-Retry-Num" in data.headers
+        and job_queue.JOB_QUEUE_BACKEND not in job_queue.SHARED_DEDUP_BACKENDS
+    ):
+        # only a backend shared by every instance can tell a retry that
+        # landed elsewhere from a new command, so retries are dropped
         return {"statusCode": 200, "body": ""}
     if "type" in data_body:
         if data_body["type"] == "url_verification":
@@ -15,10 +50,35 @@ def main(data):
             type_request = data_body["event"]["type"]
             if type_request != "message":
                 return 200, {"Content-type": "text/plain"}
-            slack_handler = SlackHandler(JamfClient())
+            slack_handler = get_slack_handler()
             return slack_handler.handle_slack_event(data)
 
 
+# Worker function: runs queued commands outside the Slack ack window
+def worker(data):
+    slack_handler = get_slack_handler()
+    job = data.get_json(silent=True)
+    if job and "cmd_key" in job:
+        # pushed by the cloud task queue, nobody else may post jobs
+        if not job_queue.verify_push(data.headers):
+            return "", 403
+        slack_handler.run_job(job)
+        return "", 200
+    # pull backends (sqlite) are drained until just before the deadline
+    deadline = time.monotonic() + slack_progress.COMMAND_DEADLINE
+    handled = slack_handler.jobs.drain(deadline=deadline)
+    return {"handled": handled}, 200
+
+
+# Sampler function: run on a schedule to record smart group counts
+def sample_groups(data):
+    history = get_slack_handler().jamf_client.group_history
+    if history is None:
+        return {"sampled": 0}, 200
+    counts = history.sample()
+    return {"sampled": len(counts)}, 200
+
+
 # Entry point
 if __name__ == "__main__":
     main()
@@ -1,23 +1,26 @@
 class SlackCommands:
-    # each entry needs a corresponding elif in
-    # the execute_command function in slack_handler
+    # each entry needs a corresponding handle_<key> method in slack_handler,
+    # the usage string is compiled into the command's argument grammar
     commands = {
-        "appstore": "appstore <all_or_computer_name>",
+        "appstore": "appstore <all_or_computer_name> [number_of_apps]",
         "count_group": "count group <group_name> <create_if_missing_true_false>",
-        "count_computers": "count computers <category> <subset_info> <count_flag_true_false>",
-        "create_group": "create group <group_name> <criterion_name> [and_or] [computers]",
+        "count_computers": "count computers <category> <subset_info> <value>",
+        "create_group": "create group [group_name] [criterion_name] [and_or] [computers]",
         "checkin": "checkin <computer_name1> [computer_name2] [computer_name3] [computer_name4]",
         "chart": "chart <type> <group_name1_or_model> [group_name2] [group_name3] [group_name4] [group_name5] [group_name6]",
         "details": "details <category> <computer_name1> [computer_name2] [computer_name3] [computer_name4]",
         "devicelock": "devicelock <computer_name> <passcode>",
         "duplicates": "duplicates all",
         "extattr": "extattr <all_or_name_of_extension_attribute>",
+        "extattr_values": "extattr values <name_of_extension_attribute>",
+        "files": "files",
         "flush": "flush <computer_name>",
+        "grep_script": "grep script <pattern>",
         "lockpass": "lockpass <computer_name>",
         "log": "log <computer_name1> [computer_name2] [computer_name3]",
-        "mdmexpiry": "mdmprofiles",
+        "mdmexpiry": "mdmexpiry <all_or_computer_name>",
         "mdmcommands": "mdmcommands <computer>",
-        "membership": "membership <computer_name>",
+        "membership": "membership <computer_name1> [computer_name2] [computer_name3]",
         "reboots": "reboots <computer_or_all>",
         "redeploy": "redeploy <computer_name1> [computer_name2] [computer_name3]",
         "recovery": "recovery <computer_name1> [computer_name2] [computer_name3]",
@@ -37,8 +40,11 @@ class SlackCommands:
         "devicelock": ["Update Computers"],
         "duplicates": ["Read Computers"],
         "extattr": ["Read Computer Extension Attributes"],
+        "extattr_values": ["Read Computers"],
+        "files": ["Read Jamf Content Distribution Server Files"],
         "log": ["Read Computers"],
         "show_script": ["Read Scripts"],
+        "grep_script": ["Read Scripts"],
         "chart": ["Read Smart Computer Groups"],
         "flush": ["Update Computers"],
         "reboots": ["Read Computers"],
@@ -57,20 +63,23 @@ class SlackCommands:
         "appstore": "list app store apps installed per client or for all (top 10)",
         "count_group": "count members of smart group",
         "count_computers": "count computers that fall under a subset of info.",
-        "create_group": "create smart or static group",
+        "create_group": "create smart or static group, attach a CSV of serial numbers (optionally with a `group` column) for large static groups",
         "checkin": "display checkin data for computers",
-        "chart": "display a chart image of up to 6 smart groups or by model, processor type and arch",
+        "chart": "display a chart image of up to 6 smart groups or by model, processor type and arch, `trend` charts group counts over time",
         "details": "display details of a JAMF category e.g. General",
         "devicelock": "send a device lock command to a client",
         "duplicates": "list all duplicate JAMF client names",
         "extattr": "display a list of all or specific extension attribute",
+        "extattr_values": "display how the values of an extension attribute are distributed over all clients",
+        "files": "list the files in the JCDS with download links",
         "help": "display this help",
         "flush": "flush MDM commands for a client",
+        "grep_script": "search the contents of every script for a word or regular expression",
         "lockpass": "display the lock password for a client",
         "log": "display log for a client",
         "mdmcommands": "display the completed, pending and failed commands sent to a computer",
         "mdmexpiry": "display a count and a list of all clients with expired MDM profiles",
-        "membership": "display group membership for a client",
+        "membership": "display group membership for one or more clients",
         "reboots": "display last reboot data for all or specific client",
         "redeploy": "redeploy the JAMF framework",
         "recovery": "display recovery key for a client",
@@ -0,0 +1,77 @@
+import contextvars
+import csv
+import io
+from contextlib import contextmanager
+
+# header names accepted for the serial number and group columns of a CSV
+SERIAL_COLUMNS = ("serial_number", "serial number", "serialnumber", "serial")
+GROUP_COLUMNS = ("group", "group_name", "group name")
+MAX_FILE_BYTES = 5 * 1024 * 1024
+
+_current_files = contextvars.ContextVar("slack_files", default=())
+
+
+def current():
+    """Files attached to the message of the command being handled"""
+    return _current_files.get()
+
+
+@contextmanager
+def attached(files):
+    token = _current_files.set(tuple(files or ()))
+    try:
+        yield
+    finally:
+        _current_files.reset(token)
+
+
+def is_csv(file):
+    return file.get("filetype") == "csv" or file.get("name", "").endswith(".csv")
+
+
+def download(client, file):
+    """Text of a private Slack file, read with the bot token"""
+    import requests
+
+    if file.get("size", 0) > MAX_FILE_BYTES:
+        raise ValueError(f"`{file.get('name')}` is larger than {MAX_FILE_BYTES} bytes")
+    response = requests.get(
+        file["url_private_download"],
+        headers={"Authorization": f"Bearer {client.token}"},
+        timeout=30,
+    )
+    response.raise_for_status()
+    return response.content.decode("utf-8-sig")
+
+
+def read_serials(text):
+    """{group name or None: [serials]} from a CSV of serial numbers.
+
+    A header row naming a serial column (and optionally a group column) is
+    used when present, otherwise the first column holds the serials.
+    """
+    rows = list(csv.reader(io.StringIO(text)))
+    if not rows:
+        return {}
+    header = [cell.strip().lower() for cell in rows[0]]
+    serial_column = next(
+        (header.index(name) for name in SERIAL_COLUMNS if name in header), None
+    )
+    group_column = next(
+        (header.index(name) for name in GROUP_COLUMNS if name in header), None
+    )
+    if serial_column is None:
+        serial_column = 0
+    else:
+        rows = rows[1:]
+    groups = {}
+    for row in rows:
+        if len(row) <= serial_column or not row[serial_column].strip():
+            continue
+        group = None
+        if group_column is not None and len(row) > group_column:
+            group = row[group_column].strip() or None
+        serials = groups.setdefault(group, [])
+        serials.append(row[serial_column].strip())
+    # the same serial listed twice would be rejected by Jamf
+    return {group: list(dict.fromkeys(serials)) for group, serials in groups.items()}
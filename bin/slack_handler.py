@@ -1,5 +1,11 @@
 import os
-import slack_commands
+import re
+import command_router
+import jamf_memo
+import job_queue
+import slack_files
+import slack_progress
+import tracing
 from datetime import datetime, timedelta
 from collections import Counter
 from slack_bolt import App
@@ -13,16 +19,27 @@ class SlackHandler:
         self.jamf_client = jamf_client
         self.jamf_utils = self.jamf_client.endpoint_details
         self.groups = self.jamf_client.groups
-        self.commands = slack_commands.SlackCommands.commands
-        self.cmd_permissions = slack_commands.SlackCommands.cmd_permissions
-        self.help = slack_commands.SlackCommands.helpmessage
-        self.user_auth = UserAuthorization()
+        # grammar, permissions and help of every command, compiled at import
+        self.router = command_router.ROUTER
+        self.hardware_chart_text = {
+            "model": "Model comparison on request",
+            "processor": "Processor comparison on request",
+            "arch": "Architecture comparison on request",
+        }
+        self.user_auth = UserAuthorization(self.jamf_client)
+        self.user_auth.warm()
         self.app = App(
             process_before_response=True,
             token=os.environ.get("SLACK_BOT_TOKEN"),
             signing_secret=os.environ.get("SLACK_SIGNING_SECRET"),
+            # auth.test on startup, can be turned off for offline benchmarks
+            token_verification_enabled=os.environ.get(
+                "SLACK_TOKEN_VERIFICATION", "true"
+            ).lower()
+            == "true",
         )
         self.handler = SlackRequestHandler(self.app)
+        self.jobs = job_queue.get_queue(self.run_job)
         # Register all the commands with the app
         self.app.message()(self.handle_message)
 
@@ -35,120 +52,157 @@ class SlackHandler:
         ack()
         response = say(":processing: Processing the request...")
         text = message["text"].strip()
-        print(f"Received command text: {text}")
+        # the text can hold secrets (devicelock passcodes), only log it on debug
+        tracing.log("debug", "Received command text", text=text)
         user_id = message["user"]
-        authorized, cmd_key = self.user_auth.is_user_authorized(
-            user_id, text, response, self.app.client
-        )
-        print(f"User authorized: {authorized}, Command key: {cmd_key}")
+        command, args = self.router.route(text)
+        with tracing.span("authorize", user=user_id) as auth_span:
+            authorized, cmd_key = self.user_auth.is_user_authorized(
+                user_id, command, response, self.app.client
+            )
+            auth_span.set(authorized=authorized, command=cmd_key)
         if not authorized:
             return
 
-        if cmd_key in self.commands:
-            args = text[len(cmd_key) :].strip()
-            bypass_functions = ["files", "help", "commands", "duplicates"]
-            if args or bypass_functions in cmd_key:
-                self.process_command(cmd_key, args, response)
-            else:
-                self.app.client.chat_update(
-                    channel=response["channel"],
-                    ts=response["ts"],
-                    text=f"No arguments provided for command '{cmd_key}'.",
-                )
-        else:
+        try:
+            # reject malformed arguments before any work is queued
+            command.parse(args)
+        except ValueError as e:
             self.app.client.chat_update(
-                channel=response["channel"],
-                ts=response["ts"],
-                text="Unknown command. Please use one of the following: "
-                + ", ".join(self.commands.keys()),
+                channel=response["channel"], ts=response["ts"], text=str(e)
             )
+            return
+        # the job runs inline or on a worker, depending on the backend
+        job = job_queue.build_job(cmd_key, args, response, message)
+        if not self.jobs.enqueue(job):
+            # a Slack retry of a message whose job is already queued or done
+            tracing.log("info", "Dropped duplicate delivery", job_id=job["id"])
+            self.app.client.chat_delete(channel=response["channel"], ts=response["ts"])
+
+    def run_job(self, job):
+        """Worker side of a queued command, re-authorized before it runs"""
+        response = {"channel": job["channel"], "ts": job["ts"]}
+        command = self.router.get(job["cmd_key"])
+        # privileges may have been revoked since the job was queued
+        authorized = command is not None and job.get("user") is not None
+        if authorized:
+            authorized, _ = self.user_auth.is_user_authorized(
+                job["user"], command, response, self.app.client
+            )
+        if not authorized:
+            tracing.log(
+                "warning",
+                "Refused unauthorized job",
+                job_id=job.get("id"),
+                user=job.get("user"),
+                command=job["cmd_key"],
+            )
+            return
+        self.process_command(
+            job["cmd_key"], job["args"], response, job.get("files", ())
+        )
 
     # Modify process_command to handle long responses
-    def process_command(self, cmd_key, args, response):
+    def process_command(self, cmd_key, args, response, files=()):
         """Processes specific commands dynamically based on the key"""
-        handler_function = getattr(self, f"handle_{cmd_key}", None)
-        try:
-            if handler_function:
-                result_message = handler_function(args)
-                # If the result is a list (indicating multiple message chunks), send them one by one
-                if isinstance(result_message, list):
-                    for idx, msg_chunk in enumerate(result_message):
-                        if idx == 0:
-                            # Update the initial processing message with the first chunk
-                            self.app.client.chat_update(
-                                channel=response["channel"],
-                                ts=response["ts"],
-                                text=msg_chunk,
-                            )
-                        else:
-                            # Send the remaining chunks as new messages in the thread
-                            self.app.client.chat_postMessage(
-                                channel=response["channel"],
-                                thread_ts=response["ts"],  # Keep in the same thread
-                                text=msg_chunk,
-                            )
-                elif isinstance(result_message, dict) and "blocks" in result_message:
-                    # Update the processing message with the actual result
-                    self.app.client.chat_update(
-                        channel=response["channel"],
-                        ts=response["ts"],
-                        blocks=result_message["blocks"],  # Use blocks directly
+        command = self.router.get(cmd_key)
+        handler_function = getattr(self, command.handler, None) if command else None
+        with tracing.span("command", command=cmd_key) as command_span:
+            try:
+                if handler_function:
+                    with jamf_memo.request_scope() as memo, slack_progress.reporting(
+                        self.app.client, response["channel"], response["ts"]
+                    ) as progress, slack_files.attached(files), tracing.span("handler"):
+                        result_message = handler_function(command.parse(args))
+                    command_span.set(memo_hits=memo.hits, memo_misses=memo.misses)
+                    result_message = progress.annotate(result_message)
+                    # If the result is a list (indicating multiple message chunks), send them one by one
+                    chunks = (
+                        result_message
+                        if isinstance(result_message, list)
+                        else [result_message]
                     )
+                    for idx, msg_chunk in enumerate(chunks):
+                        self.send_chunk(msg_chunk, response, first=idx == 0)
                 else:
-                    # Handle single message case
                     self.app.client.chat_update(
                         channel=response["channel"],
                         ts=response["ts"],
-                        text=result_message,
+                        text="Unknown command. Please use one of the following: "
+                        + ", ".join(self.router.commands),
                     )
-            else:
+            except Exception as e:
+                # Catch the exception, log it, and update the message with the error
+                error_message = (
+                    f"An error occurred for '{cmd_key}':\n```\n{str(e)}\n```"
+                )
+                command_span.set(error=f"{type(e).__name__}: {e}")
                 self.app.client.chat_update(
-                    channel=response["channel"],
-                    ts=response["ts"],
-                    text="Unknown command. Please use one of the following: "
-                    + ", ".join(self.commands.keys()),
+                    channel=response["channel"], ts=response["ts"], text=error_message
                 )
-        except Exception as e:
-            # Catch the exception, log it, and update the message with the error
-            error_message = f"An error occurred for '{cmd_key}':\n```\n{str(e)}\n```"
-            print(f"Error in process_command: {e}")  # This logs the error to GCP logs
+
+    def send_chunk(self, message, response, first):
+        """Post one result chunk: text or {"blocks", "files"}.
+
+        The first chunk replaces the processing message, the rest go to its thread.
+        """
+        if isinstance(message, dict) and "blocks" in message:
+            content = {"blocks": message["blocks"]}  # Use blocks directly
+        else:
+            content = {"text": message}
+        if first:
             self.app.client.chat_update(
-                channel=response["channel"], ts=response["ts"], text=error_message
+                channel=response["channel"], ts=response["ts"], **content
             )
+        else:
+            self.app.client.chat_postMessage(
+                channel=response["channel"],
+                thread_ts=response["ts"],  # Keep in the same thread
+                **content,
+            )
+        if isinstance(message, dict):
+            # locally rendered charts are attached to the thread
+            for upload in message.get("files", []):
+                self.app.client.files_upload_v2(
+                    channel=response["channel"],
+                    thread_ts=response["ts"],
+                    file=upload["content"],
+                    filename=upload["filename"],
+                    title=upload["title"],
+                )
 
     def handle_help(self, *args):
         """Return the list of available commands with description."""
         command_list = "\n".join(
-            [f"`{cmd}`: {desc}" for cmd, desc in self.help.items()]
+            [
+                f"`{command.key}`: {command.help}"
+                for command in self.router
+                if command.help
+            ]
         )
         return f"`Commands and description`:\n{command_list}"
 
     def handle_commands(self, *args):
         """Return the list of available commands."""
         command_list = "\n".join(
-            [f"`{cmd}`: {desc}" for cmd, desc in self.commands.items()]
+            [f"`{command.key}`: {command.usage}" for command in self.router]
         )
         return f"`Available commands`:\n{command_list}"
 
-    def handle_count_group(self, args):
-        count_cmd = args.split()
-        if len(count_cmd) >= 2:
-            group_name = " ".join(
-                count_cmd[0:-1]
-            )  # Join everything except the last part as group name
-            create_missing = (
-                count_cmd[-1].lower() == "true"
-            )  # The last part is the true/false flag
-            counted = self.count_computers_in_group(group_name, create_missing)
-            return counted
-        else:
-            return "Please provide a valid type, name, and whether to create if missing (true/false)."
+    def run_command(self, cmd_key, args):
+        """Parse args with the command's grammar and call its handler"""
+        command = self.router.get(cmd_key)
+        return getattr(self, command.handler)(command.parse(args))
+
+    def handle_count_group(self, params):
+        return self.count_computers_in_group(
+            params["group_name"], params["create_if_missing_true_false"]
+        )
 
-    def handle_details(self, args):
-        deets = args.split()
-        if len(deets) >= 2:
-            category = deets[0]
-            computer_names = deets[1:]
+    def handle_details(self, params):
+        category = params["category"]
+        computer_names = params["computer_names"]
+        if computer_names:
             try:
                 details = self.jamf_client.orchestra.orchestrate_get_computer_details(
                     computer_names=computer_names, category=category
@@ -174,60 +228,112 @@ class SlackHandler:
         else:
             return "Please provide a category and at least one computer name."
 
-    def handle_create_group(self, args):
-        parts = [part.strip() for part in args.split('"') if part.strip()]
-        if len(parts) >= 2:
-            group_name = parts[0]
-            criterion_name = parts[1]
+    def handle_create_group(self, params):
+        csv_files = [file for file in slack_files.current() if slack_files.is_csv(file)]
+        if csv_files:
+            # static groups from attached CSVs of serial numbers, every word
+            # after `create group` is the group name
+            group_name = " ".join(value for value in params.values() if value)
+            return self.create_groups_from_csv(group_name or None, csv_files)
+        group_name = params["group_name"]
+        criterion_name = params["criterion_name"]
+        if group_name and criterion_name:
             and_or = (
-                parts[2].lower()
-                if len(parts) > 2 and parts[2].lower() in ["and", "or"]
+                params["and_or"].lower()
+                if params["and_or"] and params["and_or"].lower() in ["and", "or"]
                 else "and"
             )
-            computers = parts[3].split() if len(parts) > 3 else None
+            computers = params["computers"].split() if params["computers"] else None
             if computers:
-                self.groups.create_group(
+                created = self.groups.create_group(
                     group_name, is_smart="false", computers=computers
                 )
+                if created is None:
+                    return f"Failed to create static group `{group_name}`."
                 return f"Static group `{group_name}` has been created with the specified computers."
             else:
-                self.groups.create_group(
-                    group_name, criterion_name, is_smart="true", and_or=and_or
+                created = self.groups.create_group(
+                    group_name,
+                    is_smart="true",
+                    criterion_name=criterion_name,
+                    and_or=and_or,
                 )
+                if created is None:
+                    return f"Failed to create smart group `{group_name}`."
                 return f"Smart group `{group_name}` for `{criterion_name}` has been created."
         else:
-            return "Please provide both a group name and a criteria name."
-
-    def handle_count_computers(self, args):
-        parts = args.split()
-        if len(parts) >= 3:  # At least category, subset, and a value
-            category = parts[0]  # "general"
-            subset = parts[1]  # e.g., "enrolledViaAutomatedDeviceEnrollment"
-            value = parts[2]  # true/false or other value
-            count = self.jamf_client.orchestra.orchestrate_count_computers_subset(
-                category, subset, value
+            return "Please provide both a group name and a criteria name, or attach a CSV of serial numbers."
+
+    def create_groups_from_csv(self, group_name, csv_files):
+        """One static group per CSV group column value (or group_name)"""
+        groups = {}
+        for file in csv_files:
+            text = slack_files.download(self.app.client, file)
+            for name, serials in slack_files.read_serials(text).items():
+                name = name or group_name
+                if name is None:
+                    return f"Please name the group or add a `group` column to `{file.get('name')}`."
+                groups.setdefault(name, []).extend(serials)
+        if not groups:
+            return "No serial numbers found in the attached CSV."
+        results = self.groups.create_groups(
+            [
+                {
+                    "group_name": name,
+                    "is_smart": "false",
+                    "computers": list(dict.fromkeys(serials)),
+                }
+                for name, serials in groups.items()
+            ]
+        )
+        messages = {
+            "created": "Static group `{name}` has been created with {count} computers.",
+            "failed": "Failed to create static group `{name}`.",
+            "timed out": "Creating static group `{name}` timed out, check Jamf before retrying.",
+            "not attempted": "Static group `{name}` was not attempted.",
+        }
+        return "\n".join(
+            messages[status].format(name=name, count=len(groups[name]))
+            for name, status in results
+        )
+
+    def handle_count_computers(self, params):
+        category = params["category"]  # "general"
+        subset = params["subset_info"]  # e.g., "enrolledViaAutomatedDeviceEnrollment"
+        value = params["value"]  # true/false or other value
+        count = self.jamf_client.orchestra.orchestrate_count_computers_subset(
+            category, subset, value
+        )
+        return f"Count of computers in `{category}` for `{subset}` (value `{value}`): {count}"
+
+    def hardware_chart_helper(self, dimensions):
+        """Charts every requested hardware dimension from a single fleet scan"""
+        counters = self.jamf_client.orchestra.orchestrate_hardware_counts(dimensions)
+        blocks, files = [], []
+        for dimension in dimensions:
+            data_counts = counters[dimension]
+            if not data_counts:
+                continue
+            chart = self.jamf_utils.generate_other_chart(
+                list(data_counts.keys()),
+                list(data_counts.values()),
+                "horizontalBar",
+                text=self.hardware_chart_text[dimension],
             )
-            return f"Count of computers in `{category}` for `{subset}` (value `{value}`): {count}"
-        else:
-            return "Please provide a valid category, subset, and value."
+            blocks.extend(chart["blocks"])
+            files.extend(chart.get("files", []))
+        if not blocks:
+            return "No data found."
+        return {"blocks": blocks, "files": files} if files else {"blocks": blocks}
 
     def model_chart_helper(self):
-        return self.chart_helper(
-            self.jamf_client.orchestra.orchestrate_get_computer_models,
-            chart_text="Model comparison on request",
-        )
+        return self.hardware_chart_helper(["model"])
 
     def processor_chart_helper(self):
-        return self.chart_helper(
-            self.jamf_client.orchestra.orchestrate_get_computer_processors,
-            chart_text="Processor comparison on request",
-        )
+        return self.hardware_chart_helper(["processor"])
 
     def arch_chart_helper(self):
-        return self.chart_helper(
-            self.jamf_client.orchestra.orchestrate_get_computer_architectures,
-            chart_text="Architecture comparison on request",
-        )
+        return self.hardware_chart_helper(["arch"])
 
     # unfinished
     def appstore_chart_helper(self):
@@ -274,20 +380,25 @@ class SlackHandler:
         )
         return chart_url
 
-    def handle_chart(self, args):
-        parts = args.split()
-        chart_type = parts[0]
-        group_names = parts[1:]
+    def handle_chart(self, params):
+        chart_type = params["type"]
+        group_names = [params["group_name1_or_model"], *params["group_names"]]
         # check if the chart type is valid
-        if chart_type not in ["pie", "bar", "doughnut"]:
-            return "Invalid chart type. Please choose `pie`, `bar` or `doughnut`."
+        if chart_type not in ["pie", "bar", "doughnut", "trend"]:
+            return (
+                "Invalid chart type. Please choose `pie`, `bar`, `doughnut` or `trend`."
+            )
+        if chart_type == "trend":
+            if len(group_names) > 6:
+                return "Please provide a maximum of six group names."
+            # drawn from the sampled history, Jamf is not called
+            return self.jamf_utils.generate_trend_chart(group_names)
         if chart_type == "bar":
-            if "model" in group_names:
-                return self.model_chart_helper()
-            elif "processor" in group_names:
-                return self.processor_chart_helper()
-            elif "arch" in group_names:
-                return self.arch_chart_helper()
+            dimensions = [
+                name for name in group_names if name in self.hardware_chart_text
+            ]
+            if dimensions:
+                return self.hardware_chart_helper(dimensions)
             elif "apps" in group_names:
                 return self.appstore_chart_helper()
         # check if at least two group names are provided
@@ -299,17 +410,16 @@ class SlackHandler:
             chart = self.jamf_utils.generate_smart_group_chart(group_names, chart_type)
             return chart
 
-    def handle_show_script(self, args):
-        script = args.split()
-        if len(script) >= 1:
-            if script[0] == "all":
+    def handle_show_script(self, params):
+        script_name = params["script_name_or_all"]
+        if script_name:
+            if script_name == "all":
                 scripts = self.jamf_client.scripts.get_all_scripts_content()
                 if isinstance(scripts, list):
                     # Format the list into a string for display
                     result = "\n".join(scripts)
                     return f"```{result}```"
             else:
-                script_name = " ".join(script)
                 script_content = self.jamf_client.scripts.get_script_by_name(
                     script_name
                 )
@@ -339,13 +449,34 @@ class SlackHandler:
         else:
             return "Please provide the script name after `show script`."
 
-    def handle_mdmcommands(self, args):
-        mdm_command_log = args.split()
+    def handle_grep_script(self, params):
+        pattern = params["pattern"]
+        try:
+            matches = self.jamf_client.scripts.grep(pattern)
+        except re.error as e:
+            return f"Invalid pattern `{pattern}`: {e}"
+        if not matches:
+            return f"No scripts match `{pattern}`."
+        sections = [f"{len(matches)} scripts match `{pattern}`:"]
+        for name, lines in matches:
+            found = "\n".join(f"{number}: {line}" for number, line in lines)
+            sections.append(f"*{name}*\n```{found}```")
+        # Slack message character limit
+        SLACK_MESSAGE_LIMIT = 4000
+        messages = [""]
+        for section in sections:
+            section = section[:SLACK_MESSAGE_LIMIT]
+            if len(messages[-1]) + len(section) + 1 > SLACK_MESSAGE_LIMIT:
+                messages.append("")
+            messages[-1] = f"{messages[-1]}\n{section}".lstrip("\n")
+        return messages
+
+    def handle_mdmcommands(self, params):
+        mdm_command_log = [params["computer"]]
         if len(mdm_command_log) >= 1:
+            computer_ids = self.jamf_utils.get_computer_ids_from_names(mdm_command_log)
             for computer_name in mdm_command_log:
-                computer_id = self.jamf_utils.get_computer_id_from_name(
-                    computer_name, computers=None
-                )
+                computer_id = computer_ids[computer_name]
                 mdm_command_log_info = (
                     self.jamf_client.orchestra.orchestrate_mdm_commandhistory(
                         computer_id
@@ -358,13 +489,14 @@ class SlackHandler:
         else:
             return "Please enter the proper MDM command log command followed by computernames (or `u.sername`)"
 
-    def handle_appstore(self, args):
-        appstoreapps = args.split()
+    def handle_appstore(self, params):
+        appstoreapps = [params["all_or_computer_name"]]
         # Check if the first argument is "all"
-        if len(appstoreapps) >= 1 and appstoreapps[0] == "all":
+        if appstoreapps[0] == "all":
             # If there is a second argument (number), use it, otherwise default to 15
-            if len(appstoreapps) > 1 and appstoreapps[1].isdigit():
-                number = int(appstoreapps[1])
+            number = params["number_of_apps"]
+            if number and number.isdigit():
+                number = int(number)
             else:
                 number = 15
 
@@ -376,10 +508,9 @@ class SlackHandler:
                 return appstore_overview
 
         # Handle cases for specific computer names
+        computer_ids = self.jamf_utils.get_computer_ids_from_names(appstoreapps)
         for computer_name in appstoreapps:
-            computer_id = self.jamf_utils.get_computer_id_from_name(
-                computer_name, computers=None
-            )
+            computer_id = computer_ids[computer_name]
             appstore_info = self.jamf_client.orchestra.orchestrate_get_appstore(
                 str(computer_id)
             )
@@ -392,8 +523,8 @@ class SlackHandler:
         return "Please enter the proper appstore command followed by computernames (or `u.sername`)."
 
     # untested
-    def handle_mdmexpiry(self, args):
-        expiry = args.split()
+    def handle_mdmexpiry(self, params):
+        expiry = [params["all_or_computer_name"]]
         if len(expiry) >= 1:
             if expiry[0] == "all":
                 threshold_date = datetime.now()
@@ -401,10 +532,9 @@ class SlackHandler:
                     threshold_date
                 )
                 return expiry_dates
+            computer_ids = self.jamf_utils.get_computer_ids_from_names(expiry)
             for computer_name in expiry:
-                computer_id = self.jamf_utils.get_computer_id_from_name(
-                    computer_name, computers=None
-                )
+                computer_id = computer_ids[computer_name]
                 expiry_info = self.jamf_utils.mdm_expiry(computer_id)
                 if expiry_info:
                     return f"MDM expiry info for `{computer_name}`: {expiry_info}"
@@ -413,39 +543,51 @@ class SlackHandler:
         else:
             return "Please enter the proper MDM expiry command followed by computernames (or `u.sername` or `all`)"
 
-    def handle_extattr(self, args):
-        extattr = args.split()
-        if len(extattr) >= 1:
-            if extattr[0] == "all":
+    def handle_extattr(self, params):
+        extattr_name = params["all_or_name_of_extension_attribute"]
+        if extattr_name:
+            if extattr_name == "all":
                 extattrs = self.jamf_utils.get_all_extattrs_names()
                 if isinstance(extattrs, list):
                     # Format the list into a string for display
                     result = "\n".join(extattrs)
                     return f"```{result}```"
             else:
-                extattr_name = " ".join(extattr)
                 result = self.jamf_utils.get_extattr_by_name(extattr_name)
                 return f"```{result}```"
         else:
             return "Please provide the extattr name after `extattr`."
 
-    def handle_checkin(self, args):
-        checkin = args.split()
+    def handle_extattr_values(self, params):
+        extattr_name = params["name_of_extension_attribute"]
+        try:
+            distribution = self.jamf_client.extattrs.distribution(extattr_name)
+        except ValueError as e:
+            return str(e)
+        if not distribution:
+            return f"No client has a value for `{extattr_name}`."
+        top = distribution.most_common(20)
+        lines = "\n".join(f"{count:>6}  {value}" for value, count in top)
+        return (
+            f"`{extattr_name}`: {len(distribution)} distinct values on "
+            f"{sum(distribution.values())} clients, most common:\n```{lines}```"
+        )
+
+    def handle_checkin(self, params):
+        checkin = params["computer_names"]
         if len(checkin) >= 1:
             if checkin[0] == "all":
                 checkin_list = []
-                jamf_computers = self.jamf_utils.get_all_computers()
                 days_threshold = 40
                 threshold_date = datetime.now() - timedelta(days=days_threshold)
                 checkins = self.jamf_client.orchestra.orchestrate_checkin_all(
-                    jamf_computers, threshold_date, checkin_list
+                    threshold_date, checkin_list
                 )
                 return checkins
             else:
+                computer_ids = self.jamf_utils.get_computer_ids_from_names(checkin)
                 for computer_name in checkin:
-                    computer_id = self.jamf_utils.get_computer_id_from_name(
-                        computer_name, computers=None
-                    )
+                    computer_id = computer_ids[computer_name]
                     checkin_info = self.jamf_utils.last_check_in(computer_id)
                     if checkin_info:
                         return f"Check-in info: `{computer_name}`: {checkin_info}"
@@ -454,13 +596,12 @@ class SlackHandler:
         else:
             return "Please enter the proper checkin command followed by computernames (or `u.sername` or `all`)"
 
-    def handle_log(self, args):
-        log = args.split()
+    def handle_log(self, params):
+        log = params["computer_names"]
         if len(log) >= 1:
+            computer_ids = self.jamf_utils.get_computer_ids_from_names(log)
             for computer_name in log:
-                computer_id = self.jamf_utils.get_computer_id_from_name(
-                    computer_name, computers=None
-                )
+                computer_id = computer_ids[computer_name]
                 if computer_id is not None:
                     log_info = self.jamf_client.orchestra.orchestrate_get_computer_logs(
                         [computer_id]
@@ -479,13 +620,12 @@ class SlackHandler:
         else:
             return "Please enter the proper log command followed by computernames (or `u.sername`)"
 
-    def handle_recovery(self, args):
-        recovery = args.split()
+    def handle_recovery(self, params):
+        recovery = params["computer_names"]
         if len(recovery) >= 1:
+            computer_ids = self.jamf_utils.get_computer_ids_from_names(recovery)
             for computer_name in recovery:
-                computer_id = self.jamf_utils.get_computer_id_from_name(
-                    computer_name, computers=None
-                )
+                computer_id = computer_ids[computer_name]
                 if computer_id is not None:
                     recovery_info = self.jamf_client.orchestra.orchestrate_recoverykey(
                         computer_id
@@ -499,13 +639,12 @@ class SlackHandler:
         else:
             return "Please enter the proper recovery command followed by computernames (or `u.sername`)"
 
-    def handle_redeploy(self, args):
-        redeploy = args.split()
+    def handle_redeploy(self, params):
+        redeploy = params["computer_names"]
         if len(redeploy) >= 1:
+            computer_ids = self.jamf_utils.get_computer_ids_from_names(redeploy)
             for computer_name in redeploy:
-                computer_id = self.jamf_utils.get_computer_id_from_name(
-                    computer_name, computers=None
-                )
+                computer_id = computer_ids[computer_name]
                 if computer_id is not None:
                     redeploy_info = self.jamf_client.orchestra.orchestrate_redeploy(
                         computer_id
@@ -519,13 +658,12 @@ class SlackHandler:
         else:
             return "Please enter the proper redeploy command followed by computernames (or `u.sername`)"
 
-    def handle_lockpass(self, args):
-        lockpass = args.split()
+    def handle_lockpass(self, params):
+        lockpass = [params["computer_name"]]
         if len(lockpass) >= 1:
+            computer_ids = self.jamf_utils.get_computer_ids_from_names(lockpass)
             for computer_name in lockpass:
-                computer_id = self.jamf_utils.get_computer_id_from_name(
-                    computer_name, computers=None
-                )
+                computer_id = computer_ids[computer_name]
                 if computer_id is not None:
                     lockpass_info = self.jamf_utils.lockpass(computer_id)
                     if lockpass_info:
@@ -533,12 +671,10 @@ class SlackHandler:
                     else:
                         return f"Failed to send lock and pass command to `{computer_name}`."
 
-    def handle_devicelock(self, args):
-        lock = args.split()
-        # make sure we have at least 2 arguments
-        if len(lock) >= 2:
-            computer = lock[0]
-            passcode = lock[1]
+    def handle_devicelock(self, params):
+        computer = params["computer_name"]
+        passcode = params["passcode"]
+        if computer and passcode:
             computer_id = self.jamf_utils.get_computer_id_from_name(
                 computer, computers=None
             )
@@ -553,25 +689,10 @@ class SlackHandler:
         else:
             return "Please enter the proper device lock command followed by computernames (or `u.sername`)"
 
-    def handle_duplicates(self, args):
-        dupes = args.split()
-        if dupes[0] == "all":
-            jamf_computers = self.jamf_utils.get_all_computers()
-            duplicate_laptops = []
-            seen_laptops = set()
-            for laptop in jamf_computers["computers"]:
-                name = laptop["name"]
-                if name in seen_laptops:
-                    if "_" not in name:
-                        duplicate_laptops.append(name)
-                else:
-                    seen_laptops.add(name)
-            duplicates = self.jamf_client.orchestra.orchestrate_duplicates(
-                duplicate_laptops
-            )
-            return duplicates
+    def handle_duplicates(self, params):
+        return self.jamf_client.orchestra.orchestrate_duplicates()
 
-    def handle_files(self, args):
+    def handle_files(self, *args):
         jcds_files = self.jamf_client.orchestra.orchestrate_files()
         jcds_list = []
         for file in jcds_files:
@@ -600,13 +721,13 @@ class SlackHandler:
 
         return messages  # Always return a list of message chunks
 
-    def handle_reboots(self, args):
+    def handle_reboots(self, params):
         startup_data = []
         # get the days threshold from the command arguments, default to 40 if not specified
         days_threshold = 60
         threshold_date = datetime.now() - timedelta(days=days_threshold)
         startup_data = self.jamf_client.orchestra.orchestrate_reboots(
-            args, threshold_date, startup_data
+            params["computer_or_all"], threshold_date, startup_data
         )
         # Prepare and send the output message
         if startup_data:
@@ -618,33 +739,29 @@ class SlackHandler:
                 "All specified computers have started within the last specified days."
             )
 
-    def handle_membership(self, args):
-        users = args.split()
+    def handle_membership(self, params):
+        users = params["computer_names"]
         if len(users) >= 1:
+            computer_ids = self.jamf_utils.get_computer_ids_from_names(users)
+            # every device is answered from the reverse membership index
+            memberships = self.jamf_client.membership.computer_groups(
+                [computer_id for computer_id in computer_ids.values() if computer_id]
+            )
             output = []
             for user in users:
-                membership_info = (
-                    self.jamf_client.orchestra.orchestrate_get_computer_details(
-                        computer_names=[user], category="groupMemberships"
+                computer_id = computer_ids.get(user)
+                if computer_id is None:
+                    output.append(f"Failed to get membership info for `{user}`.")
+                    continue
+                group_names = memberships[computer_id]
+                if group_names:
+                    output.append(
+                        f"Membership info for `{user}`:\n```"
+                        + "\n".join(group_names)
+                        + "```"
                     )
-                )
-                if membership_info:
-                    # since membership_info is a list, iterate over it to access group details
-                    group_names = []
-                    for group in membership_info[
-                        0
-                    ]:  # assuming membership_info[0] is a list of groups
-                        group_names.append(group["groupName"])
-                    if group_names:
-                        output.append(
-                            f"Membership info for `{user}`:\n```"
-                            + "\n".join(group_names)
-                            + "```"
-                        )
-                    else:
-                        output.append(f"No group memberships found for `{user}`.")
                 else:
-                    output.append(f"Failed to get membership info for `{user}`.")
+                    output.append(f"No group memberships found for `{user}`.")
 
             return "\n\n".join(output)  # combine the output for each user
         else:
@@ -0,0 +1,94 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+import tracing
+
+# minimum seconds between two chat_update calls for the same message
+PROGRESS_INTERVAL = float(os.environ.get("SLACK_PROGRESS_INTERVAL", "3"))
+# publish whatever has been computed once a command runs this long,
+# keep it below the function timeout
+COMMAND_DEADLINE = float(os.environ.get("COMMAND_DEADLINE", "50"))
+PARTIAL_PREVIEW_LIMIT = 3000
+
+_current_reporter = contextvars.ContextVar("slack_progress", default=None)
+
+
+class ProgressReporter:
+    def __init__(
+        self,
+        client,
+        channel,
+        ts,
+        interval=PROGRESS_INTERVAL,
+        deadline=COMMAND_DEADLINE,
+    ):
+        self.client = client
+        self.channel = channel
+        self.ts = ts
+        self.interval = interval
+        self.deadline = time.monotonic() + deadline
+        self.last_update = 0.0
+        self.truncated = None
+        self.lock = threading.Lock()
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def update(self, done, total, label="devices", partial=None):
+        """Show scan progress and the partial result, at most once per interval"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_update < self.interval:
+                return
+            self.last_update = now
+        text = f":processing: {done:,}/{total:,} {label} scanned"
+        try:
+            if callable(partial):
+                # only render the preview for updates that are actually sent
+                partial = partial()
+            if partial:
+                text += f"\n{partial[:PARTIAL_PREVIEW_LIMIT]}"
+            self.client.chat_update(channel=self.channel, ts=self.ts, text=text)
+        except Exception as e:
+            # progress is best effort, never fail the scan over it
+            tracing.log("warning", "Error updating progress", error=str(e))
+
+    def mark_truncated(self, done, total, label="devices"):
+        self.truncated = f"{done:,}/{total:,} {label}"
+
+    def annotate(self, result_message):
+        """Add a partial-result note to a handler result cut by the deadline"""
+        if not self.truncated:
+            return result_message
+        note = f"_Partial result: deadline reached after {self.truncated}._"
+        return add_note(result_message, note)
+
+
+def add_note(result_message, note):
+    """Append note to a text, blocks or chunked (first chunk) result"""
+    if isinstance(result_message, list) and result_message:
+        return [add_note(result_message[0], note)] + result_message[1:]
+    if isinstance(result_message, dict) and "blocks" in result_message:
+        context = {
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": note}],
+        }
+        return {**result_message, "blocks": result_message["blocks"] + [context]}
+    return f"{result_message}\n{note}"
+
+
+def current():
+    """Return the progress reporter of the command being handled, if any"""
+    return _current_reporter.get()
+
+
+@contextmanager
+def reporting(client, channel, ts):
+    """Report fan-out progress to the given Slack message for one command"""
+    token = _current_reporter.set(ProgressReporter(client, channel, ts))
+    try:
+        yield _current_reporter.get()
+    finally:
+        _current_reporter.reset(token)
@@ -0,0 +1,212 @@
+import contextvars
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# "json" logs finished spans to stdout, which Cloud Logging parses as
+# structured entries, "otel" also hands them to OpenTelemetry, "off" disables
+TRACING = os.environ.get("TRACING", "json").lower()
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# share of per-device log lines and Jamf call spans that are emitted,
+# failures are always emitted and everything is still counted on the command
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.01"))
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+_current_span = contextvars.ContextVar("tracing_span", default=None)
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def enabled_for(level):
+    return LEVELS[level.upper()] >= LEVELS.get(LOG_LEVEL, 20)
+
+
+def sampled():
+    return random.random() < LOG_SAMPLE_RATE
+
+
+def endpoint_template(url):
+    """Path of a Jamf URL with IDs and names replaced, e.g. /computers/id/{id}"""
+    path = urlparse(url).path
+    path = re.sub(r"/(name|username|match/name)/[^/]+", r"/\1/{name}", path)
+    path = re.sub(r"/jcds/files/[^/]+", "/jcds/files/{name}", path)
+    path = re.sub(r"/passcode/[^/]+", "/passcode/{passcode}", path)
+    return re.sub(r"/\d+(?=/|$)", "/{id}", path)
+
+
+def emit(record):
+    print(json.dumps(record, default=str))
+
+
+def get_tracer():
+    """OpenTelemetry tracer when TRACING=otel and the API is installed"""
+    global _tracer
+    if TRACING != "otel":
+        return None
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                try:
+                    from opentelemetry import trace
+                except ImportError:
+                    log("warning", "TRACING=otel but opentelemetry is not installed")
+                    _tracer = False
+                else:
+                    # exporters are configured through the OTEL_* environment
+                    _tracer = trace.get_tracer("jackaas")
+    return _tracer or None
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.root = parent.root if parent else self
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes or {})
+        self.start = time.monotonic()
+        self.duration_ms = None
+        self.lock = threading.Lock()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, key, amount=1):
+        """Increment a counter attribute, safe across fan-out threads"""
+        with self.lock:
+            value = self.attributes.get(key, 0) + amount
+            self.attributes[key] = (
+                round(value, 2) if isinstance(value, float) else value
+            )
+
+    def finish(self):
+        self.duration_ms = round((time.monotonic() - self.start) * 1000, 2)
+
+    def to_dict(self):
+        return {
+            "severity": "ERROR" if "error" in self.attributes else "INFO",
+            "message": f"span {self.name}",
+            "span": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "duration_ms": self.duration_ms,
+            **self.attributes,
+        }
+
+
+def current():
+    """Return the innermost open span, if any"""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, on_finish=None, **attributes):
+    """Time a block as a child of the current span and log it when it ends.
+
+    on_finish(span) replaces the default logging of the finished span.
+    """
+    if TRACING == "off":
+        yield Span(name, attributes=attributes)
+        return
+    parent = _current_span.get()
+    current_span = Span(name, parent, attributes)
+    token = _current_span.set(current_span)
+    tracer = get_tracer()
+    try:
+        if tracer is not None:
+            with tracer.start_as_current_span(name, attributes=attributes) as otel:
+                try:
+                    yield current_span
+                finally:
+                    otel.set_attributes(
+                        {
+                            key: value
+                            for key, value in current_span.attributes.items()
+                            if value is not None
+                        }
+                    )
+        else:
+            yield current_span
+    except Exception as e:
+        current_span.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        current_span.finish()
+        if on_finish is not None:
+            on_finish(current_span)
+        elif "error" in current_span.attributes or enabled_for("info"):
+            emit(current_span.to_dict())
+
+
+def finish_jamf_call(call_span):
+    """Add a finished call to the totals of every enclosing span"""
+    status = call_span.attributes.get("status")
+    failed = status is None or status >= 400
+    if failed:
+        record = call_span.to_dict()
+        if "error" not in call_span.attributes:
+            record["severity"] = "WARNING"
+        emit(record)
+    elif enabled_for("debug") or sampled():
+        emit(call_span.to_dict())
+    ancestor = call_span.parent
+    while ancestor is not None:
+        ancestor.add("jamf_calls")
+        ancestor.add("jamf_ms", call_span.duration_ms)
+        ancestor.add("jamf_wait_ms", call_span.attributes.get("wait_ms", 0))
+        ancestor.add("jamf_bytes", call_span.attributes.get("bytes", 0))
+        ancestor.add("jamf_retries", call_span.attributes.get("retries", 0))
+        if failed:
+            ancestor.add("jamf_failures")
+        ancestor = ancestor.parent
+
+
+def jamf_call(method, url):
+    """Span for one jamf_comm call.
+
+    Individual calls are only logged when sampled, at DEBUG level or when
+    they failed, so a fleet scan does not flood the logs, but every call is
+    counted on the command and phase spans around it.
+    """
+    return span(
+        "jamf",
+        on_finish=finish_jamf_call,
+        method=method,
+        endpoint=endpoint_template(url),
+    )
+
+
+def log(level, message, **fields):
+    """Structured log line tagged with the current trace, filtered by LOG_LEVEL"""
+    if not enabled_for(level):
+        return
+    record = {"severity": level.upper(), "message": message, **fields}
+    current_span = _current_span.get()
+    if current_span is not None:
+        record["trace_id"] = current_span.trace_id
+        record["span_id"] = current_span.span_id
+    emit(record)
+
+
+def log_sampled(level, message, **fields):
+    """log() for per-device messages, emitting only a LOG_SAMPLE_RATE share.
+
+    Dropped lines are counted on the current span as suppressed_logs.
+    """
+    if not enabled_for(level):
+        return
+    if enabled_for("debug") or sampled():
+        log(level, message, sampled=True, **fields)
+        return
+    current_span = _current_span.get()
+    if current_span is not None:
+        current_span.add("suppressed_logs")
@@ -1,52 +1,114 @@
 import os
+import threading
+import time
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 from jamf_client import JamfClient
-import slack_commands
+import command_router
+import jamf_fanout
+import tracing
+
+# privileges are re-read from Jamf at least this often
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", "300"))
+# Slack emails rarely change, so they are kept much longer
+AUTH_EMAIL_CACHE_TTL = float(os.environ.get("AUTH_EMAIL_CACHE_TTL", "86400"))
+# warm both caches from users_list when the handler starts
+AUTH_PREFETCH = os.environ.get("AUTH_PREFETCH", "false").lower() == "true"
+
+
+class Grant:
+    """Jamf privileges of one user, resolved to the commands they may run"""
+
+    def __init__(self, privileges, access_level, commands, ttl=AUTH_CACHE_TTL):
+        self.privileges = frozenset(privileges)
+        self.access_level = access_level
+        self.allowed = frozenset(
+            command.key
+            for command in commands
+            if not self.privileges.isdisjoint(command.permissions)
+        )
+        self.expires = time.monotonic() + ttl
+
+    def is_fresh(self):
+        return time.monotonic() < self.expires
+
+    def allows(self, cmd_key):
+        return cmd_key in self.allowed
 
 
 class UserAuthorization:
-    def __init__(self):
+    def __init__(self, jamf_client=None):
         self.client = WebClient(token=os.environ.get("SLACK_USER_TOKEN"))
-        self.jamf = JamfClient()
-        self.cmds = slack_commands.SlackCommands()
+        # reuse the caller's client so both share one token
+        self.jamf = jamf_client or JamfClient()
+        self.company_domain = os.environ.get("COMPANY_DOMAIN")
+        # Slack user ID -> (Jamf username, expiry)
+        self.usernames = {}
+        # Jamf username -> Grant
+        self.grants = {}
+        self.lock = threading.Lock()
+
+    def jamf_username(self, email):
+        return email.replace(f"@{self.company_domain}", "")
+
+    def get_jamf_username(self, user_id):
+        """Jamf account name for a Slack user, from the cache or users_info"""
+        with self.lock:
+            cached = self.usernames.get(user_id)
+        if cached and time.monotonic() < cached[1]:
+            return cached[0]
+        user_info = self.client.users_info(user=user_id)
+        user = self.jamf_username(user_info["user"]["profile"]["email"])
+        with self.lock:
+            self.usernames[user_id] = (user, time.monotonic() + AUTH_EMAIL_CACHE_TTL)
+        return user
 
-    def is_user_authorized(self, user_id, text, response, client, required_group=None):
-        """Check if a user is authorized to run commands"""
+    def get_grant(self, user):
+        """Cached Grant for a Jamf username, failed lookups are not cached"""
+        with self.lock:
+            grant = self.grants.get(user)
+        if grant and grant.is_fresh():
+            return grant
+        privileges, access_level = self.get_user_groups(user)
+        grant = Grant(privileges, access_level, command_router.ROUTER)
+        if access_level != "Unknown":
+            with self.lock:
+                self.grants[user] = grant
+        return grant
+
+    def invalidate(self, user_id=None):
+        """Forget a user's privileges (everyone's without user_id)"""
+        with self.lock:
+            if user_id is None:
+                self.grants.clear()
+                return
+            cached = self.usernames.get(user_id)
+            if cached:
+                self.grants.pop(cached[0], None)
+
+    def is_user_authorized(
+        self, user_id, command, response, client, required_group=None
+    ):
+        """Check if a user may run command, a routed command_router.Command"""
         try:
-            user_info = self.client.users_info(user=user_id)
-            email = user_info["user"]["profile"]["email"]
-            company_domain = os.environ.get("COMPANY_DOMAIN")
-            user = email.replace(f"@{company_domain}", "")
+            user = self.get_jamf_username(user_id)
 
             if user:
-                privileges, access_level = self.get_user_groups(user)
-                if required_group and access_level not in required_group:
+                grant = self.get_grant(user)
+                if required_group and grant.access_level not in required_group:
                     return False, None  # Return as a tuple
-                if text.lower().startswith("count group") or text.lower().startswith(
-                    "count computers"
-                ):
-                    text = text.replace("count ", "count_")
-                if text.lower().startswith("create group"):
-                    text = text.replace("create ", "create_")
-                if text.lower().startswith("show script"):
-                    text = text.replace("show ", "show_")
-                command_found = False
-                for cmd_key in self.cmds.commands.keys():
-                    if text.lower().startswith(cmd_key):
-                        command_found = True
-                        if any(
-                            perm in privileges
-                            for perm in self.cmds.cmd_permissions.get(cmd_key, [])
-                        ):
-                            return True, cmd_key  # Valid user and command
-
-                if not command_found:
+                if command is None:
                     client.chat_update(
                         channel=response["channel"],
                         ts=response["ts"],
                         text="Unknown command received: no permissions needed, but also no output! :cheers:",
                     )
+                    return False, None  # Return as a tuple
+                if grant.allows(command.key):
+                    return True, command.key  # Valid user and command
+                # privileges may just have been granted in Jamf, so a
+                # denial is never served from the cache twice
+                self.invalidate(user_id)
                 return False, None  # Return as a tuple
 
             return False, None  # Return as a tuple
@@ -73,3 +135,50 @@ class UserAuthorization:
             return privileges, access_level
 
         return [], "Unknown"
+
+    def get_jamf_accounts(self):
+        """Names of all Jamf user accounts"""
+        response = self.jamf.jamf_comm(
+            f"{self.jamf.jss_url_api}/accounts",
+            method="GET",
+            headers=self.jamf.json_get_headers,
+        )
+        if response is None or response.status_code != 200:
+            return set()
+        users = response.json().get("accounts", {}).get("users", [])
+        return {account["name"] for account in users}
+
+    def prefetch(self):
+        """Warm the caches: every Slack email, then grants for Jamf accounts"""
+        with tracing.span("auth prefetch") as prefetch_span:
+            usernames = {}
+            cursor = None
+            try:
+                while True:
+                    page = self.client.users_list(cursor=cursor, limit=200)
+                    for member in page["members"]:
+                        email = member.get("profile", {}).get("email")
+                        if email and not member.get("deleted"):
+                            usernames[member["id"]] = self.jamf_username(email)
+                    cursor = page.get("response_metadata", {}).get("next_cursor")
+                    if not cursor:
+                        break
+            except SlackApiError as e:
+                tracing.log("warning", "Auth prefetch failed", error=str(e))
+                return
+            expires = time.monotonic() + AUTH_EMAIL_CACHE_TTL
+            with self.lock:
+                self.usernames.update(
+                    {user_id: (user, expires) for user_id, user in usernames.items()}
+                )
+            # only users that have a Jamf account can be granted anything
+            users = sorted(set(usernames.values()) & self.get_jamf_accounts())
+            jamf_fanout.FanOut().map(self.get_grant, users, label="accounts")
+            prefetch_span.set(slack_users=len(usernames), jamf_users=len(users))
+
+    def warm(self):
+        """Run prefetch() in the background when AUTH_PREFETCH is set"""
+        if AUTH_PREFETCH:
+            threading.Thread(
+                target=self.prefetch, name="jackaas-auth-prefetch", daemon=True
+            ).start()
@@ -0,0 +1,81 @@
+import pytest
+
+import command_router
+
+
+@pytest.fixture(scope="module")
+def router():
+    return command_router.build_router()
+
+
+@pytest.mark.parametrize("text", ["help me", "files all", "commands please"])
+def test_extra_words_after_a_command_without_arguments(router, text):
+    command, args = router.route(text)
+    with pytest.raises(ValueError, match="Usage"):
+        command.parse(args)
+
+
+@pytest.mark.parametrize("text", ["help", "files", "commands"])
+def test_command_without_arguments(router, text):
+    command, args = router.route(text)
+    assert command.parse(args) == {}
+
+
+def test_route_legacy_spelling(router):
+    command, args = router.route("count_group Finance true")
+    assert command.key == "count_group"
+    assert args == "Finance true"
+
+
+def test_typed_arguments(router):
+    command, args = router.route("count group Finance Laptops TRUE")
+    assert command.parse(args) == {
+        "group_name": "Finance Laptops",
+        "create_if_missing_true_false": True,
+    }
+
+
+def test_bool_argument_is_checked(router):
+    command, args = router.route("count group Finance maybe")
+    with pytest.raises(ValueError, match="true"):
+        command.parse(args)
+
+
+def test_repeated_argument_collects_a_list(router):
+    command, args = router.route("details general mac-1 mac-2 mac-3")
+    assert command.parse(args) == {
+        "category": "general",
+        "computer_names": ["mac-1", "mac-2", "mac-3"],
+    }
+
+
+def test_quoted_phrase_is_one_argument(router):
+    command, args = router.route('create group "Big Macs" "Model" or "mac-1 mac-2"')
+    assert command.parse(args) == {
+        "group_name": "Big Macs",
+        "criterion_name": "Model",
+        "and_or": "or",
+        "computers": "mac-1 mac-2",
+    }
+
+
+def test_surplus_words_are_kept_as_typed(router):
+    command, args = router.route('grep script --message  "Hello"')
+    assert command.parse(args) == {"pattern": '--message  "Hello"'}
+
+
+def test_missing_required_argument(router):
+    command, args = router.route("devicelock mac-1")
+    with pytest.raises(ValueError, match="Usage"):
+        command.parse(args)
+
+
+def test_create_group_name_is_optional(router):
+    # with a CSV attached the group names can come from the file
+    command, args = router.route("create group")
+    assert command.parse(args) == {
+        "group_name": None,
+        "criterion_name": None,
+        "and_or": None,
+        "computers": None,
+    }
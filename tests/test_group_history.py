@@ -0,0 +1,39 @@
+import time
+import group_history
+
+HOUR = 3600
+DAY = 86400
+
+
+def history(tmp_path):
+    return group_history.GroupHistory(None, tmp_path / "history.db")
+
+
+def points(store, name):
+    return store.series([name], days=365)[name]
+
+
+def test_recent_samples_are_kept_as_recorded(tmp_path):
+    store = history(tmp_path)
+    now = int(time.time()) // HOUR * HOUR
+    for minutes, count in ((0, 10), (10, 20), (20, 30)):
+        store.append({"lab": count}, ts=now - DAY + minutes * 60)
+    assert store.downsample(now=now) == 0
+    assert [count for _, count in points(store, "lab")] == [10, 20, 30]
+
+
+def test_old_samples_are_averaged_per_bucket(tmp_path):
+    store = history(tmp_path)
+    now = int(time.time()) // DAY * DAY
+    hour = now - 5 * DAY
+    day = now - 40 * DAY
+    for offset, count in ((0, 10), (600, 20), (1200, 30)):
+        store.append({"lab": count, "office": 1}, ts=hour + offset)
+    for offset, count in ((0, 100), (6 * HOUR, 200)):
+        store.append({"lab": count}, ts=day + offset)
+    # lab: 2 + 1 rows merged, office: 2 rows merged
+    assert store.downsample(now=now) == 5
+    assert points(store, "lab") == [(day, 150), (hour, 20)]
+    assert points(store, "office") == [(hour, 1)]
+    # downsampling again changes nothing
+    assert store.downsample(now=now) == 0
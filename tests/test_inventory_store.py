@@ -0,0 +1,89 @@
+import inventory_store
+from jamf_inventory import InventoryRecords, JamfInventory
+
+
+def record(computer_id, name, report_date="2026-01-01T00:00:00Z"):
+    return {
+        "id": str(computer_id),
+        "name": name,
+        "general": {"name": name, "reportDate": report_date},
+        "hardware": {"serialNumber": f"SER{computer_id}"},
+        "userAndLocation": {"username": f"user{computer_id}"},
+    }
+
+
+class FakeJamf:
+    """Bulk inventory and the classic computer list the store syncs from"""
+
+    def __init__(self, records):
+        self.records = records
+        self.inventory = self
+        self.endpoint_details = self
+        self.filters = []
+        self.partial = False
+
+    def get_inventory(self, sections, rsql_filter=None, use_store=True):
+        self.filters.append(rsql_filter)
+        records = InventoryRecords(
+            self.records
+            if rsql_filter is None
+            else [r for r in self.records if r["general"]["reportDate"] >= "2026-02"]
+        )
+        records.partial = self.partial
+        return records
+
+    def get_all_computers(self):
+        return {"computers": [{"id": r["id"]} for r in self.records]}
+
+    def compact(self, item, sections, fields=None):
+        return JamfInventory.compact(None, item, sections, fields)
+
+
+def names(store):
+    return [r["name"] for r in store.get_records(["GENERAL"], max_age=3600)]
+
+
+def test_first_sync_is_full_then_deltas(tmp_path):
+    jamf = FakeJamf([record(1, "mac-1"), record(2, "mac-2"), record(3, "mac-3")])
+    store = inventory_store.InventoryStore(jamf, tmp_path / "inventory.db")
+    assert names(store) == ["mac-1", "mac-2", "mac-3"]
+    assert jamf.filters == [None]
+
+    # mac-2 renamed and reported again, mac-3 deleted from Jamf
+    jamf.records = [
+        record(1, "mac-1"),
+        record(2, "mac-2-renamed", report_date="2026-02-01T00:00:00Z"),
+    ]
+    store.sync()
+    assert len(jamf.filters) == 2 and "general.reportDate" in jamf.filters[1]
+    assert names(store) == ["mac-1", "mac-2-renamed"]
+
+
+def test_sections_change_forces_a_full_sync(tmp_path, monkeypatch):
+    jamf = FakeJamf([record(1, "mac-1")])
+    store = inventory_store.InventoryStore(jamf, tmp_path / "inventory.db")
+    store.sync()
+    monkeypatch.setattr(
+        inventory_store, "STORED_SECTIONS", inventory_store.STORED_SECTIONS + ("X",)
+    )
+    store.sync()
+    assert jamf.filters == [None, None]
+
+
+def test_partial_sync_keeps_devices_and_stays_stale(tmp_path):
+    jamf = FakeJamf([record(1, "mac-1"), record(2, "mac-2")])
+    store = inventory_store.InventoryStore(jamf, tmp_path / "inventory.db")
+    store.sync()
+    age = store.age()
+
+    # a full sync cut short by the deadline only read mac-1
+    jamf.records = [record(1, "mac-1-renamed")]
+    jamf.partial = True
+    store.sync(full=True)
+    assert names(store) == ["mac-1-renamed", "mac-2"]
+    # the sync time is not moved on, so the next read syncs again
+    assert store.age() >= age
+
+    jamf.partial = False
+    store.sync(full=True)
+    assert names(store) == ["mac-1-renamed"]
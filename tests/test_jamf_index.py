@@ -0,0 +1,114 @@
+import jamf_index
+
+
+class Response:
+    status_code = 200
+
+    def __init__(self, computers):
+        self.computers = computers
+
+    def json(self):
+        return {"computers": self.computers}
+
+
+class FakeJamf:
+    """Classic basic subset for the index, filtered inventory for lookups"""
+
+    inventory_store = None
+    jss_url_api_computer_basic = "basic"
+    json_get_headers = {}
+
+    def __init__(self, computers):
+        self.computers = computers
+        self.inventory = self
+        self.basic_calls = 0
+        self.filters = []
+
+    def jamf_comm(self, url, method="GET", headers=None):
+        self.basic_calls += 1
+        return Response(list(self.computers))
+
+    def get_inventory(self, sections, fields=None, rsql_filter=None):
+        self.filters.append(rsql_filter)
+        return [
+            {
+                "id": computer["id"],
+                "name": computer["name"],
+                "hardware": {"serialNumber": computer["serial_number"]},
+                "userAndLocation": {"username": computer["username"]},
+            }
+            for computer in self.computers
+            if f'"{computer["name"]}"' in rsql_filter
+            or f'"{computer["serial_number"]}"' in rsql_filter
+        ]
+
+
+def computer(computer_id, name):
+    return {
+        "id": computer_id,
+        "name": name,
+        "serial_number": f"SER{computer_id}",
+        "username": f"user{computer_id}",
+    }
+
+
+def fresh_index(jamf):
+    index = jamf_index.ComputerIndex(jamf)
+    index.refresh()
+    return index
+
+
+def test_fresh_index_answers_without_jamf_calls():
+    jamf = FakeJamf([computer(1, "mac-1"), computer(2, "mac-2")])
+    index = fresh_index(jamf)
+    assert index.resolve_many(["mac-1", "SER2", "user1"]) == {
+        "mac-1": 1,
+        "SER2": 2,
+        "user1": 1,
+    }
+    assert jamf.basic_calls == 1
+    assert jamf.filters == []
+
+
+def test_device_missing_from_a_fresh_index_is_looked_up():
+    jamf = FakeJamf([computer(1, "mac-1")])
+    index = fresh_index(jamf)
+    # enrolled after the index was built
+    jamf.computers.append(computer(2, "mac-2"))
+    assert index.resolve_many(["mac-1", "mac-2"]) == {"mac-1": 1, "mac-2": 2}
+    assert len(jamf.filters) == 1 and '"mac-1"' not in jamf.filters[0]
+    # found devices are added to the index
+    assert index.resolve("mac-2") == 2
+    assert len(jamf.filters) == 1
+
+
+def test_unknown_device_resolves_to_none():
+    jamf = FakeJamf([computer(1, "mac-1")])
+    index = fresh_index(jamf)
+    assert index.resolve("nope") is None
+
+
+def test_many_missing_devices_rebuild_the_index(monkeypatch):
+    monkeypatch.setattr(jamf_index, "INDEX_REBUILD_INTERVAL", 0)
+    jamf = FakeJamf([computer(1, "mac-1")])
+    index = fresh_index(jamf)
+    new = [computer(i, f"mac-{i}") for i in range(2, 15)]
+    jamf.computers.extend(new)
+    resolved = index.resolve_many([c["name"] for c in new])
+    assert resolved == {c["name"]: c["id"] for c in new}
+    assert jamf.basic_calls == 2
+    assert jamf.filters == []
+
+
+def test_many_unknown_devices_do_not_rebuild_a_recent_index():
+    jamf = FakeJamf([computer(1, "mac-1")])
+    index = fresh_index(jamf)
+    jamf.computers.append(computer(2, "mac-2"))
+    typos = [f"typo-{i}" for i in range(25)]
+    for _ in range(3):
+        resolved = index.resolve_many(typos + ["mac-2"])
+        assert resolved["mac-2"] == 2
+        assert all(resolved[typo] is None for typo in typos)
+    # looked up in batches of BATCH_FILTER_LIMIT instead of re-indexing
+    assert jamf.basic_calls == 1
+    assert len(jamf.filters) == 3 * 3
@@ -0,0 +1,79 @@
+import threading
+import time
+from jamf_memo import RequestMemo
+
+
+class Response:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+
+def test_concurrent_callers_share_one_fetch():
+    memo = RequestMemo()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return Response()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(memo.get_or_fetch("a", fetch)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(set(map(id, results))) == 1
+    assert (memo.hits, memo.misses) == (4, 1)
+
+
+def test_failed_responses_are_not_kept():
+    memo = RequestMemo()
+    assert memo.get_or_fetch("a", lambda: Response(500)).status_code == 500
+    assert memo.get_or_fetch("a", lambda: None) is None
+    assert memo.get_or_fetch("a", lambda: Response()).status_code == 200
+    assert memo.get_or_fetch("a", lambda: Response(500)).status_code == 200
+
+
+def test_exceptions_reach_the_caller_and_are_retried():
+    memo = RequestMemo()
+
+    def fail():
+        raise ValueError("down")
+
+    try:
+        memo.get_or_fetch("a", fail)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("the fetch error was swallowed")
+    assert memo.get_or_fetch("a", lambda: Response()).status_code == 200
+
+
+def test_retrying_a_failed_fetch_does_not_block_other_keys():
+    memo = RequestMemo()
+
+    def slow_failure():
+        time.sleep(0.3)
+        return Response(500)
+
+    threads = [
+        threading.Thread(target=memo.get_or_fetch, args=("slow", slow_failure))
+        for _ in range(4)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    # the waiters are now retrying the failed fetch
+    time.sleep(0.4)
+    other = time.monotonic()
+    assert memo.get_or_fetch("other", lambda: Response()).status_code == 200
+    assert time.monotonic() - other < 0.1
+    for thread in threads:
+        thread.join()
+    # the first fetch, then every waiter retries at the same time
+    assert time.monotonic() - start < 0.9
@@ -0,0 +1,50 @@
+import time
+from jamf_ratelimit import AdaptiveRateLimiter, parse_retry_after
+
+
+def test_requests_are_not_paced_until_jamf_throttles():
+    limiter = AdaptiveRateLimiter(rate=100, max_rate=100)
+    for _ in range(50):
+        limiter.acquire()
+    assert limiter.stats()["waits"] == 0
+
+
+def test_a_throttled_burst_halves_the_rate_once():
+    limiter = AdaptiveRateLimiter(rate=100, max_rate=100)
+    for _ in range(5):
+        limiter.on_throttle()
+    stats = limiter.stats()
+    assert stats["rate"] == 50
+    assert stats["throttled"] == 5
+
+
+def test_rate_never_drops_below_the_floor():
+    limiter = AdaptiveRateLimiter(rate=4, min_rate=2, max_rate=100)
+    for _ in range(3):
+        limiter.cooldown_until = 0.0
+        limiter.on_throttle()
+    assert limiter.rate == 2
+
+
+def test_retry_after_blocks_every_caller():
+    limiter = AdaptiveRateLimiter(rate=100, max_rate=100)
+    limiter.on_throttle(retry_after=0.2)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.2
+    assert limiter.stats()["waits"] >= 1
+
+
+def test_successes_recover_the_rate_up_to_the_ceiling():
+    limiter = AdaptiveRateLimiter(rate=10, max_rate=12)
+    limiter.on_success()
+    assert 10 < limiter.rate < 12
+    for _ in range(1000):
+        limiter.on_success()
+    assert limiter.rate == 12
+
+
+def test_retry_after_accepts_seconds_and_dates():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Thu, 01 Jan 1970 00:00:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
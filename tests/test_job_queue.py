@@ -0,0 +1,114 @@
+import threading
+import job_queue
+import main
+
+
+def job(job_id, cmd_key="help"):
+    return {
+        "id": job_id,
+        "cmd_key": cmd_key,
+        "args": "",
+        "channel": "C1",
+        "ts": "1.0",
+        "user": "U1",
+        "files": [],
+        "created": 0,
+    }
+
+
+def sqlite_queue(tmp_path, runner=None):
+    return job_queue.SQLiteQueue(runner or (lambda job: None), tmp_path / "jobs.db")
+
+
+def test_sqlite_queue_ignores_a_retried_delivery(tmp_path):
+    queue = sqlite_queue(tmp_path)
+    assert queue.enqueue(job("a")) is True
+    assert queue.enqueue(job("a")) is False
+    # a second queue on the same file sees the first delivery too
+    assert sqlite_queue(tmp_path).enqueue(job("a")) is False
+    assert queue.claim()["id"] == "a"
+    assert queue.claim() is None
+
+
+def test_sqlite_queue_claims_each_job_once(tmp_path):
+    queue = sqlite_queue(tmp_path)
+    for index in range(20):
+        queue.enqueue(job(f"job-{index}"))
+    claimed = []
+
+    def claimer():
+        worker = sqlite_queue(tmp_path)
+        while True:
+            claimed_job = worker.claim()
+            if claimed_job is None:
+                return
+            claimed.append(claimed_job["id"])
+
+    threads = [threading.Thread(target=claimer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(f"job-{index}" for index in range(20))
+
+
+def test_sqlite_queue_drain_records_failures(tmp_path):
+    def runner(claimed_job):
+        if claimed_job["cmd_key"] == "broken":
+            raise ValueError("boom")
+
+    queue = sqlite_queue(tmp_path, runner)
+    queue.enqueue(job("ok"))
+    queue.enqueue(job("bad", cmd_key="broken"))
+    assert queue.drain() == 2
+    rows = dict(
+        (row[0], row[1:]) for row in queue.execute("SELECT id, status, error FROM jobs")
+    )
+    assert rows == {"ok": ("done", None), "bad": ("failed", "boom")}
+
+
+def test_inline_queue_runs_a_job_once():
+    ran = []
+    queue = job_queue.InlineQueue(ran.append)
+    assert queue.enqueue(job("a")) is True
+    assert queue.enqueue(job("a")) is False
+    assert [ran_job["id"] for ran_job in ran] == ["a"]
+
+
+def test_pushed_jobs_need_a_configured_worker(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_WORKER_URL", None)
+    assert job_queue.verify_push({"Authorization": "Bearer token"}) is False
+
+
+class Request:
+    def __init__(self, body, headers=None):
+        self.body = body
+        self.headers = headers or {}
+
+    def get_json(self, silent=False):
+        return self.body
+
+
+def test_slack_retries_are_dropped_without_a_shared_backend(monkeypatch):
+    event = {"type": "event_callback", "event": {"type": "message"}}
+    handled = []
+    handler = type("Handler", (), {"handle_slack_event": handled.append})()
+    monkeypatch.setattr(main, "get_slack_handler", lambda: handler)
+    retry = Request(event, {"X-Slack-Retry-Num": "1"})
+
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_BACKEND", "inline")
+    assert main.main(retry) == {"statusCode": 200, "body": ""}
+    assert handled == []
+
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_BACKEND", "sqlite")
+    main.main(retry)
+    assert handled == [retry]
+
+
+def test_worker_refuses_unverified_jobs(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_WORKER_URL", None)
+    ran = []
+    handler = type("Handler", (), {"run_job": ran.append})()
+    monkeypatch.setattr(main, "get_slack_handler", lambda: handler)
+    assert main.worker(Request(job("a", cmd_key="redeploy"))) == ("", 403)
+    assert ran == []